@@ -1,55 +1,140 @@
 from __future__ import annotations
 
+from pathlib import Path
+from typing import Any, List, Optional
+
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain.agents import create_tool_calling_agent, AgentExecutor
+from langchain_core.tools import BaseTool
 
 from agent.config import Settings
 from agent.llm import build_llm
-from agent.prompt import SYSTEM_PROMPT
-from agent.history import get_history
+from agent.prompt import PromptSelector
+from agent.history import history_factory, llm_summarizer
+from agent.metrics import METRICS, MetricsCallbackHandler
+from agent.planner import PlanExecutor
+from agent.moodle_ws import client_for
+from agent.site_index import site_index_for
+from agent.gradebook import gradebook_for
 
 from agent.tools.navigate import NavigateTool
 from agent.tools.act import ActTool
 from agent.tools.extract import ExtractTool
 from agent.tools.observe import ObserveTool
 from agent.tools.upload import UploadFileTool, UploadCSVTool
+from agent.tools.moodle import build_moodle_tools
+from agent.tools.fanout import FanOutExtractTool
+from agent.tools.grading import BatchGradeTool
+from agent.tools.results import ReadResultTool
+from agent.tools.site_index import LookupURLTool
+from agent.tools.gradebook import QueryGradesTool
+from agent.tools.skills import build_skill_tools
+
+
+def build_prompt_selector(cfg: Settings) -> PromptSelector:
+    """Prompt sections for the tools build_tools() registers with the same settings."""
+    return PromptSelector(
+        role=cfg.user_role,
+        web_services=cfg.moodle_ws_enabled,
+        skills=cfg.skills_enabled,
+        site_index=cfg.site_index_enabled,
+        gradebook=cfg.gradebook_enabled,
+    )
+
+
+def build_tools(cfg: Settings) -> List[BaseTool]:
+    #one web service client (and token) for every tool of the session
+    client = client_for(cfg) if cfg.moodle_ws_enabled else None
+    #tools that change grades mark the user's gradebook snapshots stale
+    gradebook = gradebook_for(cfg) if cfg.gradebook_enabled else None
+
+    tools: List[BaseTool] = [
+        NavigateTool(),
+        ActTool(),
+        ObserveTool(max_chars=cfg.result_max_chars),
+        ExtractTool(max_chars=cfg.result_max_chars),
+        UploadFileTool(),
+        UploadCSVTool(
+            client=client,
+            gradebook=gradebook,
+            work_dir=str(Path(cfg.storage_state_dir) / "csv_import"),
+            chunk_rows=cfg.csv_import_chunk_rows,
+            chunk_bytes=int(cfg.csv_import_chunk_mb * 1024 * 1024),
+        ),
+        FanOutExtractTool(
+            base_url=cfg.lms_base_url,
+            default_concurrency=cfg.fanout_concurrency,
+            max_chars=cfg.result_max_chars,
+        ),
+        ReadResultTool(max_chars=cfg.result_max_chars),
+        BatchGradeTool(
+            base_url=cfg.lms_base_url,
+            progress_dir=str(Path(cfg.storage_state_dir) / "grading"),
+            username=cfg.lms_username,
+            gradebook=gradebook,
+        ),
+    ]
+    if cfg.site_index_enabled:
+        tools.append(LookupURLTool(index=site_index_for(cfg), client=client))
+    if cfg.skills_enabled:
+        tools.extend(build_skill_tools(cfg, client))
+    if gradebook is not None:
+        tools.append(QueryGradesTool(store=gradebook, client=client, max_chars=cfg.result_max_chars))
+    if cfg.moodle_ws_enabled:
+        tools.extend(build_moodle_tools(client))
+    return tools
+
 
+def build_agent(cfg: Settings, llm: Optional[Any] = None):
+    llm = llm or build_llm(cfg)
 
-def build_agent(cfg: Settings):
-    llm = build_llm(cfg)
+    #one selector per agent, i.e. per chat session, so detected intents stay in the prompt for later turns
+    selector = build_prompt_selector(cfg)
 
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", SYSTEM_PROMPT),
+            ("system", "{system_prompt}"),
             MessagesPlaceholder("chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder("agent_scratchpad"),
         ]
     )
+    tools = build_tools(cfg)
 
-    tools = [
-        NavigateTool(),
-        ActTool(),
-        ObserveTool(),
-        ExtractTool(),
-        UploadFileTool(),
-        UploadCSVTool(),
-    ]
+    if cfg.agent_mode == "plan":
+        executor = PlanExecutor(
+            llm, tools, watchdog=cfg.watchdog_enabled, time_budget=cfg.agent_time_budget
+        ).as_runnable()
+    else:
+        #the agent stack is imported on first build (in the background when prewarm runs)
+        from langchain.agents import create_tool_calling_agent
+        from agent.executor import LMSAgentExecutor
 
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    executor = AgentExecutor(
-        agent=agent,
-        tools=tools,
-        verbose=True,
-        return_intermediate_steps=True,
-        max_iterations=90,
-    )
+        agent = create_tool_calling_agent(llm, tools, prompt)
+        executor = LMSAgentExecutor(
+            agent=agent,
+            tools=tools,
+            verbose=True,
+            return_intermediate_steps=True,
+            max_iterations=90,
+            #hard stop for a turn that overruns the budget; the watchdog normally stops cleanly between turns
+            max_execution_time=cfg.agent_time_budget * 1.5 if cfg.agent_time_budget else None,
+            parallel_reads=cfg.parallel_reads_enabled,
+            watchdog=cfg.watchdog_enabled,
+            time_budget=cfg.agent_time_budget,
+        )
 
-    return RunnableWithMessageHistory(
-        executor,
-        get_history,
+    agent_with_history = RunnableWithMessageHistory(
+        RunnablePassthrough.assign(system_prompt=selector) | executor,
+        history_factory(cfg, llm_summarizer(llm)),
         input_messages_key="input",
         history_messages_key="chat_history",
         output_messages_key="output",
     )
+
+    METRICS.configure(cfg)
+    if not cfg.metrics_enabled:
+        return agent_with_history
+    #passed through the run config so LLM and tool runs nested in the executor inherit the handler
+    return agent_with_history.with_config(callbacks=[MetricsCallbackHandler()])
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 
 from agent.config import Settings
-from agent.runtime import require_page
+from agent.runtime import current_runtime, require_page
+from agent.storage_state import forget_storage_state, persist_storage_state
 
 
 async def login(cfg: Settings) -> Tuple[bool, Optional[str]]:
@@ -20,3 +21,44 @@ async def login(cfg: Settings) -> Tuple[bool, Optional[str]]:
         return True, None
     except Exception as exc:
         return False, str(exc)
+
+
+async def is_logged_in(page: Any, cfg: Settings) -> bool:
+    """
+    Cheap session probe: /my/courses.php requires login, so Moodle redirects anonymous
+    visitors to /login/. Landing anywhere else means the restored cookies are still valid.
+    """
+    try:
+        await page.goto(f"{cfg.lms_base_url}/my/courses.php", wait_until="domcontentloaded")
+    except Exception:
+        return False
+    return "/login/" not in page.url
+
+
+async def ensure_login(cfg: Settings) -> Tuple[bool, Optional[str]]:
+    """
+    Reuse the storage state restored by init_stagehand when it is still valid,
+    otherwise log in with the form and store the fresh session for next time.
+    """
+    page = require_page()
+    if current_runtime().restored_state:
+        if await is_logged_in(page, cfg):
+            return True, None
+        forget_storage_state(cfg)
+
+    ok, err = await login(cfg)
+    if not ok:
+        return ok, err
+
+    try:
+        await page.wait_for_url(lambda url: "/login/" not in url, timeout=15_000)
+    except Exception:
+        pass
+    #still on the login form: wrong credentials, so nothing is stored and the session is refused
+    if "/login/" in page.url:
+        return False, "Login failed: check the LMS username and password."
+    try:
+        await persist_storage_state(page.context, cfg)
+    except Exception:
+        pass
+    return True, None
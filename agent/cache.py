@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+#query params that change on every request but never change what the page shows
+VOLATILE_PARAMS = {"sesskey", "_", "lang"}
+
+FINGERPRINT_JS = """
+() => {
+    const body = document.body;
+    if (!body) return "";
+    const text = body.innerText || "";
+    let hash = 0;
+    for (let i = 0; i < text.length; i += 1) {
+        hash = (hash * 31 + text.charCodeAt(i)) | 0;
+    }
+    const interactive = document.querySelectorAll("a,button,input,select,textarea,[role]").length;
+    return [document.title, body.getElementsByTagName("*").length, interactive, text.length, hash].join("|");
+}
+"""
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url or "")
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+async def page_fingerprint(page: Any) -> str:
+    """
+    Cheap structural hash of the rendered page (title, element counts, visible text hash).
+    Returns an empty string when the page cannot be evaluated, which callers treat as a miss.
+    """
+    try:
+        return str(await page.evaluate(FINGERPRINT_JS))
+    except Exception:
+        return ""
+
+
+class TTLCache:
+    """Small LRU cache where every entry also expires after `ttl` seconds."""
+
+    def __init__(self, max_size: int = 64, ttl: float = 120.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or time.monotonic() - item[0] > self.ttl:
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ObserveCache(TTLCache):
+    """
+    Caches Stagehand observe() results keyed by (normalized url, page fingerprint, goal).
+    Tools that change the page call invalidate(url) so stale selectors are never served.
+    """
+
+    @staticmethod
+    def make_key(url: str, fingerprint: str, goal: str) -> Tuple[str, str, str]:
+        return normalize_url(url), fingerprint, normalize_text(goal)
+
+    def invalidate(self, url: str) -> None:
+        target = normalize_url(url)
+        for key in [k for k in self._data if k[0] == target]:
+            del self._data[key]
+
+
+def page_template(url: str) -> str:
+    """
+    Collapses concrete Moodle pages into a template: numeric query values (course, module,
+    user ids) become '#', so /course/view.php?id=12 and ?id=34 share learned actions.
+    """
+    parts = urlsplit(normalize_url(url))
+    query = [(k, "#" if v.isdigit() else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(("", parts.netloc, parts.path, urlencode(query), ""))
+
+
+@dataclass(frozen=True)
+class CachedAction:
+    selector: str
+    method: str
+    arguments: Tuple[str, ...] = ()
+    description: str = ""
+    text: str = ""
+
+
+class ActionCache(TTLCache):
+    """
+    Learned act() resolutions keyed by (page template, normalized instruction). One per browser
+    context (LMS user), so a selector learned on one user's pages is never replayed on another's.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 24 * 3600) -> None:
+        super().__init__(max_size=max_size, ttl=ttl)
+
+    @staticmethod
+    def make_key(url: str, instruction: str) -> Tuple[str, str]:
+        return page_template(url), normalize_text(instruction)
+
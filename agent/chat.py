@@ -6,8 +6,10 @@ import uuid
 import os
 
 from agent.config import Settings
-from agent.stagehand_client import init_stagehand, close_stagehand
-from agent.auth import login
+from agent.jobs import JobQueue, QueueFull, agent_job
+from agent.moodle_ws import close_shared_http
+from agent.pool import POOL, start_session
+from agent.prewarm import prewarm
 
 from agent.agent_factory import build_agent
 
@@ -22,13 +24,18 @@ async def async_main() -> None:
         os.environ["LLM_PROVIDER"] = args.provider
         cfg = Settings()
 
-    await init_stagehand(cfg)
+    session_id = f"cli:{uuid.uuid4()}"
     try:
         print("Entering LMS...")
-        await login(cfg)
+        #the agent stack imports while Chromium boots; the session then logs in on the warm browser
+        agent = await prewarm(cfg) if cfg.prewarm_enabled else None
+        ok, err = await start_session(cfg, session_id)
+        if not ok:
+            print(f"Login/session initialization failed: {err}")
+            return
 
-        agent = build_agent(cfg)
-        session_id = f"cli:{uuid.uuid4()}"
+        agent = agent or build_agent(cfg)
+        jobs = JobQueue.from_settings(cfg, asyncio.get_running_loop())
 
         print("Chat with agent (enter 'exit' to quit)")
         while True:
@@ -38,13 +45,17 @@ async def async_main() -> None:
             if not user_in:
                 continue
 
-            res = await agent.ainvoke(
-                {"input": user_in},
-                config={"configurable": {"session_id": session_id}},
-            )
-            print(res["output"])
+            try:
+                job_id = jobs.submit(cfg.lms_username, session_id, agent_job(agent, cfg, session_id, user_in))
+            except QueueFull as e:
+                print(e)
+                continue
+            #tool calls are already logged by the verbose executor
+            job = await jobs.wait(job_id)
+            print(job.answer if job.status != "cancelled" else "Run cancelled.")
     finally:
-        await close_stagehand()
+        await POOL.close()
+        await close_shared_http()
 
 
 def main() -> None:
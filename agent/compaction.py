@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from agent.cache import TTLCache
+
+KeyPath = List[Union[str, int]]
+
+DEFAULT_MAX_CHARS = 6000
+PAGE_ROWS = 50
+#single-key wrappers Stagehand and LLM schemas put around the payload
+WRAPPER_KEYS = {"extraction", "data", "result", "results", "items"}
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def plain(value: Any) -> Any:
+    """Pydantic models, tuples and messy strings -> JSON-ready values with collapsed whitespace."""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def tabulate(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """List of dicts -> {"columns", "rows"} without empty columns and with duplicate rows removed."""
+    columns: List[str] = []
+    for record in records:
+        for key, value in record.items():
+            if key not in columns and not _empty(value):
+                columns.append(key)
+
+    rows: List[List[Any]] = []
+    seen = set()
+    for record in records:
+        row = [compact(record.get(c)) for c in columns]
+        marker = _dumps(row)
+        if marker in seen:
+            continue
+        seen.add(marker)
+        rows.append(row)
+
+    table: Dict[str, Any] = {"columns": columns, "rows": rows}
+    if len(rows) < len(records):
+        table["duplicates_removed"] = len(records) - len(rows)
+    return table
+
+
+def compact(value: Any) -> Any:
+    if isinstance(value, dict):
+        value = {k: compact(v) for k, v in value.items() if not _empty(v)}
+        if len(value) == 1 and next(iter(value)) in WRAPPER_KEYS:
+            return next(iter(value.values()))
+        return value
+    if isinstance(value, list):
+        if len(value) > 1 and all(isinstance(v, dict) for v in value):
+            return tabulate(value)
+        #repeated scalars are data (e.g. two students with the same grade); only table rows are deduplicated
+        return [compact(v) for v in value]
+    return value
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, dict) and "columns" in value and "rows" in value
+
+
+def _largest_table(value: Any, path: Optional[KeyPath] = None) -> Optional[Tuple[KeyPath, int]]:
+    path = path or []
+    best: Optional[Tuple[KeyPath, int]] = None
+    if _is_table(value):
+        best = (path, len(_dumps(value["rows"])))
+    children = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else []
+    for key, child in children:
+        found = _largest_table(child, path + [key])
+        if found is not None and (best is None or found[1] > best[1]):
+            best = found
+    return best
+
+
+def _at(value: Any, path: KeyPath) -> Any:
+    for key in path:
+        value = value[key]
+    return value
+
+
+@dataclass
+class StoredResult:
+    data: Any
+    text: str
+    table_path: Optional[KeyPath] = None
+
+
+class ResultStore(TTLCache):
+    """Full results that were cut down for the scratchpad, paged back in by read_result."""
+
+    def __init__(self, max_size: int = 16, ttl: float = 1800.0) -> None:
+        super().__init__(max_size=max_size, ttl=ttl)
+
+    def add(self, result: StoredResult) -> str:
+        result_id = uuid.uuid4().hex[:8]
+        self.put(result_id, result)
+        return result_id
+
+
+def compact_result(raw: Any, store: ResultStore, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """
+    Normalize a Stagehand result into compact JSON. If it is still longer than max_chars, the full
+    result goes into the store and a preview is returned with a pointer for read_result.
+    """
+    data = compact(plain(raw))
+    text = data if isinstance(data, str) else _dumps(data)
+    if len(text) <= max_chars:
+        return text
+
+    found = _largest_table(data)
+    if found is None:
+        result_id = store.add(StoredResult(data, text))
+        return (
+            text[:max_chars]
+            + f'\n[truncated: {len(text)} chars; read_result(result_id="{result_id}", offset={max_chars}) for more]'
+        )
+
+    path = found[0]
+    result_id = store.add(StoredResult(data, text, path))
+    rows = _at(data, path)["rows"]
+    preview = json.loads(text)
+    table = _at(preview, path)
+
+    #largest row count that still fits, found by bisection since row widths vary
+    low, high = 0, len(rows)
+    while low < high:
+        mid = (low + high + 1) // 2
+        table["rows"] = rows[:mid]
+        table["more"] = {"result_id": result_id, "total_rows": len(rows), "next_offset": mid}
+        if len(_dumps(preview)) <= max_chars:
+            low = mid
+        else:
+            high = mid - 1
+    table["rows"] = rows[:low]
+    table["more"] = {"result_id": result_id, "total_rows": len(rows), "next_offset": low}
+    return _dumps(preview)
+
+
+def read_stored(store: ResultStore, result_id: str, offset: int = 0, limit: int = PAGE_ROWS, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    result: Optional[StoredResult] = store.get(result_id)
+    if result is None:
+        return f"Result {result_id} is no longer stored; run the extraction again."
+
+    if result.table_path is None:
+        chunk = result.text[offset : offset + max_chars]
+        end = offset + len(chunk)
+        more = f'\n[read_result(result_id="{result_id}", offset={end}) for more]' if end < len(result.text) else ""
+        return chunk + more
+
+    table = _at(result.data, result.table_path)
+    rows = table["rows"]
+    limit = max(1, limit)
+    while True:
+        page = rows[offset : offset + limit]
+        body: Dict[str, Any] = {"columns": table["columns"], "rows": page, "offset": offset, "total_rows": len(rows)}
+        if offset + len(page) < len(rows):
+            body["next_offset"] = offset + len(page)
+        text = _dumps(body)
+        if len(text) <= max_chars or limit == 1:
+            return text
+        limit //= 2
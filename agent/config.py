@@ -24,6 +24,7 @@ class Settings:
     browserbase_project_id: str = os.getenv("BROWSERBASE_PROJECT_ID", "")
     stagehand_env: str = os.getenv("STAGEHAND_ENV", "LOCAL")
     stagehand_verbose: int = int(os.getenv("STAGEHAND_VERBOSE", "2"))
+    stagehand_cdp_url: str = os.getenv("STAGEHAND_CDP_URL", "")
 
     stagehand_model_name: str = os.getenv("STAGEHAND_MODEL_NAME", "openai/gpt-4o-mini")
     stagehand_model_api_key: str = os.getenv("STAGEHAND_MODEL_API_KEY", os.getenv("OPENAI_API_KEY", ""))
@@ -33,9 +34,79 @@ class Settings:
 
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    openai_fast_model: str = os.getenv("OPENAI_FAST_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+    openai_strong_model: str = os.getenv("OPENAI_STRONG_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
 
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
     google_model: str = os.getenv("GOOGLE_MODEL", "gemini-2.5-flash")
+    google_fast_model: str = os.getenv("GOOGLE_FAST_MODEL", os.getenv("GOOGLE_MODEL", "gemini-2.5-flash"))
+    google_strong_model: str = os.getenv("GOOGLE_STRONG_MODEL", os.getenv("GOOGLE_MODEL", "gemini-2.5-flash"))
+
+    #"auto" fails over to the other provider when its key is set; "none" disables failover
+    llm_fallback_provider: str = os.getenv("LLM_FALLBACK_PROVIDER", "auto").lower()
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "60"))
+    #one model call, all retries and failovers included, never takes longer than this
+    llm_total_timeout: float = float(os.getenv("LLM_TOTAL_TIMEOUT", "120"))
+    llm_retries: int = int(os.getenv("LLM_RETRIES", "1"))
+    llm_escalate_after: int = int(os.getenv("LLM_ESCALATE_AFTER", "4"))
 
     show_realtime: str = os.getenv("STAGEHAND_SHOW_REALTIME", "true")
+
+    observe_cache_size: int = int(os.getenv("OBSERVE_CACHE_SIZE", "64"))
+    observe_cache_ttl: float = float(os.getenv("OBSERVE_CACHE_TTL", "120"))
+    action_cache_size: int = int(os.getenv("ACTION_CACHE_SIZE", "256"))
+    action_cache_ttl: float = float(os.getenv("ACTION_CACHE_TTL", "86400"))
+
+    storage_state_enabled: bool = os.getenv("STORAGE_STATE_ENABLED", "true").lower() in ("1", "true", "yes")
+    storage_state_dir: str = os.getenv("STORAGE_STATE_DIR", ".lms_state")
+    storage_state_key: str = os.getenv("STORAGE_STATE_KEY", "")
+
+    pool_max_browsers: int = int(os.getenv("POOL_MAX_BROWSERS", "2"))
+    pool_max_sessions: int = int(os.getenv("POOL_MAX_SESSIONS", "32"))
+    pool_idle_ttl: float = float(os.getenv("POOL_IDLE_TTL", "900"))
+    jobs_max_workers: int = int(os.getenv("JOBS_MAX_WORKERS", "4"))
+    jobs_max_queued: int = int(os.getenv("JOBS_MAX_QUEUED", "64"))
+    jobs_max_per_user: int = int(os.getenv("JOBS_MAX_PER_USER", "3"))
+    jobs_result_ttl: float = float(os.getenv("JOBS_RESULT_TTL", "900"))
+    network_filter_enabled: bool = os.getenv("NETWORK_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+    network_block_types: str = os.getenv("NETWORK_BLOCK_TYPES", "image,media,font")
+    network_deny_urls: str = os.getenv("NETWORK_DENY_URLS", "")
+    #pages whose requests load unfiltered: quiz attempts and H5P need full rendering to be read correctly
+    network_safe_pages: str = os.getenv("NETWORK_SAFE_PAGES", r"/mod/quiz/(attempt|review)\.php|/h5p/|/mod/hvp/|editpdf")
+    network_cache_mb: int = int(os.getenv("NETWORK_CACHE_MB", "64"))
+    prewarm_enabled: bool = os.getenv("PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+    fanout_concurrency: int = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+    result_max_chars: int = int(os.getenv("RESULT_MAX_CHARS", "6000"))
+    site_index_enabled: bool = os.getenv("SITE_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+    site_index_ttl: float = float(os.getenv("SITE_INDEX_TTL", "21600"))
+    skills_enabled: bool = os.getenv("SKILLS_ENABLED", "true").lower() in ("1", "true", "yes")
+    gradebook_enabled: bool = os.getenv("GRADEBOOK_ENABLED", "true").lower() in ("1", "true", "yes")
+    gradebook_ttl: float = float(os.getenv("GRADEBOOK_TTL", "900"))
+    #large grade imports time out in Moodle, so CSV uploads are split into chunks of this size
+    csv_import_chunk_rows: int = int(os.getenv("CSV_IMPORT_CHUNK_ROWS", "1000"))
+    csv_import_chunk_mb: float = float(os.getenv("CSV_IMPORT_CHUNK_MB", "2"))
+
+    #session ids are per UI session, so the default keeps history in memory; sqlite needs HISTORY_KEY
+    history_backend: str = os.getenv("HISTORY_BACKEND", "memory").lower()
+    history_db_path: str = os.getenv("HISTORY_DB_PATH", ".lms_state/history.sqlite3")
+    history_key: str = os.getenv("HISTORY_KEY", "")
+    history_idle_ttl: float = float(os.getenv("HISTORY_IDLE_TTL", "86400"))
+    history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+
+    user_role: str = os.getenv("USER_ROLE", "auto").lower()
+    #"react" re-prompts the model after every tool call; "plan" runs each planned batch of calls in one go
+    agent_mode: str = os.getenv("AGENT_MODE", "react").lower()
+    parallel_reads_enabled: bool = os.getenv("PARALLEL_READS_ENABLED", "true").lower() in ("1", "true", "yes")
+    watchdog_enabled: bool = os.getenv("WATCHDOG_ENABLED", "true").lower() in ("1", "true", "yes")
+    agent_time_budget: float = float(os.getenv("AGENT_TIME_BUDGET", "600"))
+
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    metrics_trace_path: str = os.getenv("METRICS_TRACE_PATH", ".lms_state/traces.jsonl")
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+
+    moodle_ws_enabled: bool = os.getenv("MOODLE_WS_ENABLED", "true").lower() in ("1", "true", "yes")
+    moodle_ws_url: str = os.getenv("MOODLE_WS_URL", "")
+    moodle_ws_service: str = os.getenv("MOODLE_WS_SERVICE", "moodle_mobile_app")
+    #a fixed token acts as its owner, so it is for single-user (CLI) use; UI sessions ignore it
+    moodle_ws_token: str = os.getenv("MOODLE_WS_TOKEN", "")
  
\ No newline at end of file
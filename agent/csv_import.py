@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+import io
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from agent.cache import normalize_text
+
+SAMPLE_BYTES = 64 * 1024
+ENCODINGS = ("utf-8-sig", "utf-8", "cp1251", "latin-1")
+DELIMITERS = ",;\t|"
+MAX_SAMPLES = 20
+
+#headers Moodle's CSV import can map users by, keyed by the enrolled-user field they hold
+IDENTIFIER_COLUMNS = {
+    "email": re.compile(r"^(e-?mail( address)?|електронна пошта|адреса електронної пошти)$", re.I),
+    "idnumber": re.compile(r"^(id ?number|ідентифікаційний номер)$", re.I),
+    "username": re.compile(r"^(username|user ?name|логін|ім'я користувача)$", re.I),
+    "id": re.compile(r"^(user ?id)$", re.I),
+}
+#columns of a Moodle grade export that are not grade items
+INFO_COLUMNS = re.compile(
+    r"^(first ?name|surname|last ?name|full ?name|name|ім'я|прізвище|повне ім'я|institution|установа|department|"
+    r"відділ|last downloaded from this course|востаннє завантажено з цього курсу|group|група)$",
+    re.I,
+)
+FEEDBACK_COLUMN = re.compile(r"^(feedback|відгук)\b", re.I)
+#"Assignment: Essay 1 (Real)" -> "Essay 1"
+ITEM_PREFIX = re.compile(r"^[^:]{1,40}:\s*")
+ITEM_SUFFIX = re.compile(r"\s*\((real|percentage|letter|реальн\w*|відсот\w*|літер\w*)\)$", re.I)
+EMPTY_GRADES = {"", "-", "—", "–"}
+NUMBER = re.compile(r"^[+-]?\d+(\.\d+)?$")
+
+
+@dataclass
+class Roster:
+    """Enrolled users of a course by identifier field (lower-cased values), plus its grade item names."""
+
+    users: Dict[str, Set[str]] = field(default_factory=dict)
+    grade_items: List[str] = field(default_factory=list)
+
+
+async def fetch_roster(client: Any, course_id: int) -> Roster:
+    users = await client.call("core_enrol_get_enrolled_users", courseid=course_id)
+    roster = Roster(users={key: set() for key in IDENTIFIER_COLUMNS})
+    for user in users:
+        for key in IDENTIFIER_COLUMNS:
+            value = str(user.get(key) or "").strip().lower()
+            if value:
+                roster.users[key].add(value)
+    #grade items are the same for every user, so one user's report is enough
+    if users:
+        report = await client.call("gradereport_user_get_grade_items", courseid=course_id, userid=users[0]["id"])
+        for usergrade in report.get("usergrades", [])[:1]:
+            roster.grade_items = [i["itemname"] for i in usergrade.get("gradeitems", []) if i.get("itemname")]
+    return roster
+
+
+@dataclass
+class ImportReport:
+    source: str
+    encoding: str = ""
+    delimiter: str = ""
+    rows: int = 0
+    identifier: str = ""
+    grade_columns: List[str] = field(default_factory=list)
+    unknown_columns: List[str] = field(default_factory=list)
+    matched: Optional[int] = None
+    unmatched: List[str] = field(default_factory=list)
+    unmatched_count: int = 0
+    normalized_values: int = 0
+    non_numeric: List[str] = field(default_factory=list)
+    non_numeric_count: int = 0
+    chunks: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "encoding": self.encoding,
+            "delimiter": self.delimiter,
+            "rows": self.rows,
+            "identifier_column": self.identifier,
+            "grade_columns": self.grade_columns,
+            "unknown_columns": self.unknown_columns,
+            "matched_students": self.matched,
+            "unmatched_students": {"count": self.unmatched_count, "examples": self.unmatched},
+            "normalized_numbers": self.normalized_values,
+            "non_numeric_values": {"count": self.non_numeric_count, "examples": self.non_numeric},
+            "chunks": len(self.chunks),
+            "errors": self.errors,
+            "notes": self.notes,
+        }
+
+
+def detect_encoding(sample: bytes) -> str:
+    for encoding in ENCODINGS:
+        if encoding == "utf-8-sig" and not sample.startswith(codecs.BOM_UTF8):
+            continue
+        try:
+            #final=False: the sample may end in the middle of a multi-byte character
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def detect_delimiter(text: str) -> str:
+    try:
+        return csv.Sniffer().sniff(text, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        header = text.splitlines()[0] if text else ""
+        return max(DELIMITERS, key=header.count)
+
+
+def sniff_csv(path: Path) -> Tuple[str, str]:
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_BYTES)
+    encoding = detect_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    #only whole lines, so the sniffer does not see a truncated last row
+    if len(sample) == SAMPLE_BYTES and "\n" in text:
+        text = text[: text.rindex("\n")]
+    return encoding, detect_delimiter(text)
+
+
+def item_name(header: str) -> str:
+    return normalize_text(ITEM_SUFFIX.sub("", ITEM_PREFIX.sub("", header.strip())))
+
+
+def normalize_grade(value: str) -> Tuple[str, bool]:
+    """Grade in the form Moodle parses ("87,5" -> "87.5", "-" -> ""), and whether it is a number or empty."""
+    raw = value.strip()
+    if raw in EMPTY_GRADES:
+        return "", True
+    number = raw.rstrip("%").replace(" ", "").replace(" ", "")
+    if "," in number and "." not in number:
+        number = number.replace(",", ".")
+    if NUMBER.match(number):
+        return number, True
+    return raw, False
+
+
+class _ChunkWriter:
+    """Writes rows to part-NNN.csv files (UTF-8, comma-separated, header repeated) capped by rows and bytes."""
+
+    def __init__(self, out_dir: Path, header: List[str], max_rows: int, max_bytes: int) -> None:
+        self.out_dir = out_dir
+        self.header = self._encode(header)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.paths: List[str] = []
+        self._file: Optional[Any] = None
+        self._rows = 0
+        self._bytes = 0
+
+    def _encode(self, row: List[str]) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(row)
+        return buf.getvalue().encode("utf-8")
+
+    def _open(self) -> None:
+        self.close()
+        path = self.out_dir / f"part-{len(self.paths) + 1:03d}.csv"
+        self._file = open(path, "wb")
+        self._file.write(self.header)
+        self.paths.append(str(path))
+        self._rows = 0
+        self._bytes = len(self.header)
+
+    def write(self, row: List[str]) -> None:
+        line = self._encode(row)
+        if self._file is None or self._rows >= self.max_rows or (self._rows and self._bytes + len(line) > self.max_bytes):
+            self._open()
+        self._file.write(line)
+        self._rows += 1
+        self._bytes += len(line)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_rows(path: Path, encoding: str, delimiter: str) -> Iterator[List[str]]:
+    with open(path, "r", encoding=encoding, newline="") as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            if any(cell.strip() for cell in row):
+                yield row
+
+
+def chunk_dir(root: Path, source: Path) -> Path:
+    stat = source.stat()
+    key = f"{source.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return root / hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _note_sample(samples: List[str], value: str) -> None:
+    if len(samples) < MAX_SAMPLES:
+        samples.append(value)
+
+
+def prepare_import(
+    source: Path,
+    out_dir: Path,
+    roster: Optional[Roster] = None,
+    chunk_rows: int = 1000,
+    chunk_bytes: int = 2 * 1024 * 1024,
+) -> ImportReport:
+    """
+    Validate and normalize a grade CSV in one streaming pass and split it into import-sized chunks.
+
+    Encoding and delimiter are detected from the first SAMPLE_BYTES; rows are then read one at a time,
+    so memory use does not grow with the file. With a roster, identifiers are checked against the
+    enrolled users and column headers against the course's grade items. The report's errors are the
+    problems Moodle would only show after the upload; notes are informational.
+    """
+    report = ImportReport(source=str(source))
+    if not source.is_file():
+        report.errors.append(f"File not found: {source}")
+        return report
+    report.encoding, report.delimiter = sniff_csv(source)
+    if report.encoding == "latin-1":
+        report.notes.append("Encoding could not be detected reliably; the file was read as latin-1.")
+
+    rows = read_rows(source, report.encoding, report.delimiter)
+    header = [h.strip() for h in next(rows, [])]
+    if not header:
+        report.errors.append("The file is empty.")
+        return report
+
+    id_col = next(
+        ((i, key) for key, pattern in IDENTIFIER_COLUMNS.items() for i, h in enumerate(header) if pattern.match(h)),
+        None,
+    )
+    if id_col is None:
+        report.errors.append(
+            "No user identifier column. Moodle matches rows by email, username, ID number or user id; "
+            f"found columns: {', '.join(header)}."
+        )
+        return report
+    id_index, report.identifier = id_col
+
+    grade_indexes = [
+        i
+        for i, h in enumerate(header)
+        if not any(p.match(h) for p in (INFO_COLUMNS, FEEDBACK_COLUMN, *IDENTIFIER_COLUMNS.values()))
+    ]
+    report.grade_columns = [header[i] for i in grade_indexes]
+    if not grade_indexes:
+        report.errors.append("No grade columns found next to the identifier column.")
+        return report
+    if roster is not None and roster.grade_items:
+        known = {normalize_text(n) for n in roster.grade_items}
+        report.unknown_columns = [header[i] for i in grade_indexes if item_name(header[i]) not in known]
+        if report.unknown_columns:
+            report.notes.append("Unknown columns can only be imported as new grade items in the mapping form.")
+    enrolled = roster.users.get(report.identifier) if roster is not None else None
+    if enrolled is not None:
+        report.matched = 0
+    else:
+        report.notes.append("Students were not checked against the course roster (web services unavailable).")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("part-*.csv"):
+        old.unlink()
+    writer = _ChunkWriter(out_dir, header, chunk_rows, chunk_bytes)
+    try:
+        for row in rows:
+            report.rows += 1
+            row = row + [""] * (len(header) - len(row))
+            ident = row[id_index].strip()
+            if enrolled is not None:
+                if ident.lower() in enrolled:
+                    report.matched += 1
+                else:
+                    report.unmatched_count += 1
+                    _note_sample(report.unmatched, ident or f"(empty, row {report.rows + 1})")
+            for i in grade_indexes:
+                value, numeric = normalize_grade(row[i])
+                if value != row[i]:
+                    report.normalized_values += 1
+                if not numeric:
+                    report.non_numeric_count += 1
+                    _note_sample(report.non_numeric, f"row {report.rows + 1}, {header[i]}: {value}")
+                row[i] = value
+            row[id_index] = ident
+            writer.write(row)
+    except UnicodeDecodeError as e:
+        report.errors.append(f"Row {report.rows + 1} is not valid {report.encoding}: {e.reason}. Re-save the file as UTF-8.")
+    finally:
+        writer.close()
+    report.chunks = writer.paths
+
+    if report.rows == 0:
+        report.errors.append("The file has a header but no rows.")
+    if report.unmatched_count:
+        report.errors.append(
+            f"{report.unmatched_count} row(s) do not match an enrolled student by {report.identifier}; "
+            "Moodle would reject them."
+        )
+    if report.non_numeric_count:
+        report.notes.append("Non-numeric grades are only valid for scale or letter items.")
+    return report
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+
+from agent.metrics import tool_failed
+from agent.runtime import current_runtime, open_tab, use_page
+from agent.watchdog import PAGE_LOADERS, Watchdog, tool_access
+
+
+@dataclass
+class _Slot:
+    action: AgentAction
+    access: str
+    waits_for: List[asyncio.Event]
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    #read-only calls after the first one in a concurrent group work on a separate tab, if the page allows it
+    needs_tab: bool = False
+
+
+class _Turn:
+    """Ordering constraints between the tool calls of one model turn."""
+
+    def __init__(self) -> None:
+        self.slots: List[_Slot] = []
+        #reads that cannot have their own tab take turns on the main page
+        self.main_page = asyncio.Lock()
+
+    def add(self, action: AgentAction, parallel: bool) -> None:
+        access = tool_access(action.tool) if parallel else "write"
+        if access == "write":
+            #a mutating call starts once everything before it has finished
+            waits_for = [s.done for s in self.slots]
+        else:
+            #a read waits only for the last mutating call before it
+            last_write = next((s for s in reversed(self.slots) if s.access == "write"), None)
+            waits_for = [last_write.done] if last_write else []
+        slot = _Slot(action, access, waits_for)
+        if access == "read":
+            group = self.slots[self.slots.index(last_write) + 1 :] if last_write else self.slots
+            slot.needs_tab = any(s.access == "read" for s in group)
+        self.slots.append(slot)
+
+    def slot(self, action: AgentAction) -> Optional[_Slot]:
+        return next((s for s in self.slots if s.action is action), None)
+
+
+_TURN: ContextVar[Optional[_Turn]] = ContextVar("lms_turn", default=None)
+_WATCHDOG: ContextVar[Optional[Watchdog]] = ContextVar("lms_watchdog", default=None)
+
+
+class LMSAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor whose multi-call turns respect the single browser page. The stock async executor
+    gathers every tool call of a turn at once, so two clicks or a click and an extract race on the
+    same page. Here mutating calls run in order, each after everything before it; read-only calls
+    between them run concurrently, page readers on their own tab at the current URL, so a turn with
+    several extractions takes as long as the slowest one. A new tab re-GETs the URL and would lose
+    open dialogs, form input and POST results, so page readers only get one while the page is as
+    navigate loaded it; otherwise they run one after another on the main page.
+
+    With watchdog on, every request gets a Watchdog that looks at the steps before each model call
+    and either appends a corrective hint to the last result or finishes with a partial answer.
+    """
+
+    parallel_reads: bool = True
+    watchdog: bool = True
+    #seconds per request before the watchdog stops between turns; 0 = no budget
+    time_budget: float = 0.0
+
+    async def _acall(self, inputs: Dict[str, Any], run_manager: Optional[Any] = None) -> Dict[str, Any]:
+        token = _WATCHDOG.set(Watchdog(budget=self.time_budget or None) if self.watchdog else None)
+        try:
+            return await super()._acall(inputs, run_manager)
+        finally:
+            _WATCHDOG.reset(token)
+
+    async def _aiter_next_step(
+        self,
+        name_to_tool_map: Dict[str, Any],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, Any],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[Any] = None,
+    ) -> AsyncIterator[Any]:
+        watchdog = _WATCHDOG.get()
+        verdict = watchdog.check(intermediate_steps) if watchdog is not None else None
+        if verdict is not None and verdict.stop:
+            output = Watchdog.partial_answer(verdict, intermediate_steps)
+            yield AgentFinish({"output": output}, f"Watchdog stopped the run: {verdict.message}")
+            return
+        if verdict is not None:
+            #the executor's own list, so the hint reaches the model through the scratchpad
+            action, observation = intermediate_steps[-1]
+            intermediate_steps[-1] = (action, f"{observation}{Watchdog.hint(verdict.message)}")
+
+        turn = _Turn()
+        #not reset on exit: the generator may be closed from another context, and the next step replaces it anyway
+        _TURN.set(turn)
+        #the parent yields every action before it gathers them, so the turn is complete by then
+        async for item in super()._aiter_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+        ):
+            if isinstance(item, AgentAction):
+                turn.add(item, self.parallel_reads)
+            yield item
+
+    async def _aperform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, Any],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[Any] = None,
+    ) -> AgentStep:
+        perform = super()._aperform_agent_action
+        turn = _TURN.get()
+        slot = turn.slot(agent_action) if turn is not None else None
+        if slot is None:
+            return await perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+        try:
+            for event in slot.waits_for:
+                await event.wait()
+            runtime = current_runtime()
+            if slot.access == "write":
+                #slots are all "write" with parallel reads off, so the tool's own access decides what changes the page
+                changes_page = tool_access(agent_action.tool) == "write"
+                if changes_page:
+                    runtime.page_reloadable = False
+                step = await perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+                if changes_page:
+                    runtime.page_reloadable = agent_action.tool in PAGE_LOADERS and not tool_failed(step.observation)
+                watchdog = _WATCHDOG.get()
+                #before done is set, so the next call does not see a half-recorded page history
+                if changes_page and watchdog is not None and runtime.page is not None:
+                    await watchdog.record_page(runtime.page)
+                return step
+            if slot.access == "none":
+                return await perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+            if not (slot.needs_tab and runtime.page_reloadable) or runtime.context is None or runtime.page is None:
+                async with turn.main_page:
+                    return await perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+            async with open_tab(runtime, runtime.page.url) as tab:
+                with use_page(tab):
+                    return await perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+        finally:
+            slot.done.set()
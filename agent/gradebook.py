@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agent.cache import normalize_text
+from agent.config import Settings
+from agent.csv_import import FEEDBACK_COLUMN, IDENTIFIER_COLUMNS, INFO_COLUMNS, item_name, normalize_grade, read_rows, sniff_csv
+from agent.moodle_ws import MoodleWSError
+from agent.site_index import best_matches
+
+#course total and category rows of the user report have no item name
+ITEM_TYPES = {"course": "Course total", "category": "Category total"}
+NAME_COLUMNS = re.compile(r"^(first ?name|surname|last ?name|full ?name|ім'я|прізвище|повне ім'я)$", re.I)
+COURSE_TOTAL = ("course total", "підсумок курсу")
+
+
+@dataclass(frozen=True)
+class GradeRecord:
+    user_id: int
+    student: str
+    item: str
+    item_type: str
+    grade: Optional[float]
+    grade_max: Optional[float]
+    grade_text: str = ""
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_course_grades(client: Any, course_id: int) -> Tuple[str, List[GradeRecord]]:
+    """
+    Every user's grade items via gradereport_user_get_grade_items. userid=0 returns the whole class but
+    needs the teacher's view-all capability; students fall back to their own report.
+    """
+    try:
+        report = await client.call("gradereport_user_get_grade_items", courseid=course_id, userid=0)
+        scope = "course"
+    except MoodleWSError:
+        report = await client.call(
+            "gradereport_user_get_grade_items", courseid=course_id, userid=await client.user_id()
+        )
+        scope = "self"
+    records = []
+    for usergrade in report.get("usergrades", []):
+        for item in usergrade.get("gradeitems", []):
+            item_type = item.get("itemtype") or ""
+            records.append(
+                GradeRecord(
+                    user_id=int(usergrade.get("userid") or 0),
+                    student=usergrade.get("userfullname") or "",
+                    item=item.get("itemname") or ITEM_TYPES.get(item_type, item_type),
+                    item_type=item_type,
+                    grade=_float(item.get("graderaw")),
+                    grade_max=_float(item.get("grademax")),
+                    grade_text=item.get("gradeformatted") or "",
+                )
+            )
+    return scope, records
+
+
+def read_export(path: Path) -> List[GradeRecord]:
+    """Grade records from a Moodle gradebook export in CSV/TSV ("Plain text file") format."""
+    encoding, delimiter = sniff_csv(path)
+    rows = read_rows(path, encoding, delimiter)
+    header = [h.strip() for h in next(rows, [])]
+    names = [i for i, h in enumerate(header) if NAME_COLUMNS.match(h)]
+    items = [
+        i
+        for i, h in enumerate(header)
+        if not any(p.match(h) for p in (INFO_COLUMNS, FEEDBACK_COLUMN, *IDENTIFIER_COLUMNS.values()))
+    ]
+    if not names or not items:
+        raise ValueError("Not a Moodle grade export: expected name columns and grade item columns.")
+    records = []
+    for index, row in enumerate(rows, start=1):
+        row = row + [""] * (len(header) - len(row))
+        student = " ".join(row[i].strip() for i in names)
+        for i in items:
+            text, numeric = normalize_grade(row[i])
+            is_total = item_name(header[i]) in COURSE_TOTAL
+            records.append(
+                GradeRecord(
+                    user_id=-index,
+                    student=student,
+                    item=header[i],
+                    item_type="course" if is_total else "mod",
+                    grade=float(text) if numeric and text else None,
+                    grade_max=None,
+                    grade_text=row[i].strip(),
+                )
+            )
+    return records
+
+
+class GradebookStore:
+    """
+    Local snapshots of course gradebooks in one SQLite file per LMS user. A snapshot is replaced as a
+    whole on sync and considered fresh for ttl seconds; frame() keeps the last loaded DataFrame per
+    course, so repeated questions about the same course are answered without touching SQLite.
+    """
+
+    def __init__(self, path: Path, ttl: float = 900.0) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._frames: Dict[int, Tuple[float, Any]] = {}
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    course_id INTEGER PRIMARY KEY,
+                    synced_at REAL NOT NULL,
+                    scope TEXT NOT NULL,
+                    source TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS grades (
+                    course_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    student TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    item_type TEXT NOT NULL,
+                    grade REAL,
+                    grade_max REAL,
+                    grade_text TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS grades_course ON grades (course_id);
+                """
+            )
+
+    def snapshot(self, course_id: int) -> Optional[Tuple[float, str, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT synced_at, scope, source FROM snapshots WHERE course_id = ?", (course_id,)
+            ).fetchone()
+
+    def is_fresh(self, course_id: int) -> bool:
+        info = self.snapshot(course_id)
+        return info is not None and time.time() - info[0] <= self.ttl
+
+    def replace(self, course_id: int, records: Iterable[GradeRecord], scope: str, source: str) -> float:
+        synced_at = time.time()
+        rows = [
+            (course_id, r.user_id, r.student, r.item, r.item_type, r.grade, r.grade_max, r.grade_text) for r in records
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM grades WHERE course_id = ?", (course_id,))
+            self._conn.executemany("INSERT INTO grades VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute(
+                "INSERT INTO snapshots VALUES (?, ?, ?, ?) ON CONFLICT(course_id) DO UPDATE SET "
+                "synced_at = excluded.synced_at, scope = excluded.scope, source = excluded.source",
+                (course_id, synced_at, scope, source),
+            )
+        self._frames.pop(course_id, None)
+        return synced_at
+
+    def invalidate(self, course_id: Optional[int] = None) -> None:
+        """Mark a course's snapshot stale after grades changed, or every course's when the course is unknown."""
+        with self._lock, self._conn:
+            if course_id is None:
+                self._conn.execute("UPDATE snapshots SET synced_at = 0")
+            else:
+                self._conn.execute("UPDATE snapshots SET synced_at = 0 WHERE course_id = ?", (course_id,))
+
+    def frame(self, course_id: int) -> Any:
+        """The course snapshot as a pandas DataFrame with a percent column."""
+        import pandas as pd
+
+        info = self.snapshot(course_id)
+        synced_at = info[0] if info else 0.0
+        cached = self._frames.get(course_id)
+        if cached is not None and cached[0] == synced_at:
+            return cached[1]
+        with self._lock:
+            frame = pd.read_sql_query(
+                "SELECT user_id, student, item, item_type, grade, grade_max, grade_text FROM grades WHERE course_id = ?",
+                self._conn,
+                params=(course_id,),
+            )
+        frame["grade"] = pd.to_numeric(frame["grade"], errors="coerce")
+        frame["grade_max"] = pd.to_numeric(frame["grade_max"], errors="coerce")
+        frame["percent"] = (frame["grade"] / frame["grade_max"] * 100).round(2)
+        self._frames[course_id] = (synced_at, frame)
+        return frame
+
+
+_STORES: Dict[Path, GradebookStore] = {}
+
+
+def gradebook_for(cfg: Settings) -> GradebookStore:
+    """Shared store for cfg.lms_username, so sessions of the same user reuse its snapshots."""
+    key = f"{cfg.lms_base_url.rstrip('/')}|{cfg.lms_username.strip().lower()}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    path = Path(cfg.storage_state_dir) / "gradebook" / f"{digest}.sqlite3"
+    if path not in _STORES:
+        _STORES[path] = GradebookStore(path, cfg.gradebook_ttl)
+    return _STORES[path]
+
+
+def match_items(frame: Any, query: str) -> List[str]:
+    """Item names in the snapshot that best match a fuzzy item query, best first."""
+    names = sorted(set(frame["item"]))
+    return [name for _, name in best_matches(query, ((n, [n, item_name(n)]) for n in names), limit=len(names))]
+
+
+def _plain(frame: Any) -> Any:
+    #NaN is not valid JSON
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def query_frame(
+    frame: Any,
+    items: Optional[List[str]] = None,
+    student: Optional[str] = None,
+    below: Optional[float] = None,
+    above: Optional[float] = None,
+    percent: bool = False,
+    aggregate: str = "summary",
+) -> Any:
+    """Filter a snapshot frame with column masks and aggregate per item; totals are only included when asked for."""
+    column = "percent" if percent else "grade"
+    if percent and frame["grade_max"].isna().all():
+        raise ValueError(
+            "this snapshot has no maximum grades (gradebook exports do not include them), so percentages are "
+            "unavailable; query raw grades, or re-sync from web services with refresh=true."
+        )
+    mask = frame["item"].isin(items) if items else ~frame["item_type"].isin(list(ITEM_TYPES))
+    if student:
+        mask &= frame["student"].str.lower().str.contains(normalize_text(student), regex=False)
+    if below is not None:
+        mask &= frame[column] < below
+    if above is not None:
+        mask &= frame[column] > above
+    selected = frame[mask]
+
+    if aggregate == "list":
+        rows = selected.sort_values(["item", column], na_position="last")
+        return _plain(rows[["student", "item", "grade", "grade_max", "percent", "grade_text"]]).to_dict("records")
+    if aggregate == "count":
+        return selected.groupby("item")[column].count().to_dict()
+    if aggregate in ("mean", "median", "min", "max"):
+        return _plain(selected.groupby("item")[column].agg(aggregate).round(2)).to_dict()
+    stats = selected.groupby("item")[column].agg(["count", "mean", "median", "min", "max"]).round(2)
+    stats["rows"] = selected.groupby("item").size()
+    return _plain(stats.reset_index()).to_dict("records")
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from agent.cache import normalize_text
+
+STEP_TIMEOUT_MS = 10_000
+MAX_CONSECUTIVE_FAILURES = 2
+#progress of an interrupted batch is only resumed within this many seconds
+PROGRESS_TTL = 24 * 3600
+
+CHANGE_USER = re.compile(r"Змінити студента|Change user", re.I)
+SAVE_BUTTON = re.compile(r"^\s*(Зберегти зміни|Зберегти|Save changes)\s*$", re.I)
+
+SET_FEEDBACK_JS = """
+([text]) => {
+    const area = document.querySelector("textarea[name^='assignfeedbackcomments_editor']");
+    if (!area) return false;
+    const editor = window.tinymce && window.tinymce.get(area.id);
+    if (editor) {
+        editor.setContent(text);
+        editor.save();
+    } else {
+        area.value = text;
+        area.dispatchEvent(new Event("change", { bubbles: true }));
+    }
+    return true;
+}
+"""
+
+
+@dataclass(frozen=True)
+class GradeRow:
+    student: str
+    grade: str
+    feedback: str = ""
+
+    @property
+    def key(self) -> str:
+        return normalize_text(self.student)
+
+    @property
+    def signature(self) -> str:
+        return hashlib.sha1(f"{self.grade}\x00{self.feedback}".encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class RowResult:
+    student: str
+    status: str
+    detail: str = ""
+    seconds: float = 0.0
+
+
+class GradingProgress:
+    """
+    Saved rows of an interrupted batch, per LMS user and assignment, so a rerun after a failure
+    resumes where it stopped. It is cleared once a batch completes and ignored after PROGRESS_TTL,
+    so a later deliberate regrade with the same values is not skipped.
+    """
+
+    def __init__(self, directory: Path, assignment: str, user: str = "") -> None:
+        key = f"{user.strip().lower()}\x00{assignment}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+        self.path = directory / f"{digest}.json"
+        self.done: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                data = {}
+            if time.time() - data.get("updated", 0) <= PROGRESS_TTL:
+                self.done = data.get("done", {})
+
+    def is_done(self, row: GradeRow) -> bool:
+        return self.done.get(row.key) == row.signature
+
+    def mark(self, row: GradeRow) -> None:
+        self.done[row.key] = row.signature
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"done": self.done, "updated": time.time()}, ensure_ascii=False), encoding="utf-8")
+
+    def reset(self) -> None:
+        self.done = {}
+        self.path.unlink(missing_ok=True)
+
+
+def grader_url(base_url: str, assignment: str) -> str:
+    """Accepts a course-module id or any assignment URL and returns the grader page URL."""
+    assignment = assignment.strip()
+    if assignment.isdigit():
+        return f"{base_url.rstrip('/')}/mod/assign/view.php?id={assignment}&action=grader"
+    if "action=grader" in assignment:
+        return assignment
+    match = re.search(r"[?&]id=(\d+)", assignment)
+    if match and "/mod/assign/" in assignment:
+        return f"{base_url.rstrip('/')}/mod/assign/view.php?id={match.group(1)}&action=grader"
+    return assignment
+
+
+def _names(text: str) -> List[str]:
+    """Lines of an option or header, whitespace-collapsed and case-folded (name and identity fields are separate lines)."""
+    return [" ".join(line.split()).casefold() for line in text.splitlines() if line.strip()]
+
+
+async def _select_student(page: Any, student: str) -> None:
+    name = " ".join(student.split()).casefold()
+    search = page.get_by_placeholder(CHANGE_USER).or_(page.get_by_role("combobox", name=CHANGE_USER)).first
+    await search.click(timeout=STEP_TIMEOUT_MS)
+    await search.fill(student, timeout=STEP_TIMEOUT_MS)
+
+    #the exact full name, never a substring: "Ann Lee" must not pick "Joann Leeds" or "Ann Lee-Smith"
+    options = page.get_by_role("option")
+    await options.first.wait_for(timeout=STEP_TIMEOUT_MS)
+    matches = [i for i in range(await options.count()) if name in _names(await options.nth(i).inner_text())]
+    if not matches:
+        raise RuntimeError(f"no student named exactly '{student}' in the grader")
+    if len(matches) > 1:
+        raise RuntimeError(f"{len(matches)} students are named '{student}'; grade them manually")
+    await options.nth(matches[0]).click(timeout=STEP_TIMEOUT_MS)
+
+    #the submission panel is loaded asynchronously; the header shows the selected user's name
+    header = page.locator("[data-region='user-info']").first
+    deadline = time.monotonic() + STEP_TIMEOUT_MS / 1000
+    while name not in _names(await header.inner_text(timeout=STEP_TIMEOUT_MS)):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"the grader did not switch to '{student}'")
+        await asyncio.sleep(0.2)
+    await page.locator("input[name='grade']").first.wait_for(state="visible", timeout=STEP_TIMEOUT_MS)
+
+
+async def _save_and_verify(page: Any) -> None:
+    async with page.expect_response(
+        lambda r: "mod_assign_submit_grading_form" in r.url, timeout=STEP_TIMEOUT_MS
+    ) as response_info:
+        save = page.locator("button[name='savechanges']").or_(page.get_by_role("button", name=SAVE_BUTTON)).first
+        await save.click(timeout=STEP_TIMEOUT_MS)
+    response = await response_info.value
+    if not response.ok:
+        raise RuntimeError(f"save request failed with HTTP {response.status}")
+    payload = await response.json()
+    first = payload[0] if isinstance(payload, list) and payload else {}
+    if first.get("error"):
+        raise RuntimeError(str(first.get("exception", {}).get("message") or "save rejected"))
+    warnings = first.get("data") or []
+    if warnings:
+        raise RuntimeError("; ".join(str(w.get("message", w)) for w in warnings))
+
+
+async def grade_row(page: Any, row: GradeRow) -> None:
+    """Scripted version of the 'Change user' grading workflow from the system prompt."""
+    await _select_student(page, row.student)
+    await page.locator("input[name='grade']").first.fill(str(row.grade), timeout=STEP_TIMEOUT_MS)
+    if row.feedback:
+        if not await page.evaluate(SET_FEEDBACK_JS, [row.feedback]):
+            raise RuntimeError("feedback comment field not found")
+    await _save_and_verify(page)
+
+
+async def run_batch(
+    page: Any,
+    url: str,
+    rows: List[GradeRow],
+    progress: GradingProgress,
+) -> List[RowResult]:
+    """
+    Grade rows in order. Rows already saved with the same grade/feedback by an interrupted run are skipped;
+    a failed row is retried once after reloading the grader, and the run stops after
+    MAX_CONSECUTIVE_FAILURES so the next call resumes from the first unsaved row.
+    """
+    report: List[RowResult] = []
+    failures = 0
+    await page.goto(url)
+
+    for index, row in enumerate(rows):
+        if progress.is_done(row):
+            report.append(RowResult(row.student, "skipped", "already saved in a previous run"))
+            continue
+
+        started = time.monotonic()
+        error: Optional[str] = None
+        for attempt in range(2):
+            try:
+                await grade_row(page, row)
+                error = None
+                break
+            except Exception as e:
+                error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                if attempt == 0:
+                    try:
+                        await page.goto(url)
+                    except Exception as reload_error:
+                        #keep the per-row report: the row fails and the batch carries on (or stops) as usual
+                        error = f"{error}; reloading the grader failed: {str(reload_error).splitlines()[0]}"
+                        break
+
+        elapsed = round(time.monotonic() - started, 2)
+        if error is None:
+            progress.mark(row)
+            failures = 0
+            report.append(RowResult(row.student, "saved", seconds=elapsed))
+            continue
+
+        failures += 1
+        report.append(RowResult(row.student, "failed", error, elapsed))
+        if failures >= MAX_CONSECUTIVE_FAILURES:
+            report.extend(RowResult(r.student, "pending", "not attempted; rerun to resume") for r in rows[index + 1 :])
+            break
+
+    if all(r.status in ("saved", "skipped") for r in report):
+        progress.reset()
+    return report
+
+
+def summarize(report: List[RowResult]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for r in report:
+        counts[r.status] = counts.get(r.status, 0) + 1
+    return {"summary": counts, "rows": [asdict(r) for r in report]}
@@ -1,12 +1,348 @@
 from __future__ import annotations
 
-from typing import Dict
-from langchain_core.chat_history import InMemoryChatMessageHistory, BaseChatMessageHistory
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
-HISTORY_STORE: Dict[str, InMemoryChatMessageHistory] = {}
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, messages_from_dict, messages_to_dict
+
+from agent.config import Settings
+from agent.storage_state import SALT_BYTES, derive_fernet
+
+Summarizer = Callable[[str, List[BaseMessage]], Awaitable[str]]
+
+PURGE_INTERVAL = 60.0
+SUMMARY_MAX_CHARS = 4000
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+@functools.lru_cache(maxsize=None)
+def token_encoding() -> Optional[Any]:
+    """tiktoken encoding, loaded on first use (it reads a large BPE file); None falls back to len/4."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    encoding = token_encoding()
+    total = 0
+    for message in messages:
+        text = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        total += 4 + (len(encoding.encode(text)) if encoding is not None else len(text) // 4)
+    return total
+
+
+class SQLiteChatHistory(BaseChatMessageHistory):
+    def __init__(self, store: "SQLiteHistoryStore", session_id: str) -> None:
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        return self.store.load_messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append_messages(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.delete_session(self.session_id)
+
+
+class MemoryHistoryStore:
+    """Process-local store (the previous behaviour) with idle expiry."""
+
+    def __init__(self, idle_ttl: float = 0.0) -> None:
+        self.idle_ttl = idle_ttl
+        self._histories: Dict[str, InMemoryChatMessageHistory] = {}
+        self._summaries: Dict[str, Tuple[str, int]] = {}
+        self._last_access: Dict[str, float] = {}
+        self._last_purge = time.monotonic()
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        self._touch(session_id)
+        if session_id not in self._histories:
+            self._histories[session_id] = InMemoryChatMessageHistory()
+        return self._histories[session_id]
+
+    def load_messages(self, session_id: str, offset: int = 0) -> List[BaseMessage]:
+        return list(self.get(session_id).messages[offset:])
+
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        return self._summaries.get(session_id, ("", 0))
+
+    def save_summary(self, session_id: str, summary: str, folded: int) -> None:
+        self._summaries[session_id] = (summary, folded)
+
+    def purge_idle(self) -> int:
+        if self.idle_ttl <= 0:
+            return 0
+        cutoff = time.monotonic() - self.idle_ttl
+        stale = [sid for sid, at in self._last_access.items() if at < cutoff]
+        for session_id in stale:
+            self._histories.pop(session_id, None)
+            self._summaries.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+        return len(stale)
+
+    def _touch(self, session_id: str) -> None:
+        now = time.monotonic()
+        self._last_access[session_id] = now
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_idle()
+
+
+class SQLiteHistoryStore:
+    """
+    Chat history persisted in a single SQLite file; sessions idle longer than idle_ttl are deleted.
+    Messages and summaries hold students' grades, so they are encrypted with a key derived from secret.
+    """
+
+    def __init__(self, path: str, secret: str, idle_ttl: float = 0.0) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._last_purge = 0.0
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    folded INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+                """
+            )
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('salt', ?)", (os.urandom(SALT_BYTES),))
+            salt = self._conn.execute("SELECT value FROM meta WHERE name = 'salt'").fetchone()[0]
+        os.chmod(path, 0o600)
+        self._fernet = derive_fernet(secret, salt)
+
+    def _seal(self, text: str) -> str:
+        return self._fernet.encrypt(text.encode("utf-8")).decode("ascii") if text else ""
+
+    def _open(self, token: str) -> str:
+        #InvalidToken (e.g. HISTORY_KEY changed) surfaces rather than mixing unreadable rows into a prompt
+        return self._fernet.decrypt(token.encode("ascii")).decode("utf-8") if token else ""
+
+    def get(self, session_id: str) -> BaseChatMessageHistory:
+        self._touch(session_id)
+        return SQLiteChatHistory(self, session_id)
+
+    def load_messages(self, session_id: str, offset: int = 0) -> List[BaseMessage]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY id LIMIT -1 OFFSET ?",
+                (session_id, offset),
+            ).fetchall()
+        return messages_from_dict([json.loads(self._open(row[0])) for row in rows])
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        payload = [(session_id, self._seal(json.dumps(m, ensure_ascii=False))) for m in messages_to_dict(list(messages))]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO messages (session_id, message) VALUES (?, ?)", payload)
+
+    def load_summary(self, session_id: str) -> Tuple[str, int]:
+        with self._lock:
+            row = self._conn.execute("SELECT summary, folded FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return (self._open(row[0]), row[1]) if row else ("", 0)
+
+    def save_summary(self, session_id: str, summary: str, folded: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, folded = ? WHERE session_id = ?",
+                (self._seal(summary), folded, session_id),
+            )
+
+    def delete_session(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_idle(self) -> int:
+        if self.idle_ttl <= 0:
+            return 0
+        cutoff = time.time() - self.idle_ttl
+        with self._lock, self._conn:
+            stale = [r[0] for r in self._conn.execute("SELECT session_id FROM sessions WHERE last_access < ?", (cutoff,))]
+            self._conn.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in stale])
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in stale])
+        return len(stale)
+
+    def _touch(self, session_id: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now),
+            )
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge_idle()
+
+
+def _turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _extractive_summary(previous: str, messages: List[BaseMessage]) -> str:
+    lines = [previous] if previous else []
+    for message in messages:
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        text = " ".join(str(message.content).split())
+        lines.append(f"{role}: {text[:300]}")
+    return "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+
+
+def llm_summarizer(llm: Any) -> Summarizer:
+    async def summarize(previous: str, messages: List[BaseMessage]) -> str:
+        transcript = _extractive_summary("", messages)
+        prompt = [
+            SystemMessage(
+                "You maintain a running summary of a conversation between a user and a Moodle assistant. "
+                "Merge the new exchanges into the summary. Keep names, course titles, grades, ids, URLs and "
+                "open requests; drop small talk. Answer with the updated summary only, at most 200 words."
+            ),
+            HumanMessage(f"Current summary:\n{previous or '(empty)'}\n\nNew exchanges:\n{transcript}"),
+        ]
+        try:
+            result = await llm.ainvoke(prompt, config={"tags": ["history_summary"]})
+            return str(result.content).strip()[:SUMMARY_MAX_CHARS]
+        except Exception:
+            return _extractive_summary(previous, messages)
+
+    return summarize
+
+
+#sessions whose summary is being rewritten in the background, and the tasks doing it
+_SUMMARIZING: Dict[str, "asyncio.Task[None]"] = {}
+
+
+class WindowedHistory(BaseChatMessageHistory):
+    """
+    Token-budgeted view over a stored history. Recent turns are returned verbatim; once they exceed
+    the budget the oldest turns are folded into a rolling summary that is sent as one system message.
+    The LLM summary is written by a background task, so no turn waits for it; until it lands the
+    folded turns are simply outside the window. The full transcript stays in the backing store.
+    """
+
+    def __init__(self, store: Any, session_id: str, token_budget: int, summarizer: Optional[Summarizer] = None) -> None:
+        self.store = store
+        self.session_id = session_id
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self._backing = store.get(session_id)
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        summary, folded = self.store.load_summary(self.session_id)
+        recent = self.store.load_messages(self.session_id, folded)
+        turns = _turns(recent)
+        while len(turns) > 1 and count_tokens([m for t in turns for m in t]) > self.token_budget:
+            turns.pop(0)
+        window = [m for t in turns for m in t]
+        return ([SystemMessage(SUMMARY_PREFIX + summary)] if summary else []) + window
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._backing.add_messages(messages)
+        fold = self._to_fold()
+        if fold is not None:
+            summary, folded, old = fold
+            self.store.save_summary(self.session_id, _extractive_summary(summary, old), folded)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._backing.add_messages(messages)
+        #one summary at a time per session; turns added meanwhile are folded by the next one
+        if self.session_id in _SUMMARIZING:
+            return
+        fold = self._to_fold()
+        if fold is None:
+            return
+        if self.summarizer is None:
+            summary, folded, old = fold
+            self.store.save_summary(self.session_id, _extractive_summary(summary, old), folded)
+            return
+        task = asyncio.get_running_loop().create_task(self._summarize(self.summarizer, *fold))
+        _SUMMARIZING[self.session_id] = task
+        task.add_done_callback(lambda _: _SUMMARIZING.pop(self.session_id, None))
+
+    async def _summarize(self, summarizer: Summarizer, summary: str, folded: int, old: List[BaseMessage]) -> None:
+        self.store.save_summary(self.session_id, await summarizer(summary, old), folded)
+
+    def clear(self) -> None:
+        task = _SUMMARIZING.pop(self.session_id, None)
+        if task is not None:
+            task.cancel()
+        self._backing.clear()
+        self.store.save_summary(self.session_id, "", 0)
+
+    def _to_fold(self) -> Optional[Tuple[str, int, List[BaseMessage]]]:
+        summary, folded = self.store.load_summary(self.session_id)
+        turns = _turns(self.store.load_messages(self.session_id, folded))
+        if count_tokens([m for t in turns for m in t]) <= self.token_budget:
+            return None
+        #fold until the verbatim window is back under three quarters of the budget, always keeping the last turn
+        old: List[BaseMessage] = []
+        while len(turns) > 1 and count_tokens([m for t in turns for m in t]) > self.token_budget * 3 // 4:
+            old.extend(turns.pop(0))
+        if not old:
+            return None
+        return summary, folded + len(old), old
+
+
+def build_history_store(cfg: Settings) -> Any:
+    #transcripts are never written to disk in plaintext: without a key, history stays in memory
+    if cfg.history_backend == "memory" or not cfg.history_key:
+        return MemoryHistoryStore(idle_ttl=cfg.history_idle_ttl)
+    return SQLiteHistoryStore(cfg.history_db_path, cfg.history_key, idle_ttl=cfg.history_idle_ttl)
+
+
+_STORES: Dict[Tuple[str, str], Any] = {}
+
+
+def history_factory(cfg: Settings, summarizer: Optional[Summarizer] = None) -> Callable[[str], BaseChatMessageHistory]:
+    """get_session_history callable for RunnableWithMessageHistory, backed by the configured store."""
+    key = (cfg.history_backend, cfg.history_db_path)
+    if key not in _STORES:
+        _STORES[key] = build_history_store(cfg)
+    store = _STORES[key]
+
+    def get(session_id: str) -> BaseChatMessageHistory:
+        if cfg.history_token_budget > 0:
+            return WindowedHistory(store, session_id, cfg.history_token_budget, summarizer)
+        return store.get(session_id)
+
+    return get
 
 
 def get_history(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in HISTORY_STORE:
-        HISTORY_STORE[session_id] = InMemoryChatMessageHistory()
-    return HISTORY_STORE[session_id]
+    return history_factory(Settings())(session_id)
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from agent.config import Settings
+from agent.metrics import METRICS
+from agent.pool import POOL, session_runtime
+from agent.runtime import use_runtime
+
+STEP_DETAIL_CHARS = 300
+TERMINAL = ("done", "error", "cancelled")
+
+
+class QueueFull(RuntimeError):
+    """The queue, or the user's share of it, is full; the caller should retry later."""
+
+
+@dataclass
+class RunEvent:
+    kind: str
+    name: str = ""
+    detail: str = ""
+
+
+def _short(value: Any) -> str:
+    text = value if isinstance(value, str) else str(getattr(value, "content", value))
+    text = " ".join(text.split())
+    return text if len(text) <= STEP_DETAIL_CHARS else text[: STEP_DETAIL_CHARS - 1] + "…"
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+@dataclass
+class Job:
+    """
+    One agent request. Events are appended on the queue's loop and read from any thread by index,
+    so a poller that comes back later (e.g. after a Streamlit rerun) replays what it missed.
+    """
+
+    id: str
+    owner: str
+    session_id: str
+    run: Callable[["Job"], Awaitable[str]]
+    status: str = "queued"
+    answer: Optional[str] = None
+    events: List[RunEvent] = field(default_factory=list)
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _task: Optional[asyncio.Task] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event)
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def emit(self, event: RunEvent) -> None:
+        self.events.append(event)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+
+JobFn = Callable[[Job], Awaitable[str]]
+
+
+def agent_job(agent: Any, cfg: Settings, session_id: str, text: str) -> JobFn:
+    """A job that streams one agent run: tool calls, answer tokens, then the final answer."""
+
+    async def run(job: Job) -> str:
+        answer = ""
+        runtime = await session_runtime(cfg, session_id)
+        #a long run must not look idle to the pool's reaper
+        with use_runtime(runtime), POOL.busy(session_id), METRICS.request(session_id):
+            async for ev in agent.astream_events(
+                {"input": text},
+                config={"configurable": {"session_id": session_id}},
+                version="v2",
+            ):
+                kind = ev["event"]
+                if kind == "on_tool_start":
+                    job.emit(RunEvent("tool_start", ev["name"], _short(ev["data"].get("input", ""))))
+                elif kind == "on_tool_end":
+                    job.emit(RunEvent("tool_end", ev["name"], _short(ev["data"].get("output", ""))))
+                elif kind == "on_chat_model_stream" and "history_summary" not in ev.get("tags", []):
+                    token = _chunk_text(ev["data"].get("chunk"))
+                    if token:
+                        job.emit(RunEvent("token", detail=token))
+                elif kind == "on_chain_end" and not ev.get("parent_ids"):
+                    output = ev["data"].get("output")
+                    answer = output.get("output", "") if isinstance(output, dict) else str(output or "")
+        return answer
+
+    return run
+
+
+class JobQueue:
+    """
+    Runs agent jobs on one event loop with at most max_workers at a time. Pending jobs wait in one
+    FIFO per owner (LMS user) and owners are served round-robin, so a user with many long browser
+    tasks does not hold up everyone else; a session runs one job at a time, since it has one page.
+    submit() and cancel() may be called from any thread; submit() raises QueueFull instead of
+    queueing without bound. Finished jobs stay pollable for keep seconds.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        max_workers: int = 4,
+        max_queued: int = 64,
+        max_per_owner: int = 3,
+        keep: float = 900.0,
+    ) -> None:
+        self.loop = loop
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_per_owner = max_per_owner
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        #owner -> pending jobs; the order of owners is the round-robin order
+        self._pending: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._running: Dict[str, Job] = {}
+
+    @classmethod
+    def from_settings(cls, cfg: Settings, loop: asyncio.AbstractEventLoop) -> "JobQueue":
+        return cls(loop, cfg.jobs_max_workers, cfg.jobs_max_queued, cfg.jobs_max_per_user, cfg.jobs_result_ttl)
+
+    def submit(self, owner: str, session_id: str, run: JobFn) -> str:
+        owner = owner.strip().lower() or "anonymous"
+        with self._lock:
+            self._prune_locked()
+            queued = sum(len(q) for q in self._pending.values())
+            if queued >= self.max_queued:
+                raise QueueFull(f"The agent is busy ({queued} requests waiting). Try again in a minute.")
+            mine = len(self._pending.get(owner, ())) + sum(j.owner == owner for j in self._running.values())
+            if mine >= self.max_per_owner:
+                raise QueueFull(f"You already have {mine} requests in progress. Wait for one to finish.")
+            job = Job(id=uuid.uuid4().hex, owner=owner, session_id=session_id, run=run, _loop=self.loop)
+            self._jobs[job.id] = job
+            self._pending.setdefault(owner, deque()).append(job)
+        self.loop.call_soon_threadsafe(self._dispatch)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def poll(self, job_id: str, since: int = 0) -> Tuple[List[RunEvent], Optional[Job]]:
+        """Events after the first since ones, and the job (None once it has been pruned)."""
+        job = self._jobs.get(job_id)
+        return (job.events[since:], job) if job is not None else ([], None)
+
+    def position(self, job_id: str) -> int:
+        """Pending jobs that start before this one, counting the round-robin over owners; 0 once running."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return 0
+            mine = list(self._pending.get(job.owner, ()))
+            index = mine.index(job) if job in mine else 0
+            return sum(min(len(q), index + 1) for o, q in self._pending.items() if o != job.owner) + index
+
+    def cancel(self, job_id: str) -> None:
+        self.loop.call_soon_threadsafe(self._cancel, job_id)
+
+    def cancel_session(self, session_id: str) -> None:
+        for job in list(self._jobs.values()):
+            if job.session_id == session_id and not job.done:
+                self.cancel(job.id)
+
+    async def follow(self, job_id: str) -> AsyncIterator[RunEvent]:
+        """Events of a job as they arrive, ending with its terminal event; only on the queue's loop."""
+        seen = 0
+        while True:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job._changed.clear()
+            events = job.events[seen:]
+            seen += len(events)
+            for event in events:
+                yield event
+            if job.done and seen == len(job.events):
+                return
+            await job._changed.wait()
+
+    async def wait(self, job_id: str) -> Optional[Job]:
+        async for _ in self.follow(job_id):
+            pass
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "queued": sum(len(q) for q in self._pending.values()),
+                "owners": len(self._pending),
+            }
+
+    def _next_locked(self) -> Optional[Job]:
+        busy = {j.session_id for j in self._running.values()}
+        for owner in list(self._pending):
+            queue = self._pending[owner]
+            job = next((j for j in queue if j.session_id not in busy), None)
+            if job is None:
+                continue
+            queue.remove(job)
+            #the owner goes to the back of the round-robin
+            del self._pending[owner]
+            if queue:
+                self._pending[owner] = queue
+            return job
+        return None
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            while len(self._running) < self.max_workers:
+                job = self._next_locked()
+                if job is None:
+                    break
+                self._running[job.id] = job
+                job.status = "running"
+                job.started = time.time()
+                job._task = self.loop.create_task(self._run(job))
+                job._task.add_done_callback(lambda _, job=job: self._finish(job))
+
+    async def _run(self, job: Job) -> None:
+        METRICS.record("job", "queue_wait", job.started - job.submitted)
+        try:
+            job.answer = await job.run(job)
+            job.status = "done"
+            job.emit(RunEvent("done", detail=job.answer))
+        except Exception as e:
+            job.status = "error"
+            job.answer = f"Agent error: {e}"
+            job.emit(RunEvent("error", detail=str(e)))
+
+    def _finish(self, job: Job) -> None:
+        #a done callback rather than finally: a task cancelled before its first step never enters the coroutine
+        if not job.done:
+            job.status = "cancelled"
+            job.emit(RunEvent("cancelled"))
+        job.finished = time.time()
+        METRICS.record("job", "run", job.finished - job.started, ok=job.status == "done")
+        with self._lock:
+            self._running.pop(job.id, None)
+        self._dispatch()
+
+    def _cancel(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return
+        if job._task is not None:
+            job._task.cancel()
+            return
+        with self._lock:
+            queue = self._pending.get(job.owner)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._pending[job.owner]
+        job.status = "cancelled"
+        job.finished = time.time()
+        job.emit(RunEvent("cancelled"))
+
+    def _prune_locked(self) -> None:
+        now = time.time()
+        for job_id in [i for i, j in self._jobs.items() if j.done and now - (j.finished or now) > self.keep]:
+            del self._jobs[job_id]
@@ -1,30 +1,302 @@
 from __future__ import annotations
 
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
 
 from agent.config import Settings
+from agent.metrics import tool_failed
 
+FAST, STRONG = "fast", "strong"
+PROVIDERS = ("openai", "google")
+#provider SDKs are heavy; each is imported the first time a model of that provider is built
+PROVIDER_MODULES = {"openai": "langchain_openai", "google": "langchain_google_genai"}
 
-def build_llm(cfg: Settings):
-    provider = cfg.llm_provider
+#multi-step procedures that the fast tier tends to get wrong: changes to the LMS and cross-course work.
+#Reading one's own grade ("What's my grade in X?") is the most common simple turn and stays fast.
+COMPLEX_REQUEST = re.compile(
+    r"\b(import|csv|upload|submit|compare)\b"
+    r"|\b(grade|mark|assess)\s+(the\s+|all\s+|these\s+|my\s+)?(students?|submissions?|works?)\b"
+    r"|\bset\s+(the\s+|a\s+)?grades?\b|\b(every|each)\s+course|\ball\s+(my\s+|of\s+my\s+)?courses\b"
+    r"|(постав|вистав)\w*\s+(\w+\s+)?оцін|оцінит|оцініть|імпорт|завантаж|кожн\w*\s+курс|всіх\s+(моїх\s+)?курс",
+    re.I,
+)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    provider: str
+    model_name: str
+    tier: str
+    model: BaseChatModel
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider}:{self.model_name}"
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+def _streams(model: BaseChatModel) -> bool:
+    return type(model)._astream is not BaseChatModel._astream or type(model)._stream is not BaseChatModel._stream
+
+
+def _as_chunk(result: ChatResult) -> ChatGenerationChunk:
+    """Whole response of a non-streaming model as one chunk."""
+    message = result.generations[0].message
+    tool_calls = getattr(message, "tool_calls", None) or []
+    return ChatGenerationChunk(
+        message=AIMessageChunk(
+            content=message.content,
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c.get("id"), "index": i}
+                for i, c in enumerate(tool_calls)
+            ],
+            usage_metadata=getattr(message, "usage_metadata", None),
+            response_metadata=message.response_metadata,
+        )
+    )
+
+
+def choose_tier(messages: Sequence[BaseMessage], escalate_after: int) -> str:
+    """
+    Fast tier for short, simple turns; strong tier for long or multi-step requests, turns that already
+    took escalate_after steps, and turns whose last tool call failed.
+    """
+    last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    request = str(messages[last_human].content) if last_human >= 0 else ""
+    turn = messages[last_human + 1 :]
+
+    if len(request) > 600 or COMPLEX_REQUEST.search(request):
+        return STRONG
+    if sum(isinstance(m, AIMessage) for m in turn) >= escalate_after:
+        return STRONG
+    outputs = [m for m in turn if isinstance(m, ToolMessage)]
+    if outputs and tool_failed(outputs[-1]):
+        return STRONG
+    return FAST
+
+
+class LLMRouter(BaseChatModel):
+    """
+    Chat model that routes each call to a fast or strong model and fails over between candidates
+    (other provider, then stronger tier) on errors and timeouts. Every attempt has its own deadline,
+    capped by what is left of the call's overall total_timeout.
+    Inner models are called directly, so callbacks and token usage are reported once, on the router.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    candidates: List[Candidate]
+    timeout: float = 60.0
+    total_timeout: float = 120.0
+    retries: int = 1
+    escalate_after: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "lms-router"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "LLMRouter":
+        bound = []
+        for c in self.candidates:
+            binding = c.model.bind_tools(tools, **kwargs)
+            bound.append(replace(c, kwargs={**c.kwargs, **getattr(binding, "kwargs", {})}))
+        return self.model_copy(update={"candidates": bound})
+
+    def plan(self, messages: Sequence[BaseMessage]) -> List[Candidate]:
+        """
+        Attempt order: the chosen tier's primary model (retried), its other provider, then the other
+        tier (escalation for fast turns, degraded service for strong ones).
+        """
+        fast = [c for c in self.candidates if c.tier == FAST]
+        strong = [c for c in self.candidates if c.tier == STRONG]
+        ordered = fast + strong if choose_tier(messages, self.escalate_after) == FAST else strong + fast
+        return ordered[:1] * self.retries + ordered
+
+    def _annotate(self, result: ChatResult, candidate: Candidate, attempt: int) -> ChatResult:
+        for generation in result.generations:
+            generation.message.response_metadata = {
+                **generation.message.response_metadata,
+                "model_name": generation.message.response_metadata.get("model_name") or candidate.model_name,
+                "router": {"provider": candidate.provider, "tier": candidate.tier, "attempt": attempt},
+            }
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        errors = []
+        call_deadline = time.monotonic() + self.total_timeout
+        for attempt, c in enumerate(self.plan(messages), start=1):
+            budget = min(self.timeout, call_deadline - time.monotonic())
+            if budget <= 0:
+                errors.append(f"call deadline of {self.total_timeout:.0f}s passed")
+                break
+            try:
+                result = await asyncio.wait_for(
+                    c.model._agenerate(messages, stop=stop, **{**c.kwargs, **kwargs}), timeout=budget
+                )
+                return self._annotate(result, c, attempt)
+            except asyncio.TimeoutError:
+                errors.append(f"{c.label}: no response in {budget:.0f}s")
+            except Exception as e:
+                errors.append(f"{c.label}: {type(e).__name__}: {e}")
+            if run_manager is not None:
+                await run_manager.on_text(f"LLM attempt failed, trying next: {errors[-1]}\n")
+        raise LLMTimeout("All LLM candidates failed: " + "; ".join(errors))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        #sync path: deadlines come from the clients' own request timeouts
+        errors = []
+        for attempt, c in enumerate(self.plan(messages), start=1):
+            try:
+                return self._annotate(c.model._generate(messages, stop=stop, **{**c.kwargs, **kwargs}), c, attempt)
+            except Exception as e:
+                errors.append(f"{c.label}: {type(e).__name__}: {e}")
+        raise LLMTimeout("All LLM candidates failed: " + "; ".join(errors))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Fails over until the first chunk arrives; after that a stalled stream raises LLMTimeout."""
+        errors = []
+        call_deadline = time.monotonic() + self.total_timeout
+        for attempt, c in enumerate(self.plan(messages), start=1):
+            budget = min(self.timeout, call_deadline - time.monotonic())
+            if budget <= 0:
+                errors.append(f"call deadline of {self.total_timeout:.0f}s passed")
+                break
+            stream = self._attempt_stream(c, messages, stop, **kwargs)
+            deadline = time.monotonic() + budget
+            started = False
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        return
+                    if not started:
+                        chunk.message.response_metadata = {
+                            **chunk.message.response_metadata,
+                            "router": {"provider": c.provider, "tier": c.tier, "attempt": attempt},
+                        }
+                    started = True
+                    yield chunk
+            except asyncio.TimeoutError:
+                errors.append(f"{c.label}: no response in {budget:.0f}s")
+            except Exception as e:
+                errors.append(f"{c.label}: {type(e).__name__}: {e}")
+            finally:
+                await stream.aclose()
+            if started:
+                raise LLMTimeout(f"LLM stream from {c.label} broke off: {errors[-1]}")
+        raise LLMTimeout("All LLM candidates failed: " + "; ".join(errors))
+
+    async def _attempt_stream(
+        self, candidate: Candidate, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        kwargs = {**candidate.kwargs, **kwargs}
+        if not _streams(candidate.model):
+            yield _as_chunk(await candidate.model._agenerate(messages, stop=stop, **kwargs))
+            return
+        async for chunk in candidate.model._astream(messages, stop=stop, **kwargs):
+            yield chunk
+
+
+def _provider_model(cfg: Settings, provider: str, model_name: str) -> Optional[BaseChatModel]:
+    #client-side retries are off: the router decides what to retry and where
+    if provider == "openai" and cfg.openai_api_key:
+        from langchain_openai import ChatOpenAI
 
-    if provider == "openai":
-        if not cfg.openai_api_key:
-            raise RuntimeError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
         return ChatOpenAI(
-            model=cfg.openai_model,
+            model=model_name,
             temperature=cfg.llm_temperature,
             api_key=cfg.openai_api_key,
+            timeout=cfg.llm_timeout,
+            max_retries=0,
         )
+    if provider == "google" and cfg.google_api_key:
+        from langchain_google_genai import ChatGoogleGenerativeAI
 
-    if provider == "google":
-        if not cfg.google_api_key:
-            raise RuntimeError("GOOGLE_API_KEY is required when LLM_PROVIDER=google")
         return ChatGoogleGenerativeAI(
-            model=cfg.google_model,
+            model=model_name,
             temperature=cfg.llm_temperature,
             google_api_key=cfg.google_api_key,
+            timeout=cfg.llm_timeout,
+            max_retries=0,
         )
+    return None
+
+
+def configured_providers(cfg: Settings) -> List[str]:
+    """Primary provider first, then the fallback one."""
+    provider = cfg.llm_provider
+    fallback = cfg.llm_fallback_provider
+    if fallback == "auto":
+        fallback = next((p for p in PROVIDERS if p != provider), "none")
+    return [provider] + ([fallback] if fallback in PROVIDERS and fallback != provider else [])
+
+
+def build_llm(cfg: Settings):
+    provider = cfg.llm_provider
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unsupported LLM_PROVIDER: {provider}. Use 'openai' or 'google'.")
+    if provider == "openai" and not cfg.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
+    if provider == "google" and not cfg.google_api_key:
+        raise RuntimeError("GOOGLE_API_KEY is required when LLM_PROVIDER=google")
+
+    providers = configured_providers(cfg)
+
+    models = {
+        "openai": {FAST: cfg.openai_fast_model, STRONG: cfg.openai_strong_model},
+        "google": {FAST: cfg.google_fast_model, STRONG: cfg.google_strong_model},
+    }
+    candidates = []
+    seen = set()
+    for tier in (FAST, STRONG):
+        for p in providers:
+            name = models[p][tier]
+            model = _provider_model(cfg, p, name)
+            if model is None or (p, name) in seen:
+                continue
+            seen.add((p, name))
+            candidates.append(Candidate(provider=p, model_name=name, tier=tier, model=model))
 
-    raise ValueError(f"Unsupported LLM_PROVIDER: {provider}. Use 'openai' or 'google'.")
+    return LLMRouter(
+        candidates=candidates,
+        timeout=cfg.llm_timeout,
+        total_timeout=cfg.llm_total_timeout,
+        retries=cfg.llm_retries,
+        escalate_after=cfg.llm_escalate_after,
+    )
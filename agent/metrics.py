@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from agent.config import Settings
+
+STAGEHAND_CALLS = {"goto", "observe", "act", "extract", "set_input_files"}
+SAMPLES_PER_SERIES = 2048
+#tools report most failures as strings rather than raising
+FAILED_OUTPUT = re.compile(
+    r"^(error|upload failed|csv upload failed|moodle web service failed|skill failed|grade query failed"
+    r"|batch grading failed|site index lookup failed|action result: success=false)"
+    r"|^\{\"status\": \"rejected\"",
+    re.I,
+)
+
+
+def tool_failed(output: Any) -> bool:
+    return bool(FAILED_OUTPUT.match(str(getattr(output, "content", output)).lstrip()))
+
+
+@dataclass
+class RequestTrace:
+    session_id: str
+    request_id: str
+    started: float
+    seconds: float = 0.0
+    iterations: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    error: str = ""
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class Series:
+    """Latency samples of one (kind, name) pair; quantiles come from the most recent samples."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES_PER_SERIES)
+
+    def add(self, seconds: float, ok: bool) -> None:
+        self.count += 1
+        self.total += seconds
+        self.errors += 0 if ok else 1
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_REQUEST: ContextVar[Optional[RequestTrace]] = ContextVar("lms_request_trace", default=None)
+
+
+class MetricsRecorder:
+    """
+    Collects tool, LLM and Stagehand spans. Spans are aggregated per (kind, name), attached to the
+    request that is active in the current context, and appended to a JSONL trace file if one is set.
+    """
+
+    def __init__(self, trace_path: str = "", enabled: bool = True, keep_requests: int = 50) -> None:
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], Series] = {}
+        self._tokens = {"prompt": 0, "completion": 0}
+        self._requests = 0
+        self._iterations = 0
+        self._recent: Deque[RequestTrace] = deque(maxlen=keep_requests)
+        self._trace_file: Optional[Any] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def configure(self, cfg: Settings) -> None:
+        self.enabled = cfg.metrics_enabled
+        if cfg.metrics_trace_path != self.trace_path:
+            self._close_trace()
+            self.trace_path = cfg.metrics_trace_path
+        if cfg.metrics_port and self._server is None:
+            self.serve(cfg.metrics_port)
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        if not self.trace_path:
+            return
+        with self._lock:
+            if self._trace_file is None:
+                Path(self.trace_path).parent.mkdir(parents=True, exist_ok=True)
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+            self._trace_file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def _close_trace(self) -> None:
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+    def record(self, kind: str, name: str, seconds: float, ok: bool = True, **extra: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series.setdefault((kind, name), Series()).add(seconds, ok)
+        trace = _REQUEST.get()
+        span = {"kind": kind, "name": name, "seconds": round(seconds, 4), "ok": ok, **extra}
+        if trace is not None:
+            trace.spans.append(span)
+        self._write(
+            {
+                "event": "span",
+                "ts": time.time(),
+                "session": trace.session_id if trace else "",
+                "request": trace.request_id if trace else "",
+                **span,
+            }
+        )
+
+    def add_tokens(self, prompt: int, completion: int, iteration: bool) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._tokens["prompt"] += prompt
+            self._tokens["completion"] += completion
+            self._iterations += 1 if iteration else 0
+        trace = _REQUEST.get()
+        if trace is not None:
+            trace.prompt_tokens += prompt
+            trace.completion_tokens += completion
+            trace.iterations += 1 if iteration else 0
+
+    @contextmanager
+    def request(self, session_id: str) -> Iterator[RequestTrace]:
+        """Scope for one user message; every span recorded inside is attributed to it."""
+        trace = RequestTrace(session_id=session_id, request_id=uuid.uuid4().hex[:12], started=time.time())
+        token = _REQUEST.set(trace)
+        started = time.perf_counter()
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__ if not str(e) else str(e).splitlines()[0]
+            raise
+        finally:
+            _REQUEST.reset(token)
+            trace.seconds = round(time.perf_counter() - started, 4)
+            if self.enabled:
+                with self._lock:
+                    self._requests += 1
+                    self._recent.append(trace)
+                    self._series.setdefault(("request", "agent"), Series()).add(trace.seconds, not trace.error)
+                self._write(
+                    {
+                        "event": "request",
+                        "ts": time.time(),
+                        "session": trace.session_id,
+                        "request": trace.request_id,
+                        "seconds": trace.seconds,
+                        "iterations": trace.iterations,
+                        "prompt_tokens": trace.prompt_tokens,
+                        "completion_tokens": trace.completion_tokens,
+                        "error": trace.error,
+                    }
+                )
+
+    @asynccontextmanager
+    async def span(self, kind: str, name: str) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(kind, name, time.perf_counter() - started, ok)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._series.items())
+            return [
+                {
+                    "kind": kind,
+                    "name": name,
+                    "count": s.count,
+                    "mean": round(s.total / s.count, 3) if s.count else 0.0,
+                    "p50": round(s.quantile(0.5), 3),
+                    "p95": round(s.quantile(0.95), 3),
+                    "max": round(max(s.samples), 3) if s.samples else 0.0,
+                    "errors": s.errors,
+                }
+                for (kind, name), s in items
+            ]
+
+    def recent(self, session_id: Optional[str] = None) -> List[RequestTrace]:
+        with self._lock:
+            return [t for t in self._recent if session_id is None or t.session_id == session_id]
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP lms_agent_latency_seconds Latency of agent requests and of tool, LLM and Stagehand calls.",
+            "# TYPE lms_agent_latency_seconds summary",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for (kind, name), s in series:
+                labels = f'kind="{kind}",name="{name}"'
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'lms_agent_latency_seconds{{{labels},quantile="{q}"}} {s.quantile(q):.4f}')
+                lines.append(f"lms_agent_latency_seconds_sum{{{labels}}} {s.total:.4f}")
+                lines.append(f"lms_agent_latency_seconds_count{{{labels}}} {s.count}")
+            lines += ["# HELP lms_agent_errors_total Failed calls.", "# TYPE lms_agent_errors_total counter"]
+            lines += [f'lms_agent_errors_total{{kind="{k}",name="{n}"}} {s.errors}' for (k, n), s in series]
+            lines += [
+                "# HELP lms_agent_tokens_total LLM tokens.",
+                "# TYPE lms_agent_tokens_total counter",
+                f'lms_agent_tokens_total{{type="prompt"}} {self._tokens["prompt"]}',
+                f'lms_agent_tokens_total{{type="completion"}} {self._tokens["completion"]}',
+                "# HELP lms_agent_requests_total Handled user messages.",
+                "# TYPE lms_agent_requests_total counter",
+                f"lms_agent_requests_total {self._requests}",
+                "# HELP lms_agent_iterations_total Agent LLM iterations.",
+                "# TYPE lms_agent_iterations_total counter",
+                f"lms_agent_iterations_total {self._iterations}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Expose prometheus() at http://host:port/metrics from a daemon thread."""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                body = recorder.prometheus().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+
+METRICS = MetricsRecorder()
+
+
+class MetricsCallbackHandler(AsyncCallbackHandler):
+    """Times every LLM and tool run of the agent and counts tokens and iterations."""
+
+    def __init__(self, recorder: MetricsRecorder = METRICS) -> None:
+        self.recorder = recorder
+        self._runs: Dict[UUID, Tuple[str, str, float, bool]] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, iteration: bool = False) -> None:
+        self._runs[run_id] = (kind, name, time.perf_counter(), iteration)
+
+    def _finish(self, run_id: UUID, ok: bool) -> Optional[Tuple[str, str, float, bool]]:
+        started = self._runs.pop(run_id, None)
+        if started is None:
+            return None
+        kind, name, at, iteration = started
+        return kind, name, time.perf_counter() - at, iteration
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, tags: Optional[List[str]] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        name = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "llm"
+        #summarizer calls are not agent iterations
+        self._start(run_id, "llm", str(name), iteration="history_summary" not in (tags or []))
+
+    async def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id, True)
+        if finished is None:
+            return
+        kind, name, seconds, iteration = finished
+        #the router only knows which model answered once it has
+        try:
+            name = response.generations[0][0].message.response_metadata.get("model_name") or name
+        except (AttributeError, IndexError):
+            pass
+        prompt, completion = _usage(response)
+        self.recorder.record(kind, name, seconds, prompt_tokens=prompt, completion_tokens=completion)
+        self.recorder.add_tokens(prompt, completion, iteration)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id, False)
+        if finished is not None:
+            self.recorder.record(finished[0], finished[1], finished[2], ok=False, error=str(error)[:200])
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, "tool", (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id, True)
+        if finished is not None:
+            text = str(getattr(output, "content", output))
+            self.recorder.record(finished[0], finished[1], finished[2], ok=not tool_failed(text), output_chars=len(text))
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id, False)
+        if finished is not None:
+            self.recorder.record(finished[0], finished[1], finished[2], ok=False, error=str(error)[:200])
+
+
+def _usage(response: Any) -> Tuple[int, int]:
+    try:
+        message = response.generations[0][0].message
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+    except (AttributeError, IndexError):
+        pass
+    token_usage = (response.llm_output or {}).get("token_usage", {}) if getattr(response, "llm_output", None) else {}
+    return int(token_usage.get("prompt_tokens", 0)), int(token_usage.get("completion_tokens", 0))
+
+
+class TimedPage:
+    """Proxy around a Stagehand page that records the latency of its navigation and model-backed calls."""
+
+    def __init__(self, page: Any, recorder: MetricsRecorder = METRICS) -> None:
+        self._page = page
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._page, name)
+        if name not in STAGEHAND_CALLS or not callable(attr):
+            return attr
+
+        async def timed(*args: Any, **kwargs: Any) -> Any:
+            async with self._recorder.span("stagehand", name):
+                return await attr(*args, **kwargs)
+
+        return timed
+
+
+def instrument_page(page: Any) -> Any:
+    if page is None or isinstance(page, TimedPage) or not METRICS.enabled:
+        return page
+    return TimedPage(page)
+
+
+def summarize_traces(path: str) -> str:
+    """p50/p95 per (kind, name) from a JSONL trace file, for offline analysis."""
+    recorder = MetricsRecorder()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            if event.get("event") == "span":
+                recorder.record(event["kind"], event["name"], float(event["seconds"]), bool(event.get("ok", True)))
+            elif event.get("event") == "request":
+                recorder.record("request", "agent", float(event["seconds"]), not event.get("error"))
+    rows = recorder.summary()
+    header = f"{'kind':<10} {'name':<28} {'count':>6} {'mean':>7} {'p50':>7} {'p95':>7} {'max':>7} {'errors':>6}"
+    lines = [header, "-" * len(header)]
+    for r in sorted(rows, key=lambda r: -r["p95"]):
+        lines.append(
+            f"{r['kind']:<10} {r['name'][:28]:<28} {r['count']:>6} {r['mean']:>7.2f} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['max']:>7.2f} {r['errors']:>6}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(summarize_traces(sys.argv[1] if len(sys.argv) > 1 else Settings().metrics_trace_path))
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import weakref
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+from agent.config import Settings
+
+#one pooled client per event loop; an entry goes away with its loop instead of being replaced and leaked
+_HTTP: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def shared_http(timeout: float = 20.0) -> httpx.AsyncClient:
+    """Pooled HTTP client of the running loop (keep-alive connections are reused across sessions)."""
+    loop = asyncio.get_running_loop()
+    client = _HTTP.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+        _HTTP[loop] = client
+    return client
+
+
+async def close_shared_http() -> None:
+    client = _HTTP.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class MoodleWSError(RuntimeError):
+    def __init__(self, message: str, errorcode: str = "") -> None:
+        super().__init__(message)
+        self.errorcode = errorcode
+
+
+def flatten_params(params: Dict[str, Any]) -> Dict[str, str]:
+    """Moodle REST expects nested arrays as courseids[0]=1&options[0][name]=x."""
+
+    def walk(prefix: str, value: Any) -> Iterator[Tuple[str, str]]:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                yield from walk(f"{prefix}[{key}]", item)
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                yield from walk(f"{prefix}[{index}]", item)
+        elif isinstance(value, bool):
+            yield prefix, "1" if value else "0"
+        elif value is not None:
+            yield prefix, str(value)
+
+    flat: Dict[str, str] = {}
+    for name, value in params.items():
+        flat.update(walk(name, value))
+    return flat
+
+
+class MoodleWSClient:
+    """
+    Minimal async client for Moodle's REST web services (/webservice/rest/server.php).
+    The token is requested from /login/token.php with the LMS credentials on first use.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str = "",
+        password: str = "",
+        service: str = "moodle_mobile_app",
+        token: str = "",
+        http: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.service = service
+        self._token = token
+        self._http = http
+        self._site_info: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_settings(cls, cfg: Settings) -> "MoodleWSClient":
+        return cls(
+            base_url=cfg.moodle_ws_url or cfg.lms_base_url,
+            username=cfg.lms_username,
+            password=cfg.lms_password,
+            service=cfg.moodle_ws_service,
+            token=cfg.moodle_ws_token,
+        )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or shared_http()
+
+    async def token(self) -> str:
+        if self._token:
+            return self._token
+        resp = await self.http.post(
+            f"{self.base_url}/login/token.php",
+            data={"username": self.username, "password": self.password, "service": self.service},
+        )
+        resp.raise_for_status()
+        payload = resp.json()
+        if "token" not in payload:
+            raise MoodleWSError(payload.get("error") or "Could not obtain a web service token.", payload.get("errorcode", ""))
+        self._token = payload["token"]
+        return self._token
+
+    async def call(self, function: str, **params: Any) -> Any:
+        for attempt in range(2):
+            data = {
+                "wstoken": await self.token(),
+                "wsfunction": function,
+                "moodlewsrestformat": "json",
+                **flatten_params(params),
+            }
+            resp = await self.http.post(f"{self.base_url}/webservice/rest/server.php", data=data)
+            resp.raise_for_status()
+            payload = resp.json()
+            if isinstance(payload, dict) and "exception" in payload:
+                errorcode = payload.get("errorcode", "")
+                if errorcode == "invalidtoken" and attempt == 0 and self.password:
+                    self._token = ""
+                    continue
+                raise MoodleWSError(payload.get("message") or errorcode, errorcode)
+            return payload
+        raise MoodleWSError("Web service token was rejected.", "invalidtoken")
+
+    async def site_info(self) -> Dict[str, Any]:
+        if self._site_info is None:
+            self._site_info = await self.call("core_webservice_get_site_info")
+        return self._site_info
+
+    async def user_id(self) -> int:
+        return int((await self.site_info())["userid"])
+
+
+_CLIENTS: Dict[str, MoodleWSClient] = {}
+
+
+def client_for(cfg: Settings) -> MoodleWSClient:
+    """
+    Shared client for cfg's credentials, so every web service feature of a session (and other
+    sessions with the same login) reuses one token. The key includes the password, so a session
+    with a wrong password never gets another login's token.
+    """
+    parts = (cfg.moodle_ws_url or cfg.lms_base_url, cfg.lms_username, cfg.lms_password, cfg.moodle_ws_service, cfg.moodle_ws_token)
+    key = hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+    if key not in _CLIENTS:
+        _CLIENTS[key] = MoodleWSClient.from_settings(cfg)
+    return _CLIENTS[key]
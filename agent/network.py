@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Pattern, Tuple
+
+from agent.config import Settings
+
+#third-party trackers and widgets that never matter to the agent
+DENY_URLS = (
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|facebook\.(net|com)/tr"
+    r"|connect\.facebook\.net|hotjar\.com|mc\.yandex\.|clarity\.ms"
+)
+#Moodle serves theme CSS/JS/images through revisioned handlers, so a cached copy stays valid until the next theme deploy
+STATIC_ASSET = re.compile(
+    r"/(theme/(styles|yui_combo|image|font|javascript)\.php|lib/(javascript|requirejs)\.php|theme/yui_combo\.php)"
+    r"|/lib/yuilib/|/theme/[^/]+/(pix|fonts?)/"
+)
+
+#rough transfer sizes used to estimate what blocked requests would have cost
+ESTIMATED_BYTES = {"image": 40_000, "font": 60_000, "media": 500_000, "script": 30_000, "stylesheet": 20_000}
+ESTIMATED_SECONDS = 0.05
+
+#response headers that no longer describe the body once Playwright has decoded it
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+@dataclass
+class CachedAsset:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    fetch_seconds: float
+
+
+class AssetCache:
+    """Process-wide LRU of static theme assets, bounded by total body size and shared by every browser context."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 4 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, CachedAsset]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[CachedAsset]:
+        with self._lock:
+            item = self._items.get(url)
+            if item is not None:
+                self._items.move_to_end(url)
+            return item
+
+    def put(self, url: str, asset: CachedAsset) -> None:
+        if len(asset.body) > self.max_item_bytes or asset.status != 200:
+            return
+        with self._lock:
+            old = self._items.pop(url, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._items[url] = asset
+            self.size += len(asset.body)
+            while self.size > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+ASSET_CACHE = AssetCache()
+
+
+@dataclass
+class NetworkStats:
+    requests: int = 0
+    blocked: Counter = field(default_factory=Counter)
+    cache_hits: int = 0
+    cache_bytes: int = 0
+    cache_seconds: float = 0.0
+    passthrough_safe: int = 0
+
+    def report(self) -> Dict[str, Any]:
+        blocked_bytes = sum(ESTIMATED_BYTES.get(kind, 10_000) * n for kind, n in self.blocked.items())
+        blocked_total = sum(self.blocked.values())
+        return {
+            "requests": self.requests,
+            "blocked": dict(self.blocked),
+            "cache_hits": self.cache_hits,
+            "bytes_saved": self.cache_bytes + blocked_bytes,
+            "bytes_saved_cache": self.cache_bytes,
+            "bytes_saved_blocked_est": blocked_bytes,
+            "seconds_saved": round(self.cache_seconds + blocked_total * ESTIMATED_SECONDS, 2),
+            "safe_mode_requests": self.passthrough_safe,
+        }
+
+
+class NetworkFilter:
+    """
+    Playwright route handler for one browser context. It aborts resource types the agent never reads
+    (images, fonts, media) and known trackers, and answers revisioned theme assets from ASSET_CACHE,
+    because routing turns off the browser's own HTTP cache. Requests from pages matching safe_pages
+    load untouched (safe mode for flows that need full rendering); NETWORK_FILTER_ENABLED=false
+    turns the filter off altogether.
+    """
+
+    def __init__(
+        self,
+        block_types: Tuple[str, ...] = ("image", "media", "font"),
+        deny: Optional[Pattern[str]] = None,
+        safe_pages: Optional[Pattern[str]] = None,
+        cache: Optional[AssetCache] = ASSET_CACHE,
+    ) -> None:
+        self.block_types = set(block_types)
+        self.deny = deny
+        self.safe_pages = safe_pages
+        self.cache = cache
+        self.stats = NetworkStats()
+
+    @classmethod
+    def from_settings(cls, cfg: Settings) -> "NetworkFilter":
+        deny = "|".join(p for p in (DENY_URLS, cfg.network_deny_urls) if p)
+        ASSET_CACHE.max_bytes = cfg.network_cache_mb * 1024 * 1024
+        return cls(
+            block_types=tuple(t.strip() for t in cfg.network_block_types.split(",") if t.strip()),
+            deny=re.compile(deny, re.I),
+            safe_pages=re.compile(cfg.network_safe_pages, re.I) if cfg.network_safe_pages else None,
+            cache=ASSET_CACHE if cfg.network_cache_mb > 0 else None,
+        )
+
+    def _document_url(self, request: Any) -> str:
+        try:
+            return request.frame.url or ""
+        except Exception:
+            return ""
+
+    def decide(self, request: Any) -> str:
+        """'abort', 'cache' or 'continue' for one request."""
+        url = request.url
+        if self.safe_pages is not None and self.safe_pages.search(self._document_url(request) or url):
+            self.stats.passthrough_safe += 1
+            return "continue"
+        #navigations (pages and file downloads the user asked for) always go through
+        if request.resource_type in self.block_types and not request.is_navigation_request():
+            return "abort"
+        if self.deny is not None and self.deny.search(url):
+            return "abort"
+        if self.cache is not None and request.method == "GET" and STATIC_ASSET.search(url):
+            return "cache"
+        return "continue"
+
+    def report(self) -> Dict[str, Any]:
+        cache = self.cache or AssetCache(max_bytes=0)
+        return {**self.stats.report(), "cached_assets": len(cache), "cache_mb": round(cache.size / 1e6, 1)}
+
+    async def handle(self, route: Any, request: Any) -> None:
+        self.stats.requests += 1
+        decision = self.decide(request)
+        if decision == "abort":
+            self.stats.blocked[request.resource_type] += 1
+            await route.abort("blockedbyclient")
+            return
+        if decision == "cache":
+            await self._from_cache(route, request)
+            return
+        await route.continue_()
+
+    async def _from_cache(self, route: Any, request: Any) -> None:
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            self.stats.cache_hits += 1
+            self.stats.cache_bytes += len(cached.body)
+            self.stats.cache_seconds += cached.fetch_seconds
+            await route.fulfill(status=cached.status, headers=cached.headers, body=cached.body)
+            return
+        started = time.perf_counter()
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.continue_()
+            return
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROP_HEADERS}
+        self.cache.put(request.url, CachedAsset(response.status, headers, body, time.perf_counter() - started))
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+
+async def install_network_filter(context: Any, cfg: Settings) -> Optional[NetworkFilter]:
+    """Route every request of a browser context through a NetworkFilter. Returns None when disabled."""
+    if not cfg.network_filter_enabled:
+        return None
+    network = NetworkFilter.from_settings(cfg)
+    await context.route("**/*", network.handle)
+    return network
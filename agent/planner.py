@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.agents import AgentAction
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
+
+from agent.metrics import tool_failed
+from agent.runtime import current_runtime
+from agent.watchdog import Watchdog, tool_access
+
+PLAN_PROMPT = """
+    === Planning ===
+    Plan before acting. In each turn, return as tool calls, in order, every step you can already
+    determine without seeing a result, e.g. navigate, act, act, extract for a known click-path.
+    End the batch at the first step whose output you need to decide what comes next; you see all
+    results once the batch has run. If a step fails, the rest of the batch is skipped and you
+    re-plan from the page it stopped on.
+    """
+
+SKIPPED = "Skipped: an earlier step of this plan failed. Re-plan from the current page."
+
+
+class PlanExecutor:
+    """
+    Alternative to AgentExecutor for AGENT_MODE=plan. Each model turn returns a batch of tool calls
+    (the plan up to the next step whose output matters), and the batch runs in order without another
+    model call. The model is consulted again only after the batch, or as soon as a step fails, so a
+    linear click-path costs one model call instead of one per click. The same Watchdog as in react
+    mode runs between batches.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        tools: Sequence[BaseTool],
+        max_turns: int = 30,
+        max_steps: int = 90,
+        watchdog: bool = True,
+        time_budget: float = 0.0,
+    ) -> None:
+        self.llm = llm.bind_tools(list(tools))
+        self.tools = {t.name: t for t in tools}
+        self.max_turns = max_turns
+        self.max_steps = max_steps
+        self.watchdog = watchdog
+        self.time_budget = time_budget
+
+    async def _run_tool(self, call: Dict[str, Any], config: Optional[RunnableConfig]) -> ToolMessage:
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            return ToolMessage(f"Error: unknown tool '{call['name']}'.", tool_call_id=call["id"])
+        try:
+            #a ToolCall input makes the tool answer with a ToolMessage carrying the call id
+            return await tool.ainvoke({**call, "type": "tool_call"}, config)
+        except Exception as e:
+            return ToolMessage(f"Error: {e}", tool_call_id=call["id"])
+
+    async def _run_batch(
+        self, message: AIMessage, config: Optional[RunnableConfig], watchdog: Optional[Watchdog] = None
+    ) -> Tuple[List[ToolMessage], List[Tuple[AgentAction, str]]]:
+        results: List[ToolMessage] = []
+        steps: List[Tuple[AgentAction, str]] = []
+        failed = False
+        for call in message.tool_calls:
+            #every call needs an answer, so skipped steps are reported rather than dropped
+            if failed:
+                result = ToolMessage(SKIPPED, tool_call_id=call["id"])
+            else:
+                result = await self._run_tool(call, config)
+                failed = tool_failed(result.content)
+                page = current_runtime().page
+                if watchdog is not None and tool_access(call["name"]) == "write" and page is not None:
+                    await watchdog.record_page(page)
+            results.append(result)
+            steps.append((AgentAction(call["name"], call["args"], ""), str(result.content)))
+        return results, steps
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        messages: List[BaseMessage] = [
+            SystemMessage(inputs.get("system_prompt", "") + PLAN_PROMPT),
+            *inputs.get("chat_history", []),
+            HumanMessage(inputs["input"]),
+        ]
+        intermediate: List[Tuple[AgentAction, str]] = []
+        watchdog = Watchdog(budget=self.time_budget or None) if self.watchdog else None
+        for _ in range(self.max_turns):
+            verdict = watchdog.check(intermediate) if watchdog is not None else None
+            if verdict is not None and verdict.stop:
+                return {"output": Watchdog.partial_answer(verdict, intermediate), "intermediate_steps": intermediate}
+            if verdict is not None:
+                messages[-1].content = f"{messages[-1].content}{Watchdog.hint(verdict.message)}"
+            message = await self.llm.ainvoke(messages, config)
+            messages.append(message)
+            if not message.tool_calls:
+                return {"output": message.content, "intermediate_steps": intermediate}
+            if len(intermediate) + len(message.tool_calls) > self.max_steps:
+                break
+            results, steps = await self._run_batch(message, config, watchdog)
+            messages.extend(results)
+            intermediate.extend(steps)
+        return {"output": "Agent stopped due to iteration limit or time limit.", "intermediate_steps": intermediate}
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self.ainvoke, name="PlanExecutor")
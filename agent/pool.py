@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from agent.auth import ensure_login
+from agent.cache import ActionCache, ObserveCache
+from agent.config import Settings
+from agent.network import install_network_filter
+from agent.runtime import Runtime, use_runtime
+from agent.site_index import warm_site_index
+from agent.stagehand_client import create_stagehand
+from agent.storage_state import restore_storage_state
+
+
+#per-process salt, so tenant keys are not a reusable password hash
+_TENANT_SALT = os.urandom(16)
+
+
+def tenant_key(cfg: Settings) -> str:
+    """
+    Browser context key: the username plus a verifier of the password. A session only joins a
+    context (and its logged-in cookies) opened with the same credentials; a wrong password gets a
+    fresh context and has to pass the login form.
+    """
+    username = cfg.lms_username.strip().lower() or "anonymous"
+    verifier = hmac.new(_TENANT_SALT, f"{username}\0{cfg.lms_password}".encode("utf-8"), hashlib.sha256)
+    return f"{username}:{verifier.hexdigest()[:32]}"
+
+
+@dataclass
+class _Tenant:
+    key: str
+    context: Any
+    owned: bool
+    pages: int = 0
+    network: Optional[Any] = None
+    actions: ActionCache = field(default_factory=ActionCache)
+
+
+@dataclass
+class _Browser:
+    client: Any
+    tenants: Dict[str, _Tenant] = field(default_factory=dict)
+    default_used: bool = False
+
+    @property
+    def shared_browser(self) -> Optional[Any]:
+        #only CDP/Browserbase connections expose a Browser that can open isolated contexts;
+        #a local persistent context has none, so such a browser can host a single tenant
+        return getattr(self.client, "_browser", None)
+
+    def can_host(self) -> bool:
+        return not self.default_used or self.shared_browser is not None
+
+
+@dataclass
+class Lease:
+    session_id: str
+    tenant: _Tenant
+    browser: _Browser
+    runtime: Runtime
+    last_used: float = field(default_factory=time.monotonic)
+    #agent runs in progress on this lease
+    busy: int = 0
+
+
+class BrowserPool:
+    """
+    Shares a few Stagehand browsers between agent sessions.
+    Each LMS user (tenant) gets an isolated browser context, and each session leases its own
+    page in that context. Sessions idle longer than idle_ttl are closed, then empty contexts
+    and browsers are closed as well.
+    """
+
+    def __init__(self, max_browsers: int = 2, max_sessions: int = 32, idle_ttl: float = 900.0) -> None:
+        self.max_browsers = max_browsers
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._browsers: List[_Browser] = []
+        self._leases: Dict[str, Lease] = {}
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+        #browsers being launched outside the lock, counted against max_browsers
+        self._booting = 0
+
+    def configure(self, cfg: Settings) -> None:
+        self.max_browsers = cfg.pool_max_browsers
+        self.max_sessions = cfg.pool_max_sessions
+        self.idle_ttl = cfg.pool_idle_ttl
+
+    def get(self, session_id: str, touch: bool = True) -> Optional[Runtime]:
+        lease = self._leases.get(session_id)
+        if lease is None:
+            return None
+        if touch:
+            lease.last_used = time.monotonic()
+        return lease.runtime
+
+    async def acquire(self, cfg: Settings, session_id: str) -> Runtime:
+        booted: Optional[_Browser] = None
+        while True:
+            async with self._lock:
+                if booted is not None:
+                    self._browsers.append(booted)
+                lease = self._leases.get(session_id)
+                if lease is not None:
+                    lease.last_used = time.monotonic()
+                    return lease.runtime
+
+                await self._evict_idle_locked()
+                if len(self._leases) >= self.max_sessions:
+                    raise RuntimeError(f"Browser pool is full ({self.max_sessions} sessions). Try again later.")
+
+                key = tenant_key(cfg)
+                browser, tenant = self._find_tenant(key)
+                if tenant is None:
+                    browser = next((b for b in self._browsers if b.can_host()), None)
+                if browser is not None:
+                    return await self._lease_locked(cfg, session_id, key, browser, tenant)
+                if len(self._browsers) + self._booting >= self.max_browsers:
+                    raise RuntimeError(f"Browser pool is full ({self.max_browsers} browsers). Try again later.")
+                self._booting += 1
+            #Chromium boots outside the lock, so other sessions keep acquiring and releasing meanwhile
+            try:
+                booted = _Browser(client=await create_stagehand(cfg))
+            finally:
+                self._booting -= 1
+
+    async def _lease_locked(
+        self, cfg: Settings, session_id: str, key: str, browser: _Browser, tenant: Optional[_Tenant]
+    ) -> Runtime:
+        restored = tenant is not None
+        if tenant is None:
+            tenant = await self._open_tenant(browser, key)
+            tenant.actions = ActionCache(cfg.action_cache_size, cfg.action_cache_ttl)
+            try:
+                tenant.network = await install_network_filter(tenant.context, cfg)
+            except Exception:
+                tenant.network = None
+            try:
+                restored = await restore_storage_state(tenant.context, cfg)
+            except Exception:
+                restored = False
+
+        page = await self._open_page(tenant)
+        runtime = Runtime(
+            client=browser.client,
+            page=page,
+            context=tenant.context,
+            observe_cache=ObserveCache(cfg.observe_cache_size, cfg.observe_cache_ttl),
+            action_cache=tenant.actions,
+            restored_state=restored,
+            network=tenant.network,
+        )
+        self._leases[session_id] = Lease(session_id=session_id, tenant=tenant, browser=browser, runtime=runtime)
+        self._ensure_reaper()
+        return runtime
+
+    async def prewarm(self, cfg: Settings) -> None:
+        """Launch a browser before the first session asks for one, so its login does not wait for Chromium."""
+        async with self._lock:
+            if self._browsers or self._booting:
+                return
+            self._booting += 1
+        try:
+            browser = _Browser(client=await create_stagehand(cfg))
+        finally:
+            self._booting -= 1
+        async with self._lock:
+            self._browsers.append(browser)
+
+    @contextmanager
+    def busy(self, session_id: str) -> Iterator[None]:
+        """Mark a session's lease as in use for the duration of an agent run, so the reaper leaves it alone."""
+        lease = self._leases.get(session_id)
+        if lease is not None:
+            lease.busy += 1
+        try:
+            yield
+        finally:
+            if lease is not None:
+                lease.busy -= 1
+                lease.last_used = time.monotonic()
+
+    async def release(self, session_id: str) -> None:
+        async with self._lock:
+            await self._release_locked(session_id)
+
+    async def evict_idle(self) -> int:
+        async with self._lock:
+            return await self._evict_idle_locked()
+
+    async def close(self) -> None:
+        async with self._lock:
+            for session_id in list(self._leases):
+                await self._release_locked(session_id)
+            for browser in list(self._browsers):
+                await self._close_browser(browser)
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "browsers": len(self._browsers),
+            "contexts": sum(len(b.tenants) for b in self._browsers),
+            "sessions": len(self._leases),
+        }
+
+    def _find_tenant(self, key: str) -> Tuple[Optional[_Browser], Optional[_Tenant]]:
+        for browser in self._browsers:
+            if key in browser.tenants:
+                return browser, browser.tenants[key]
+        return None, None
+
+    async def _open_tenant(self, browser: _Browser, key: str) -> _Tenant:
+        if not browser.default_used:
+            browser.default_used = True
+            tenant = _Tenant(key=key, context=browser.client.context, owned=False)
+        else:
+            from stagehand.context import StagehandContext
+
+            pw_context = await browser.shared_browser.new_context()
+            context = await StagehandContext.init(pw_context, browser.client)
+            tenant = _Tenant(key=key, context=context, owned=True)
+        browser.tenants[key] = tenant
+        return tenant
+
+    async def _open_page(self, tenant: _Tenant) -> Any:
+        page = tenant.context.get_active_page() if tenant.pages == 0 else None
+        if page is None or page in (lease.runtime.page for lease in self._leases.values()):
+            page = await tenant.context.new_page()
+        tenant.pages += 1
+        return page
+
+    async def _release_locked(self, session_id: str) -> None:
+        lease = self._leases.pop(session_id, None)
+        if lease is None:
+            return
+        tenant, browser = lease.tenant, lease.browser
+        tenant.pages -= 1
+        try:
+            await lease.runtime.page.close()
+        except Exception:
+            pass
+        lease.runtime.observe_cache.clear()
+
+        if tenant.pages > 0:
+            return
+        del browser.tenants[tenant.key]
+        if tenant.owned:
+            try:
+                await tenant.context.close()
+            except Exception:
+                pass
+        #the default context keeps the previous user's cookies, so it is never handed to another tenant
+        if not browser.tenants:
+            await self._close_browser(browser)
+
+    async def _close_browser(self, browser: _Browser) -> None:
+        if browser in self._browsers:
+            self._browsers.remove(browser)
+        try:
+            await browser.client.close()
+        except Exception:
+            pass
+
+    async def _evict_idle_locked(self) -> int:
+        now = time.monotonic()
+        stale = [
+            sid for sid, lease in self._leases.items() if not lease.busy and now - lease.last_used > self.idle_ttl
+        ]
+        for session_id in stale:
+            await self._release_locked(session_id)
+        return len(stale)
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_forever())
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.idle_ttl / 4, 5.0))
+            try:
+                await self.evict_idle()
+            except Exception:
+                pass
+
+
+POOL = BrowserPool()
+
+
+async def start_session(cfg: Settings, session_id: str) -> Tuple[bool, Optional[str]]:
+    """Lease a page for the session and make sure it is logged in. Returns (ok, error_message)."""
+    POOL.configure(cfg)
+    try:
+        runtime = await POOL.acquire(cfg, session_id)
+    except Exception as exc:
+        return False, str(exc)
+    with use_runtime(runtime):
+        ok, err = await ensure_login(cfg)
+    if ok and cfg.site_index_enabled:
+        warm_site_index(cfg, runtime)
+    return ok, err
+
+
+async def session_runtime(cfg: Settings, session_id: str) -> Runtime:
+    """Runtime of a started session, re-leased (and logged in again) if it was evicted while idle."""
+    runtime = POOL.get(session_id)
+    if runtime is not None:
+        return runtime
+    ok, err = await start_session(cfg, session_id)
+    if not ok:
+        raise RuntimeError(err or "Login failed.")
+    return POOL.get(session_id)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+from typing import Any, List, Optional
+
+from agent.agent_factory import build_agent
+from agent.config import Settings
+from agent.history import token_encoding
+from agent.llm import PROVIDER_MODULES, configured_providers
+from agent.metrics import METRICS
+from agent.pool import POOL
+
+#what the first message would otherwise import on the request path
+AGENT_MODULES = ("langchain.agents",)
+
+
+def warm_modules(cfg: Settings) -> List[str]:
+    return list(AGENT_MODULES) + [PROVIDER_MODULES[p] for p in configured_providers(cfg) if p in PROVIDER_MODULES]
+
+
+def _build(cfg: Settings) -> Any:
+    for module in warm_modules(cfg):
+        importlib.import_module(module)
+    token_encoding()
+    return build_agent(cfg)
+
+
+async def _launch(cfg: Settings) -> None:
+    #the import blocks for seconds, so it runs off the loop before the browser is launched on it
+    await asyncio.to_thread(importlib.import_module, "stagehand")
+    await POOL.prewarm(cfg)
+
+
+async def prewarm(cfg: Settings, browser: bool = True) -> Optional[Any]:
+    """
+    Import the agent stack and build an agent in a worker thread while a browser boots, so the first
+    message pays for neither. Returns the built agent, or None if building failed (e.g. missing API key);
+    failures are left for the normal start-up path to report.
+    """
+    async with METRICS.span("startup", "prewarm"):
+        jobs = [asyncio.to_thread(_build, cfg)]
+        if browser:
+            jobs.append(_launch(cfg))
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+    agent = results[0]
+    return None if isinstance(agent, BaseException) else agent
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-vers1 = (
+import re
+from typing import Any, Dict, Iterable, List
+
+#composable sections; PromptSelector below picks the ones a session needs
+CORE_PROMPT = (
     "You are a Moodle automation assistant for the Ukrainian Catholic University platform (learn.ucu.edu.ua). "
     "You operate through Stagehand browser tools to help users navigate Moodle, view courses, check grades, "
     "and extract information from the LMS. You must only interact with pages inside learn.ucu.edu.ua.\n\n"
@@ -33,8 +37,14 @@ vers1 = (
     "- Do not type sensitive information or credentials unless explicitly instructed by a secure internal tool.\n"
     "- Be efficient: minimize clicks, confirm each completed action, and return clear summaries of results.\n"
     "- If a user’s question is general or unrelated to Moodle navigation, respond conversationally without using tools.\n"
-    "- You can download files LMS by simply clicking on them"
-    """
+    "- You can download files LMS by simply clicking on them\n"
+    "- For questions spanning several courses (grades in every course, ungraded assignments across courses), "
+    "collect the course ids or URLs first and call 'extract_many' once instead of visiting each course in turn.\n"
+    "- Large tool results come back as compact tables and may be cut short with a result_id; "
+    "call 'read_result' for the remaining rows only when the rows shown do not answer the question.\n"
+)
+
+TEACHER_PROMPT = """
     === Teacher / Assistant Permissions ===
     The user may be a Teacher or Teaching Assistant in Moodle. 
     In this case, additional actions become available:cdk19
@@ -46,6 +56,9 @@ vers1 = (
     • Upload a CSV file with grades (“Import” tab inside Gradebook)
 
     You must support these workflows in addition to student workflows.
+    """
+
+FILE_PICKER_PROMPT = """
     When uploading any file (CSV or assignment files), Moodle uses a File Picker modal.
     The visible “Choose a file...” button is NOT a real <input type="file">.
     You must:
@@ -57,6 +70,9 @@ vers1 = (
     5. Call upload_csv (or upload_file) with that selector.
     6. Click "Upload this file".
 
+    """
+
+GRADING_PROMPT = """
     === Grading Individual Students for Assignments ===
     When grading a specific student for an assignment, follow this workflow:
 
@@ -80,8 +96,15 @@ vers1 = (
     - Always use observe() to confirm you're on the correct grading page and that the student's submission is loaded before entering grades.
     - Verify the student name matches the intended student before saving the grade.
     - After saving, you can continue to grade another student by repeating the process from step 4.
+
+    BATCH GRADING:
+    When grades for two or more students of the same assignment are known up front, call grade_batch once
+    with the assignment id/URL and all (student, grade, feedback) rows instead of repeating the steps above.
+    It verifies every save and returns a per-row report. If rows failed, fix the cause and call it again with
+    the same rows: already saved rows are skipped. Use the manual workflow only for rows grade_batch cannot handle.
     """
-    """
+
+UPLOAD_FILE_PROMPT = """
     You have an additional tool: upload_file. 
     Use it to attach files inside Moodle, but only after you have used observe to identify the correct file upload element selector (usually an <input type="file">).
 
@@ -94,7 +117,9 @@ vers1 = (
     6. After the file is uploaded, use act to click “Save changes” or “Submit assignment” on the main page. 
 
     Never call upload_file before locating the selector using observe."""
-    """
+
+
+UPLOAD_CSV_PROMPT = """
     You have a special tool: upload_csv.
 
     Use upload_csv ONLY when the user wants to import grades or upload a CSV file.
@@ -109,9 +134,15 @@ vers1 = (
     7. Call upload_csv with file_path and selector.
     8. Then click "Upload grades" or “Import”.
 
+    upload_csv checks the file before uploading. If it returns "rejected", tell the user what is wrong
+    (unmatched students, missing identifier column) instead of uploading. If it reports more chunks,
+    finish importing the current one, reopen the import page and call upload_csv again with the same file_path.
+
     Never call upload_csv without first using observe() to confirm the correct input selector.
     """
-)
+
+
+vers1 = CORE_PROMPT + TEACHER_PROMPT + FILE_PICKER_PROMPT + GRADING_PROMPT + UPLOAD_FILE_PROMPT + UPLOAD_CSV_PROMPT
 
 vers2 = """You are a Moodle automation assistant for the Ukrainian Catholic University platform (learn.ucu.edu.ua).
 You operate through Stagehand browser tools to help users navigate Moodle, view courses, check grades, manage gradebook workflows,
@@ -161,4 +192,128 @@ Typical flow:
 - Be efficient: minimize clicks; confirm completed steps; summarize results clearly.
 """
 
+WS_TOOLS_PROMPT = """
+    === Moodle Web Service Tools ===
+    For read-only questions about enrolled courses, grades, upcoming deadlines or assignments,
+    call moodle_courses, moodle_grades, moodle_upcoming_events or moodle_assignments first.
+    They answer in one request without touching the browser. Fall back to the browser tools
+    only when a web service tool reports a failure or the data is not covered by them.
+    """
+
+SITE_INDEX_PROMPT = """
+    === URL Lookup ===
+    To open a specific course, its gradebook, grader report or CSV import page, or an assignment,
+    call lookup_url first and navigate to the returned URL; click through the menus only when it finds nothing.
+    """
+
+GRADEBOOK_PROMPT = """
+    === Grade Statistics ===
+    For grade statistics and filters within one course (averages, who scored below a threshold,
+    a student's grades), call query_grades with the course id; pass refresh=true right after grades were changed.
+    """
+
+SKILLS_PROMPT = """
+    === Scripted Skills ===
+    open_my_courses, open_grades_overview, open_course_gradebook, open_file_picker_upload and
+    ensure_logged_in each run a whole Moodle flow in one call and verify where they ended up.
+    Use them instead of the step-by-step observe/act procedures below. If a skill reports a failure,
+    continue from the page it stopped on with observe/act, following the steps it suggests.
+    """
+
+
 SYSTEM_PROMPT = vers1
+
+SECTIONS = {
+    "core": CORE_PROMPT,
+    "site_index": SITE_INDEX_PROMPT,
+    "web_services": WS_TOOLS_PROMPT,
+    "gradebook": GRADEBOOK_PROMPT,
+    "skills": SKILLS_PROMPT,
+    "teacher": TEACHER_PROMPT,
+    "file_picker": FILE_PICKER_PROMPT,
+    "upload_file": UPLOAD_FILE_PROMPT,
+    "grading": GRADING_PROMPT,
+    "csv_import": UPLOAD_CSV_PROMPT,
+}
+
+#intent -> sections it needs; the first matching pattern in a message activates the intent
+INTENT_SECTIONS = {
+    "upload_file": ["file_picker", "upload_file"],
+    "grading": ["teacher", "grading"],
+    "csv_import": ["teacher", "file_picker", "csv_import"],
+}
+TEACHER_INTENTS = {"grading", "csv_import"}
+
+INTENT_PATTERNS = {
+    "upload_file": re.compile(
+        r"\[UPLOADED_FILE_PATH\]|upload|attach|submit\s+(a\s+|my\s+|the\s+)?(file|assignment|work)"
+        r"|завантаж|прикріп|здати|здам|надісл",
+        re.I,
+    ),
+    "grading": re.compile(
+        r"\b(grade|mark|assess)\s+(the\s+|all\s+|these\s+|my\s+)?(students?|submissions?|assignments?|works?)\b"
+        r"|\bset\s+(the\s+|a\s+)?grades?\b|\bgrade_batch\b|\bgrader\b"
+        r"|\b(give|leave|write|add|post)\s+(\w+\s+)?feedback\s+(to|for|on)\b"
+        r"|(постав|вистав)\w*\s+(\w+\s+)?оцін|оцінит|оцініть|перевір\w*\s+(\w+\s+)?робот"
+        r"|(залиш|напиш|дода)\w*\s+(\w+\s+)?відгук|зміни\w*\s+студент",
+        re.I,
+    ),
+    "csv_import": re.compile(r"\bcsv\b|\b(import|export)\s+(the\s+)?grades\b|імпорт|експорт", re.I),
+}
+
+
+def detect_intents(text: str) -> List[str]:
+    return [intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(text or "")]
+
+
+def base_sections(
+    role: str, web_services: bool, skills: bool = False, site_index: bool = False, gradebook: bool = False
+) -> List[str]:
+    """Sections every turn needs; tool sections only for the tools the session registers."""
+    sections = ["core"]
+    if site_index:
+        sections.append("site_index")
+    if web_services:
+        sections.append("web_services")
+    if gradebook:
+        sections.append("gradebook")
+    if skills:
+        sections.append("skills")
+    if role == "teacher":
+        sections.append("teacher")
+    return sections
+
+
+def build_system_prompt(sections: Iterable[str]) -> str:
+    return "".join(SECTIONS[name] for name in dict.fromkeys(sections))
+
+
+class PromptSelector:
+    """
+    Builds the system prompt for one chat session: the core rules, the role sections, and the
+    procedures for intents seen so far. Sections are only ever appended, in the order they were
+    first needed, so the prefix already sent stays byte-identical and provider prompt caches keep hitting.
+    """
+
+    def __init__(
+        self,
+        role: str = "auto",
+        web_services: bool = False,
+        skills: bool = False,
+        site_index: bool = False,
+        gradebook: bool = False,
+    ) -> None:
+        self.role = role
+        self.sections: List[str] = base_sections(role, web_services, skills, site_index, gradebook)
+
+    def select(self, text: str) -> str:
+        for intent in detect_intents(text):
+            if intent in TEACHER_INTENTS and self.role == "student":
+                continue
+            for name in INTENT_SECTIONS[intent]:
+                if name not in self.sections:
+                    self.sections.append(name)
+        return build_system_prompt(self.sections)
+
+    def __call__(self, inputs: Dict[str, Any]) -> str:
+        return self.select(str(inputs.get("input", "")))
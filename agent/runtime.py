@@ -1,25 +1,98 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Optional
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from agent.cache import ActionCache, ObserveCache
+from agent.compaction import ResultStore
+from agent.metrics import instrument_page
 
 
 @dataclass
 class Runtime:
     client: Optional[Any] = None
     page: Optional[Any] = None
+    context: Optional[Any] = None
+    observe_cache: ObserveCache = field(default_factory=ObserveCache)
+    #shared by the sessions of one browser context, i.e. one LMS user
+    action_cache: ActionCache = field(default_factory=ActionCache)
+    results: ResultStore = field(default_factory=ResultStore)
+    restored_state: bool = False
+    network: Optional[Any] = None
+    #CSV grade imports in progress, by source path; upload_csv hands out one chunk per call
+    csv_imports: Dict[str, Any] = field(default_factory=dict)
+    #the main page shows what a fresh GET of its URL would (loaded by navigate, nothing done on it since),
+    #so a read may run on another tab opened at that URL
+    page_reloadable: bool = False
 
 
+#process-wide fallback used by init_stagehand(); pooled sessions bind their own Runtime via use_runtime()
 RUNTIME = Runtime()
 
+_CURRENT: ContextVar[Optional[Runtime]] = ContextVar("lms_runtime", default=None)
+#tab a concurrently running read-only tool works on instead of the session's main page
+_PAGE: ContextVar[Optional[Any]] = ContextVar("lms_page", default=None)
+
+
+def current_runtime() -> Runtime:
+    return _CURRENT.get() or RUNTIME
+
+
+@contextmanager
+def use_runtime(runtime: Runtime) -> Iterator[Runtime]:
+    """Bind a session's Runtime to the current task so tools resolve its page instead of the global one."""
+    token = _CURRENT.set(runtime)
+    try:
+        yield runtime
+    finally:
+        _CURRENT.reset(token)
+
+
+@contextmanager
+def use_page(page: Any) -> Iterator[Any]:
+    """Make require_page() return page for the current task only."""
+    token = _PAGE.set(page)
+    try:
+        yield page
+    finally:
+        _PAGE.reset(token)
+
 
 def require_page() -> Any:
-    if RUNTIME.page is None:
+    override = _PAGE.get()
+    if override is not None:
+        return override
+    runtime = current_runtime()
+    if runtime.page is None:
         raise RuntimeError("Stagehand page is not initialized. Call init_stagehand() first.")
-    return RUNTIME.page
+    return instrument_page(runtime.page)
 
 
 def require_client() -> Any:
-    if RUNTIME.client is None:
+    runtime = current_runtime()
+    if runtime.client is None:
         raise RuntimeError("Stagehand client is not initialized. Call init_stagehand() first.")
-    return RUNTIME.client
+    return runtime.client
+
+
+def invalidate_observations(url: str) -> None:
+    current_runtime().observe_cache.invalidate(url)
+
+
+@asynccontextmanager
+async def open_tab(runtime: Runtime, url: Optional[str] = None) -> AsyncIterator[Any]:
+    """Extra page in the session's browser context (same cookies and login), closed on exit."""
+    if runtime.context is None:
+        raise RuntimeError("Stagehand context is not initialized. Call init_stagehand() first.")
+    tab = await runtime.context.new_page()
+    try:
+        if url:
+            await tab.goto(url)
+        yield instrument_page(tab)
+    finally:
+        try:
+            await tab.close()
+        except Exception:
+            pass
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class FanOutExtractInput(BaseModel):
+    targets: List[str] = Field(..., description="Course ids or full learn.ucu.edu.ua URLs to extract from")
+    instruction: str = Field(..., description="What to extract on every page, e.g. 'all grade items with grade and percentage'")
+    page: Literal["grades", "course"] = Field(
+        "grades", description="For bare course ids: open the course 'grades' (user report) or the 'course' main page"
+    )
+    concurrency: Optional[int] = Field(None, description="Max tabs open at once; at most, and by default, FANOUT_CONCURRENCY")
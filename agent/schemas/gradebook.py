@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class QueryGradesInput(BaseModel):
+    course_id: int = Field(..., description="Moodle course id (as in /course/view.php?id=...)")
+    item: Optional[str] = Field(None, description="Grade item to look at, fuzzy (e.g. 'essay 1', 'course total'); all items if omitted")
+    student: Optional[str] = Field(None, description="Only students whose name contains this text")
+    below: Optional[float] = Field(None, description="Only grades strictly below this value")
+    above: Optional[float] = Field(None, description="Only grades strictly above this value")
+    percent: bool = Field(False, description="Compare and aggregate percentages instead of raw grades")
+    aggregate: Literal["summary", "list", "count", "mean", "median", "min", "max"] = Field(
+        "summary", description="'list' returns matching rows; the others aggregate per grade item"
+    )
+    refresh: bool = Field(False, description="Re-sync the snapshot even if it is still fresh (e.g. after grading)")
+    export_path: Optional[str] = Field(
+        None, description="Path of a downloaded gradebook export (Plain text file) to load instead of web services"
+    )
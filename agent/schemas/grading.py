@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class GradeRowInput(BaseModel):
+    student: str = Field(..., description="Student name in 'Surname Name' format, as shown in Moodle")
+    grade: str = Field(..., description="Grade to enter, e.g. '87' or '4.5'")
+    feedback: str = Field("", description="Optional feedback comment")
+
+
+class BatchGradeInput(BaseModel):
+    assignment: str = Field(..., description="Assignment course-module id (mod/assign/view.php?id=...) or its URL")
+    rows: List[GradeRowInput] = Field(..., description="Students to grade, in order")
+    restart: bool = Field(False, description="Ignore progress saved by previous runs and grade every row again")
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class NoInput(BaseModel):
+    pass
+
+
+class CourseGradesInput(BaseModel):
+    course_id: int = Field(..., description="Moodle course id (as in /course/view.php?id=...)")
+
+
+class UpcomingEventsInput(BaseModel):
+    days: int = Field(14, description="How many days ahead to look for deadlines and events")
+
+
+class AssignmentsInput(BaseModel):
+    course_ids: Optional[List[int]] = Field(None, description="Course ids to list assignments for; all enrolled courses if omitted")
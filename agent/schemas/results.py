@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class ReadResultInput(BaseModel):
+    result_id: str = Field(..., description="result_id from a truncated extract/observe result")
+    offset: int = Field(0, description="Row (or character) offset to continue from, e.g. next_offset")
+    limit: int = Field(50, description="Maximum number of table rows to return")
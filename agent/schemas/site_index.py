@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class LookupURLInput(BaseModel):
+    query: str = Field(..., description="Course name, short name, acronym or id; for activity pages the activity name")
+    page: Literal[
+        "course", "grades", "grader", "import", "export", "participants", "assignments",
+        "activity", "grading", "grade_student",
+    ] = Field(
+        "course",
+        description=(
+            "Course pages: 'course', 'grades' (user report), 'grader' (grader report), 'import' (CSV import), "
+            "'export', 'participants', 'assignments'. Activity pages: 'activity' (any activity), "
+            "'grading' (assignment submissions table), 'grade_student' (assignment grader)"
+        ),
+    )
+    course: Optional[str] = Field(None, description="For activity pages: the course to search in (name or id)")
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CourseGradebookInput(BaseModel):
+    course: str = Field(..., description="Course name (fuzzy, e.g. 'calculus'), id or URL")
+    view: Literal["grades", "grader", "import", "export"] = Field(
+        "grader", description="'grades' = user report, 'grader' = grader report, 'import' = CSV import, 'export' = export"
+    )
+
+
+class FilePickerUploadInput(BaseModel):
+    file_path: Optional[str] = Field(None, description="File to attach and upload; omit to only open the upload form")
@@ -10,3 +10,5 @@ class UploadFileInput(BaseModel):
 class UploadCSVInput(BaseModel):
     file_path: str = Field(..., description="Path to the CSV file to upload")
     selector: str = Field(..., description="CSS selector of the <input type='file'> element for CSV upload")
+    force: bool = Field(False, description="Upload even if the pre-upload check found errors; applies to every chunk of the file")
+    restart: bool = Field(False, description="Check the file again and start the chunk sequence over from chunk 1")
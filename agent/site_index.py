@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import difflib
+import hashlib
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from agent.cache import normalize_text
+from agent.config import Settings
+from agent.moodle_ws import client_for
+
+Fetch = Callable[[str], Awaitable[str]]
+
+#server-rendered pages that link every course of the user (the dashboard and My courses cards load via AJAX)
+COURSE_SOURCES = ("/grade/report/overview/index.php", "/my/courses.php", "/my/")
+
+COURSE_LINK = re.compile(
+    r"/(?:course/view\.php|grade/report/(?:user|grader)/index\.php|course/user\.php)\?(?:[^#]*&)?id=(\d+)"
+)
+ACTIVITY_LINK = re.compile(r"/mod/(\w+)/view\.php\?(?:[^#]*&)?id=(\d+)")
+
+#link texts that name the target page rather than the course
+GENERIC_TEXT = re.compile(
+    r"^(view course|переглянути курс|open course|course|курс|grades?|оцінки|participants|учасники|reports?|звіти)$", re.I
+)
+LABEL_PREFIX = re.compile(r"^(view course|переглянути курс)\s+", re.I)
+#screen-reader suffixes Moodle appends to activity links
+MODULE_SUFFIX = re.compile(r"\s+(assignment|завдання|quiz|тест|forum|форум|file|файл|page|сторінка|url)$", re.I)
+
+COURSE_PAGES = {
+    "course": "/course/view.php?id={id}",
+    "grades": "/grade/report/user/index.php?id={id}",
+    "grader": "/grade/report/grader/index.php?id={id}",
+    "import": "/grade/import/csv/index.php?id={id}",
+    "export": "/grade/export/xls/index.php?id={id}",
+    "participants": "/user/index.php?id={id}",
+    "assignments": "/mod/assign/index.php?id={id}",
+}
+ACTIVITY_PAGES = {
+    "activity": "/mod/{module}/view.php?id={id}",
+    "grading": "/mod/assign/view.php?id={id}&action=grading",
+    "grade_student": "/mod/assign/view.php?id={id}&action=grader",
+}
+
+MIN_SCORE = 0.45
+#aliases this short (acronyms, shortnames) never match fuzzily
+SHORT_ALIAS = 5
+
+
+@dataclass
+class Activity:
+    id: int
+    module: str
+    name: str
+
+
+@dataclass
+class Course:
+    id: int
+    name: str
+    shortname: str = ""
+    activities: List[Activity] = field(default_factory=list)
+    activities_at: float = 0.0
+
+    @property
+    def aliases(self) -> List[str]:
+        words = [w for w in re.findall(r"\w+", self.name) if not w.isdigit()]
+        acronym = "".join(w[0] for w in words) if len(words) > 1 else ""
+        return [a for a in (self.name, self.shortname, acronym) if a]
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: List[Tuple[str, str]] = []
+        self._href: Optional[str] = None
+        self._label = ""
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        if tag == "a":
+            values = dict(attrs)
+            self._href = values.get("href") or ""
+            self._label = values.get("aria-label") or values.get("title") or ""
+            self._text = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "a" and self._href is not None:
+            text = " ".join("".join(self._text).split())
+            self.links.append((self._href, text if text and not GENERIC_TEXT.match(text) else self._label))
+            self._href = None
+
+    def handle_data(self, data: str) -> None:
+        if self._href is not None:
+            self._text.append(data)
+
+
+def harvest_links(html: str) -> Tuple[Dict[int, str], List[Activity]]:
+    """Course ids with their best name, and activities, linked from a Moodle page."""
+    parser = _LinkParser()
+    parser.feed(html)
+    courses: Dict[int, str] = {}
+    activities: Dict[int, Activity] = {}
+    for href, text in parser.links:
+        name = LABEL_PREFIX.sub("", text).strip()
+        if GENERIC_TEXT.match(name):
+            name = ""
+        match = ACTIVITY_LINK.search(href)
+        if match:
+            cmid = int(match.group(2))
+            if name and cmid not in activities:
+                activities[cmid] = Activity(id=cmid, module=match.group(1), name=MODULE_SUFFIX.sub("", name))
+            continue
+        match = COURSE_LINK.search(href)
+        if match:
+            course_id = int(match.group(1))
+            #the longest text wins: course cards also carry short buttons and badges
+            if len(name) > len(courses.get(course_id, "")):
+                courses[course_id] = name
+            else:
+                courses.setdefault(course_id, "")
+    return courses, list(activities.values())
+
+
+def _score(query: str, candidate: str) -> float:
+    q, c = normalize_text(query), normalize_text(candidate)
+    if not q or not c:
+        return 0.0
+    if q == c:
+        return 1.0
+    q_words, c_words = set(re.findall(r"\w+", q)), set(re.findall(r"\w+", c))
+    overlap = len(q_words & c_words) / len(q_words) if q_words else 0.0
+    short, long = sorted((q, c), key=len)
+    #whole words only, so "html" does not contain the acronym "ml"
+    contained = 0.9 if len(short) >= 3 and re.search(rf"(?<!\w){re.escape(short)}(?!\w)", long) else 0.0
+    if len(short) < SHORT_ALIAS:
+        #acronyms and shortnames: a near-miss spelling is another course, not a typo
+        return max(contained, 0.8 * overlap)
+    return max(contained, 0.8 * overlap, difflib.SequenceMatcher(None, q, c).ratio())
+
+
+def best_matches(query: str, entries: Iterable[Tuple[Any, List[str]]], limit: int = 3) -> List[Tuple[float, Any]]:
+    scored = []
+    for entry, names in entries:
+        score = max((_score(query, name) for name in names), default=0.0)
+        if score >= MIN_SCORE:
+            scored.append((round(score, 2), entry))
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return scored[:limit]
+
+
+class SiteIndex:
+    """
+    Per-user map of course names to ids plus the activities of each course, saved as JSON next to the
+    storage state. The course list is rebuilt when older than ttl; a course's activities are fetched on
+    first lookup and refreshed with the same ttl, so most lookups need no request at all.
+    """
+
+    def __init__(self, path: Path, base_url: str, ttl: float = 21600.0) -> None:
+        self.path = path
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.courses: Dict[int, Course] = {}
+        self.built_at = 0.0
+        self._lock = asyncio.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if raw.get("base_url") != self.base_url:
+            return
+        self.built_at = float(raw.get("built_at", 0.0))
+        for c in raw.get("courses", []):
+            activities = [Activity(**a) for a in c.pop("activities", [])]
+            self.courses[int(c["id"])] = Course(**c, activities=activities)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "base_url": self.base_url,
+            "built_at": self.built_at,
+            "courses": [asdict(c) for c in self.courses.values()],
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+
+    @property
+    def stale(self) -> bool:
+        return not self.courses or time.time() - self.built_at > self.ttl
+
+    def url(self, path: str) -> str:
+        return urljoin(self.base_url + "/", path.lstrip("/"))
+
+    def add_courses(self, found: Dict[int, Tuple[str, str]]) -> None:
+        for course_id, (name, shortname) in found.items():
+            course = self.courses.get(course_id)
+            if course is None:
+                self.courses[course_id] = Course(id=course_id, name=name or f"Course {course_id}", shortname=shortname)
+                continue
+            if name:
+                course.name = name
+            if shortname:
+                course.shortname = shortname
+
+    async def refresh(self, fetch: Fetch, client: Optional[Any] = None, force: bool = False) -> None:
+        """Rebuild the course list (web services when available, otherwise page links) if stale."""
+        async with self._lock:
+            if not force and not self.stale:
+                return
+            found: Dict[int, Tuple[str, str]] = {}
+            if client is not None:
+                try:
+                    courses = await client.call("core_enrol_get_users_courses", userid=await client.user_id())
+                    found = {int(c["id"]): (c.get("fullname") or "", c.get("shortname") or "") for c in courses}
+                except Exception:
+                    found = {}
+            if not found:
+                pages = await asyncio.gather(*(fetch(self.url(p)) for p in COURSE_SOURCES), return_exceptions=True)
+                for html in pages:
+                    if isinstance(html, str):
+                        for course_id, name in harvest_links(html)[0].items():
+                            if len(name) > len(found.get(course_id, ("", ""))[0]):
+                                found[course_id] = (name, "")
+            if not found:
+                raise RuntimeError("No courses found on the overview pages.")
+            self.add_courses(found)
+            self.built_at = time.time()
+            self.save()
+
+    async def refresh_course(self, course: Course, fetch: Fetch, force: bool = False) -> None:
+        if not force and course.activities_at and time.time() - course.activities_at <= self.ttl:
+            return
+        html = await fetch(self.url(COURSE_PAGES["course"].format(id=course.id)))
+        course.activities = harvest_links(html)[1]
+        course.activities_at = time.time()
+        self.save()
+
+    def find_courses(self, query: str, limit: int = 3) -> List[Tuple[float, Course]]:
+        if query.strip().isdigit() and int(query) in self.courses:
+            return [(1.0, self.courses[int(query)])]
+        return best_matches(query, ((c, c.aliases) for c in self.courses.values()), limit)
+
+    def find_activities(self, query: str, courses: List[Course], module: str = "", limit: int = 3) -> List[Tuple[float, Activity, Course]]:
+        entries = [
+            ((a, c), [a.name])
+            for c in courses
+            for a in c.activities
+            if not module or a.module == module
+        ]
+        return [(score, a, c) for score, (a, c) in best_matches(query, entries, limit)]
+
+
+_INDEXES: Dict[Path, SiteIndex] = {}
+
+
+def site_index_for(cfg: Settings) -> SiteIndex:
+    """Shared index for cfg.lms_username, so every session of the same user reuses one file and lock."""
+    key = f"{cfg.lms_base_url.rstrip('/')}|{cfg.lms_username.strip().lower()}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    path = Path(cfg.storage_state_dir) / "site_index" / f"{digest}.json"
+    if path not in _INDEXES:
+        _INDEXES[path] = SiteIndex(path, cfg.lms_base_url, cfg.site_index_ttl)
+    return _INDEXES[path]
+
+
+def context_fetcher(context: Any) -> Fetch:
+    """HTML fetch through the browser context's request API: same cookies, no page render, main page untouched."""
+
+    async def fetch(url: str) -> str:
+        resp = await context.request.get(url)
+        if not resp.ok:
+            raise RuntimeError(f"HTTP {resp.status} for {url}")
+        if "/login/" in urlparse(resp.url).path:
+            raise RuntimeError("The LMS session has expired.")
+        return await resp.text()
+
+    return fetch
+
+
+_WARMING: set = set()
+
+
+def warm_site_index(cfg: Settings, runtime: Any) -> None:
+    """Build a stale index in the background right after login, so the first lookup is already local."""
+    index = site_index_for(cfg)
+    if not index.stale:
+        return
+    client = client_for(cfg) if cfg.moodle_ws_enabled else None
+
+    async def build() -> None:
+        try:
+            await index.refresh(context_fetcher(runtime.context), client)
+        except Exception:
+            #lookup_url retries and reports the error if it is still failing
+            pass
+
+    task = asyncio.get_running_loop().create_task(build())
+    _WARMING.add(task)
+    task.add_done_callback(_WARMING.discard)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from agent.auth import ensure_login, is_logged_in
+from agent.config import Settings
+from agent.schemas.moodle import NoInput
+from agent.schemas.skills import CourseGradebookInput, FilePickerUploadInput
+from agent.site_index import COURSE_PAGES, SiteIndex, context_fetcher
+
+STEP_TIMEOUT_MS = 10_000
+
+FILE_PICKER_BUTTON = ".fp-btn-choose"
+FILE_PICKER_DIALOG = ".filepicker"
+UPLOAD_REPOSITORY = re.compile(r"Upload a file|Завантажити файл", re.I)
+UPLOAD_INPUT = "input[name='repo_upload_file']"
+UPLOAD_BUTTON = ".fp-upload-btn"
+
+#Moodle page a gradebook view lives on, checked after navigating
+GRADEBOOK_PATHS = {
+    "grades": "/grade/report/user/index.php",
+    "grader": "/grade/report/grader/index.php",
+    "import": "/grade/import/csv/index.php",
+    "export": "/grade/export/xls/index.php",
+}
+
+
+class SkillError(RuntimeError):
+    """A step or post-condition of a skill failed; the agent continues with the generic tools."""
+
+
+@dataclass
+class SkillContext:
+    page: Any
+    cfg: Settings
+    context: Optional[Any] = None
+    index: Optional[SiteIndex] = None
+    client: Optional[Any] = None
+    step: str = ""
+    result: Dict[str, Any] = field(default_factory=dict)
+
+    def url(self, path: str) -> str:
+        return f"{self.cfg.lms_base_url.rstrip('/')}{path}"
+
+
+SkillFn = Callable[..., Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Skill:
+    name: str
+    description: str
+    args_schema: Type[BaseModel]
+    run: SkillFn
+    #what the agent should do with observe/act when the skill cannot finish
+    fallback: str
+
+
+SKILLS: Dict[str, Skill] = {}
+
+
+def skill(name: str, description: str, args_schema: Type[BaseModel], fallback: str) -> Callable[[SkillFn], SkillFn]:
+    def register(fn: SkillFn) -> SkillFn:
+        SKILLS[name] = Skill(name, description, args_schema, fn, fallback)
+        return fn
+
+    return register
+
+
+async def goto(ctx: SkillContext, path: str, expect: Optional[str] = None) -> None:
+    """Navigate and check the post-condition: no login redirect, and the URL contains expect."""
+    ctx.step = f"open {path}"
+    await ctx.page.goto(ctx.url(path) if path.startswith("/") else path)
+    if "/login/" in ctx.page.url:
+        raise SkillError("the LMS session has expired (redirected to the login page)")
+    if expect and expect not in ctx.page.url:
+        raise SkillError(f"expected {expect}, landed on {ctx.page.url}")
+
+
+async def expect_element(ctx: SkillContext, selector: str, what: str, state: str = "visible") -> Any:
+    ctx.step = f"wait for {what}"
+    locator = ctx.page.locator(selector).first
+    try:
+        await locator.wait_for(state=state, timeout=STEP_TIMEOUT_MS)
+    except Exception:
+        raise SkillError(f"{what} did not appear on {ctx.page.url}")
+    return locator
+
+
+async def resolve_course(ctx: SkillContext, course: str) -> int:
+    """Course id from an id, a course URL or a fuzzy course name (through the site index)."""
+    ctx.step = f"find course '{course}'"
+    course = course.strip()
+    if course.isdigit():
+        return int(course)
+    match = re.search(r"[?&]id=(\d+)", course)
+    if match:
+        return int(match.group(1))
+    if ctx.index is None:
+        raise SkillError("course names need the site index; pass the course id")
+    await ctx.index.refresh(context_fetcher(ctx.context), ctx.client)
+    matches = ctx.index.find_courses(course)
+    if not matches:
+        raise SkillError(f"no course matches '{course}'")
+    #two close candidates are ambiguous; let the agent ask or pick
+    if len(matches) > 1 and matches[0][0] - matches[1][0] < 0.05:
+        raise SkillError(f"'{course}' is ambiguous: {', '.join(c.name for _, c in matches)}")
+    ctx.result["course"] = matches[0][1].name
+    return matches[0][1].id
+
+
+@skill(
+    "open_my_courses",
+    "Open 'My courses' (the grid of enrolled course cards) in one step.",
+    NoInput,
+    "Click 'My courses' in the top navigation bar.",
+)
+async def open_my_courses(ctx: SkillContext) -> None:
+    await goto(ctx, "/my/courses.php", "/my/courses.php")
+
+
+@skill(
+    "open_grades_overview",
+    "Open the global Grades page (every course with its course total) in one step.",
+    NoInput,
+    "Click the profile icon (top-right), then 'Grades'.",
+)
+async def open_grades_overview(ctx: SkillContext) -> None:
+    await goto(ctx, "/grade/report/overview/index.php", "/grade/report/overview/")
+    await expect_element(ctx, "table", "the grades table")
+
+
+@skill(
+    "open_course_gradebook",
+    "Open a course's gradebook in one step: the user report ('grades'), the teacher's grader report ('grader'), "
+    "the CSV import page ('import') or the export page ('export'). The course may be a name, id or URL.",
+    CourseGradebookInput,
+    "Open the course (lookup_url or My courses), click 'Grades', then pick the view from the gradebook menu.",
+)
+async def open_course_gradebook(ctx: SkillContext, course: str, view: str = "grader") -> None:
+    course_id = await resolve_course(ctx, course)
+    await goto(ctx, COURSE_PAGES[view].format(id=course_id), GRADEBOOK_PATHS[view])
+    ctx.result["course_id"] = course_id
+    if view == "import":
+        await expect_element(ctx, FILE_PICKER_BUTTON, "the 'Choose a file...' button")
+
+
+@skill(
+    "open_file_picker_upload",
+    "On a page with a Moodle file picker (e.g. CSV import, assignment submission): click 'Choose a file...', "
+    "open 'Upload a file' and return the real <input type='file'> selector. With file_path the file is also "
+    "attached and 'Upload this file' is clicked. For grade CSVs, omit file_path and call upload_csv with the selector.",
+    FilePickerUploadInput,
+    "Click 'Choose a file...', click 'Upload a file', observe the <input type='file'> in the dialog, "
+    "call upload_file/upload_csv with it, then click 'Upload this file'.",
+)
+async def open_file_picker_upload(ctx: SkillContext, file_path: Optional[str] = None) -> None:
+    button = await expect_element(ctx, FILE_PICKER_BUTTON, "the 'Choose a file...' button")
+    ctx.step = "click 'Choose a file...'"
+    await button.click(timeout=STEP_TIMEOUT_MS)
+    await expect_element(ctx, FILE_PICKER_DIALOG, "the file picker dialog")
+
+    ctx.step = "choose 'Upload a file'"
+    await ctx.page.locator(".fp-repo").filter(has_text=UPLOAD_REPOSITORY).first.click(timeout=STEP_TIMEOUT_MS)
+    await expect_element(ctx, UPLOAD_INPUT, "the upload form", state="attached")
+    ctx.result["selector"] = UPLOAD_INPUT
+    if not file_path:
+        return
+
+    ctx.step = "attach the file"
+    await ctx.page.set_input_files(UPLOAD_INPUT, file_path)
+    ctx.step = "click 'Upload this file'"
+    await ctx.page.locator(UPLOAD_BUTTON).first.click(timeout=STEP_TIMEOUT_MS)
+    #the dialog closes once Moodle has stored the draft file
+    await expect_element(ctx, FILE_PICKER_DIALOG, "the closed file picker", state="hidden")
+    ctx.result["uploaded"] = file_path
+
+
+@skill(
+    "ensure_logged_in",
+    "Check the LMS session and log in again with the configured credentials if it has expired.",
+    NoInput,
+    "Open the login page and sign in with the username and password form.",
+)
+async def ensure_logged_in(ctx: SkillContext) -> None:
+    ctx.step = "check the session"
+    if await is_logged_in(ctx.page, ctx.cfg):
+        return
+    ctx.step = "log in"
+    ok, error = await ensure_login(ctx.cfg)
+    if not ok or "/login/" in ctx.page.url:
+        raise SkillError(error or "the login form did not accept the credentials")
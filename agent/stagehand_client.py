@@ -2,11 +2,13 @@ from __future__ import annotations
 
 
 import threading
+from typing import Any
 
-from stagehand import Stagehand, StagehandConfig
-
+from agent.cache import ActionCache, ObserveCache
 from agent.config import Settings
+from agent.network import install_network_filter
 from agent.runtime import RUNTIME
+from agent.storage_state import restore_storage_state
 
 
 def disable_stagehand_signal_handlers_if_needed() -> None:
@@ -14,20 +16,29 @@ def disable_stagehand_signal_handlers_if_needed() -> None:
     Streamlit runs code in a ScriptRunner thread, where signal.signal() is not allowed.
     Stagehand registers signal handlers in __init__, so we no-op that method in non-main threads.
     """
+    from stagehand import Stagehand
+
     if threading.current_thread() is not threading.main_thread():
         if hasattr(Stagehand, "_register_signal_handlers"):
             Stagehand._register_signal_handlers = lambda self: None  # type: ignore[attr-defined]
 
 
-async def init_stagehand(cfg: Settings) -> None:
+async def create_stagehand(cfg: Settings) -> Any:
+    #stagehand pulls in litellm and several provider SDKs, so it is only imported once a browser is needed
+    from stagehand import Stagehand, StagehandConfig
+
     disable_stagehand_signal_handlers_if_needed()
 
     show_real_time = True
     if cfg.show_realtime == "yes" or (isinstance(cfg.show_realtime, bool) and cfg.show_realtime is True):
         show_real_time = False
 
+    launch_options = {"headless": show_real_time}
+    if cfg.stagehand_cdp_url:
+        launch_options["cdp_url"] = cfg.stagehand_cdp_url
+
     sh_cfg = StagehandConfig(
-        localBrowserLaunchOptions={"headless": show_real_time},
+        localBrowserLaunchOptions=launch_options,
         env=cfg.stagehand_env,
         api_key=cfg.browserbase_api_key,
         project_id=cfg.browserbase_project_id,
@@ -38,9 +49,26 @@ async def init_stagehand(cfg: Settings) -> None:
 
     client = Stagehand(sh_cfg)
     await client.init()
+    return client
+
+
+async def init_stagehand(cfg: Settings) -> None:
+    client = await create_stagehand(cfg)
 
     RUNTIME.client = client
     RUNTIME.page = client.page
+    RUNTIME.context = client.context
+    RUNTIME.observe_cache = ObserveCache(cfg.observe_cache_size, cfg.observe_cache_ttl)
+    RUNTIME.action_cache = ActionCache(cfg.action_cache_size, cfg.action_cache_ttl)
+    try:
+        RUNTIME.network = await install_network_filter(client.context, cfg)
+    except Exception:
+        RUNTIME.network = None
+
+    try:
+        RUNTIME.restored_state = await restore_storage_state(client.context, cfg)
+    except Exception:
+        RUNTIME.restored_state = False
 
 
 async def close_stagehand() -> None:
@@ -48,3 +76,7 @@ async def close_stagehand() -> None:
         await RUNTIME.client.close()
     RUNTIME.client = None
     RUNTIME.page = None
+    RUNTIME.context = None
+    RUNTIME.observe_cache.clear()
+    RUNTIME.restored_state = False
+    RUNTIME.network = None
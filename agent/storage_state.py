@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+from agent.config import Settings
+
+SALT_BYTES = 16
+KDF_ITERATIONS = 200_000
+
+LOCAL_STORAGE_JS = """
+(origins) => {
+    const entry = origins.find((o) => o.origin === window.location.origin);
+    if (!entry) return;
+    for (const item of entry.localStorage || []) {
+        window.localStorage.setItem(item.name, item.value);
+    }
+}
+"""
+
+
+def derive_fernet(secret: str, salt: bytes) -> Fernet:
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(secret.encode("utf-8"))))
+
+
+class StorageStateStore:
+    """
+    Encrypted on-disk Playwright storage state (cookies + localStorage), one file per LMS user.
+    The key is always derived from the user's LMS password (plus STORAGE_STATE_KEY when it is set),
+    so only the right password can restore the session, and a changed password simply makes the
+    old file unreadable and forces a fresh login.
+    """
+
+    def __init__(self, directory: Path, secret: str) -> None:
+        self.directory = directory
+        self.secret = secret
+
+    @classmethod
+    def from_settings(cls, cfg: Settings) -> Optional["StorageStateStore"]:
+        if not cfg.storage_state_enabled or not cfg.lms_username or not cfg.lms_password:
+            return None
+        #the password is the verifier: a state that decrypts was stored by a login with the same password
+        return cls(Path(cfg.storage_state_dir), f"{cfg.lms_username}:{cfg.storage_state_key}:{cfg.lms_password}")
+
+    def _path(self, username: str) -> Path:
+        digest = hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()[:32]
+        return self.directory / f"{digest}.state"
+
+    def load(self, username: str) -> Optional[Dict[str, Any]]:
+        path = self._path(username)
+        if not path.exists():
+            return None
+        blob = path.read_bytes()
+        try:
+            raw = derive_fernet(self.secret, blob[:SALT_BYTES]).decrypt(blob[SALT_BYTES:])
+            return json.loads(raw)
+        except (InvalidToken, ValueError):
+            return None
+
+    def save(self, username: str, state: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        salt = os.urandom(SALT_BYTES)
+        token = derive_fernet(self.secret, salt).encrypt(json.dumps(state).encode("utf-8"))
+        path = self._path(username)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(salt + token)
+        os.chmod(tmp, 0o600)
+        tmp.replace(path)
+
+    def delete(self, username: str) -> None:
+        self._path(username).unlink(missing_ok=True)
+
+
+async def apply_storage_state(context: Any, state: Dict[str, Any]) -> None:
+    cookies = state.get("cookies") or []
+    if cookies:
+        await context.add_cookies(cookies)
+    origins = state.get("origins") or []
+    if origins:
+        await context.add_init_script(f"({LOCAL_STORAGE_JS})({json.dumps(origins)})")
+
+
+async def restore_storage_state(context: Any, cfg: Settings) -> bool:
+    """Load the stored session for cfg.lms_username into a browser context. Returns True if one was applied."""
+    store = StorageStateStore.from_settings(cfg)
+    if store is None:
+        return False
+    state = store.load(cfg.lms_username)
+    if not state:
+        return False
+    await apply_storage_state(context, state)
+    return True
+
+
+async def persist_storage_state(context: Any, cfg: Settings) -> None:
+    store = StorageStateStore.from_settings(cfg)
+    if store is None:
+        return
+    store.save(cfg.lms_username, await context.storage_state())
+
+
+def forget_storage_state(cfg: Settings) -> None:
+    store = StorageStateStore.from_settings(cfg)
+    if store is not None:
+        store.delete(cfg.lms_username)
@@ -1,7 +1,103 @@
 from __future__ import annotations
 
+from typing import Any, Optional
+
 from langchain_core.tools import BaseTool
-from agent.runtime import require_page
+
+from agent.cache import ActionCache, CachedAction, normalize_text
+from agent.runtime import current_runtime, require_page, invalidate_observations
+
+REPLAY_TIMEOUT_MS = 3000
+
+
+class ActionNotStarted(RuntimeError):
+    """The target element was not there, so nothing was done and another way of acting is safe."""
+
+
+async def _element_text(page: Any, selector: str) -> str:
+    try:
+        return normalize_text(await page.locator(selector).first.inner_text(timeout=REPLAY_TIMEOUT_MS))
+    except Exception:
+        return ""
+
+
+async def _perform(page: Any, action: CachedAction) -> None:
+    """
+    Execute a resolved action with plain Playwright calls (no model involved). Raises ActionNotStarted
+    when the element is missing; any later error means the action may already have taken effect.
+    """
+    locator = page.locator(action.selector).first
+    arg = str(action.arguments[0]) if action.arguments else ""
+
+    if action.method != "press":
+        try:
+            await locator.wait_for(state="attached", timeout=REPLAY_TIMEOUT_MS)
+        except Exception as e:
+            raise ActionNotStarted(f"{action.selector} not found") from e
+
+    if action.method == "click":
+        await locator.evaluate("(el) => el.click()")
+    elif action.method in ("fill", "type"):
+        await locator.fill(arg, force=True, timeout=REPLAY_TIMEOUT_MS)
+    elif action.method == "press":
+        await page.keyboard.press(arg)
+    elif action.method == "selectOptionFromDropdown":
+        await locator.select_option(arg, timeout=REPLAY_TIMEOUT_MS)
+    else:
+        from stagehand import ObserveResult
+
+        result = await page.act(
+            ObserveResult(
+                selector=action.selector,
+                description=action.description,
+                method=action.method,
+                arguments=list(action.arguments),
+            )
+        )
+        if not result.success:
+            raise ActionNotStarted(result.message)
+        return
+
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=10_000)
+    except Exception:
+        pass
+
+
+async def _replay(page: Any, action: CachedAction) -> bool:
+    """False when the cached element is gone or changed, so nothing was done; errors after that propagate."""
+    if action.text and await _element_text(page, action.selector) != action.text:
+        return False
+    try:
+        await _perform(page, action)
+        return True
+    except ActionNotStarted:
+        return False
+
+
+def _maybe_done(action: CachedAction, error: Exception) -> str:
+    return (
+        f"Error: [{action.method}] on {action.selector} failed after it may already have taken effect: {error}. "
+        "Observe the page to check the outcome before repeating the action."
+    )
+
+
+async def _resolve(page: Any, instruction: str) -> Optional[CachedAction]:
+    """One observe() call turns the instruction into a concrete selector + method."""
+    try:
+        candidates = await page.observe(instruction)
+    except Exception:
+        return None
+    for candidate in candidates or []:
+        if candidate.method and candidate.method != "not-supported" and candidate.selector:
+            return CachedAction(
+                selector=candidate.selector,
+                method=candidate.method,
+                arguments=tuple(str(a) for a in candidate.arguments or ()),
+                description=candidate.description,
+                text=await _element_text(page, candidate.selector),
+            )
+    return None
 
 
 class ActTool(BaseTool):
@@ -9,8 +105,41 @@ class ActTool(BaseTool):
     description: str = "Perform browser actions like clicking and typing (Stagehand act)."
 
     async def _arun(self, instruction: str) -> str:
+        from stagehand import ActResult
+
         page = require_page()
-        result = await page.act(instruction)
+        url = page.url
+        key = ActionCache.make_key(url, instruction)
+        actions = current_runtime().action_cache
+        try:
+            cached = actions.get(key)
+            if cached is not None:
+                try:
+                    replayed = await _replay(page, cached)
+                except Exception as e:
+                    actions.discard(key)
+                    #falling back to page.act() here could click or submit a second time
+                    return _maybe_done(cached, e)
+                if replayed:
+                    result = ActResult(success=True, message=f"Replayed cached [{cached.method}] on {cached.selector}", action=cached.description)
+                    return f"Action result: {result}"
+                actions.discard(key)
+
+            resolved = await _resolve(page, instruction)
+            if resolved is not None:
+                try:
+                    await _perform(page, resolved)
+                    actions.put(key, resolved)
+                    result = ActResult(success=True, message=f"Action [{resolved.method}] performed on {resolved.selector}", action=resolved.description)
+                    return f"Action result: {result}"
+                except ActionNotStarted:
+                    pass
+                except Exception as e:
+                    return _maybe_done(resolved, e)
+
+            result = await page.act(instruction)
+        finally:
+            invalidate_observations(url)
         return f"Action result: {result}"
 
     def _run(self, instruction: str) -> str:
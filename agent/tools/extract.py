@@ -1,16 +1,20 @@
 from __future__ import annotations
 
 from langchain_core.tools import BaseTool
-from agent.runtime import require_page
+
+from agent.compaction import DEFAULT_MAX_CHARS, compact_result
+from agent.runtime import current_runtime, require_page
 
 
 class ExtractTool(BaseTool):
     name: str = "extract"
     description: str = "Extract structured data from the current page (Stagehand extract)."
+    max_chars: int = DEFAULT_MAX_CHARS
 
     async def _arun(self, instruction: str) -> str:
         page = require_page()
-        return await page.extract(instruction)
+        result = await page.extract(instruction)
+        return compact_result(result, current_runtime().results, self.max_chars)
 
     def _run(self, instruction: str) -> str:
         raise NotImplementedError("This tool is async-only.")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.compaction import DEFAULT_MAX_CHARS, compact_result
+from agent.runtime import current_runtime, open_tab
+from agent.schemas.fanout import FanOutExtractInput
+
+PAGE_PATHS = {
+    "grades": "/grade/report/user/index.php?id={id}",
+    "course": "/course/view.php?id={id}",
+}
+
+
+class FanOutExtractTool(BaseTool):
+    name: str = "extract_many"
+    description: str = (
+        "Run the same extraction on several courses/pages at once, each in its own tab of the logged-in browser. "
+        "Use for cross-course questions (grades in every course, ungraded assignments across courses) "
+        "instead of visiting courses one by one. Returns merged results per target."
+    )
+    args_schema: Type[BaseModel] = FanOutExtractInput
+    base_url: str = "https://learn.ucu.edu.ua"
+    default_concurrency: int = 4
+    max_chars: int = DEFAULT_MAX_CHARS
+
+    def _url(self, target: str, page: str) -> str:
+        target = target.strip()
+        if target.isdigit():
+            return self.base_url.rstrip("/") + PAGE_PATHS[page].format(id=target)
+        return target
+
+    async def _arun(
+        self,
+        targets: List[str],
+        instruction: str,
+        page: str = "grades",
+        concurrency: Optional[int] = None,
+    ) -> str:
+        runtime = current_runtime()
+        #the model may ask for fewer tabs, never for more than the configured limit
+        limit = asyncio.Semaphore(max(1, min(concurrency or self.default_concurrency, self.default_concurrency)))
+
+        async def one(target: str) -> Dict[str, Any]:
+            url = self._url(target, page)
+            async with limit:
+                try:
+                    async with open_tab(runtime, url) as tab:
+                        data = await tab.extract(instruction)
+                    return {"target": target, "url": url, "data": data}
+                except Exception as e:
+                    return {"target": target, "url": url, "error": str(e)}
+
+        results = await asyncio.gather(*(one(t) for t in dict.fromkeys(targets)))
+        merged = {
+            "results": [r for r in results if "error" not in r],
+            "errors": [r for r in results if "error" in r],
+        }
+        return compact_result(merged, runtime.results, self.max_chars)
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
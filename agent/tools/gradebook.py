@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.compaction import compact_result
+from agent.gradebook import GradebookStore, fetch_course_grades, match_items, query_frame, read_export
+from agent.runtime import current_runtime
+from agent.schemas.gradebook import QueryGradesInput
+
+EXPORT_HINT = (
+    "Download the gradebook export (Grades > Export > Plain text file) with the browser and call query_grades "
+    "again with export_path."
+)
+
+
+class QueryGradesTool(BaseTool):
+    name: str = "query_grades"
+    description: str = (
+        "Answer questions about a course's grades (averages, who is below/above a threshold, a student's grades, "
+        "per-item statistics) from a local gradebook snapshot. The snapshot is synced from web services or a "
+        "gradebook export when stale. Use this instead of extracting the grader report in the browser."
+    )
+    args_schema: Type[BaseModel] = QueryGradesInput
+    store: Any
+    client: Optional[Any] = None
+    max_chars: int = 6000
+
+    async def _sync(self, course_id: int, refresh: bool, export_path: Optional[str]) -> Optional[str]:
+        """Bring the snapshot up to date; returns a note when stale data has to be used."""
+        store: GradebookStore = self.store
+        if export_path:
+            records = await asyncio.to_thread(read_export, Path(export_path))
+            store.replace(course_id, records, "course", "export")
+            return None
+        if not refresh and store.is_fresh(course_id):
+            return None
+        if self.client is not None:
+            try:
+                scope, records = await fetch_course_grades(self.client, course_id)
+                store.replace(course_id, records, scope, "web services")
+                return None
+            except Exception as e:
+                if store.snapshot(course_id) is None:
+                    raise RuntimeError(f"Web services failed ({e}). {EXPORT_HINT}")
+                return f"Re-sync failed ({e}); answering from the older snapshot."
+        if store.snapshot(course_id) is None:
+            raise RuntimeError(f"No gradebook snapshot for course {course_id}. {EXPORT_HINT}")
+        return "Snapshot is stale and web services are off; pass export_path with a fresh export to update it."
+
+    async def _arun(
+        self,
+        course_id: int,
+        item: Optional[str] = None,
+        student: Optional[str] = None,
+        below: Optional[float] = None,
+        above: Optional[float] = None,
+        percent: bool = False,
+        aggregate: str = "summary",
+        refresh: bool = False,
+        export_path: Optional[str] = None,
+    ) -> str:
+        store: GradebookStore = self.store
+        try:
+            note = await self._sync(course_id, refresh, export_path)
+            #the first call pays for importing pandas, so the frame is built off the event loop
+            frame = await asyncio.to_thread(store.frame, course_id)
+            items = match_items(frame, item) if item else None
+            if item and not items:
+                return f"No grade item matches '{item}'. Items: {', '.join(sorted(set(frame['item'])))}."
+            result = query_frame(frame, items[:1] if items else None, student, below, above, percent, aggregate)
+        except Exception as e:
+            return f"Grade query failed: {e}"
+
+        synced_at, scope, source = store.snapshot(course_id)
+        payload = {
+            "snapshot": {"source": source, "scope": scope, "age_s": round(time.time() - synced_at)},
+            "item": items[0] if items else None,
+            "result": result,
+        }
+        if note:
+            payload["note"] = note
+        if isinstance(result, list) and len(json.dumps(payload, ensure_ascii=False, default=str)) > self.max_chars:
+            return compact_result(payload, current_runtime().results, self.max_chars)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
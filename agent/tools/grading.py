@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, List, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.grading import GradeRow, GradingProgress, grader_url, run_batch, summarize
+from agent.runtime import require_page, invalidate_observations
+from agent.schemas.grading import BatchGradeInput, GradeRowInput
+
+
+class BatchGradeTool(BaseTool):
+    name: str = "grade_batch"
+    description: str = (
+        "Grade many students of one assignment in a single call (scripted 'Change user' workflow: "
+        "select student, enter grade and feedback, save, verify). Use this instead of grading students "
+        "one by one with act/observe. Returns a per-row report; rerun with the same rows to resume after a failure."
+    )
+    args_schema: Type[BaseModel] = BatchGradeInput
+    base_url: str = "https://learn.ucu.edu.ua"
+    progress_dir: str = ".lms_state/grading"
+    username: str = ""
+    gradebook: Optional[Any] = None
+
+    async def _arun(self, assignment: str, rows: List[GradeRowInput], restart: bool = False) -> str:
+        page = require_page()
+        url = grader_url(self.base_url, assignment)
+        progress = GradingProgress(Path(self.progress_dir), url, self.username)
+        if restart:
+            progress.reset()
+
+        grade_rows = [
+            GradeRow(student=r.student, grade=r.grade, feedback=r.feedback)
+            if isinstance(r, GradeRowInput)
+            else GradeRow(**r)
+            for r in rows
+        ]
+        try:
+            report = await run_batch(page, url, grade_rows, progress)
+        except Exception as e:
+            return f"Batch grading failed: {e}"
+        finally:
+            invalidate_observations(url)
+        if self.gradebook is not None and any(r.status == "saved" for r in report):
+            #the grader URL names the assignment, not its course, so every cached snapshot goes stale
+            self.gradebook.invalidate()
+        return json.dumps(summarize(report), ensure_ascii=False)
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime
+from typing import Any, List, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.moodle_ws import MoodleWSClient
+from agent.schemas.moodle import AssignmentsInput, CourseGradesInput, NoInput, UpcomingEventsInput
+
+FALLBACK_HINT = "Use the browser tools (navigate/observe/extract) instead."
+
+
+def _date(timestamp: Any) -> Optional[str]:
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(int(timestamp)).strftime("%Y-%m-%d %H:%M")
+
+
+def _dump(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class MoodleWSTool(BaseTool):
+    """Base for read-only tools that answer from Moodle web services instead of the browser."""
+
+    client: Any
+
+    async def _query(self, **kwargs: Any) -> Any:
+        raise NotImplementedError
+
+    async def _arun(self, **kwargs: Any) -> str:
+        try:
+            return _dump(await self._query(**kwargs))
+        except Exception as e:
+            return f"Moodle web service failed: {e}. {FALLBACK_HINT}"
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
+
+
+class MyCoursesTool(MoodleWSTool):
+    name: str = "moodle_courses"
+    description: str = (
+        "List the user's enrolled courses (id, names, progress) via Moodle web services. "
+        "Preferred over browsing 'My courses'."
+    )
+    args_schema: Type[BaseModel] = NoInput
+
+    async def _query(self) -> Any:
+        courses = await self.client.call("core_enrol_get_users_courses", userid=await self.client.user_id())
+        return [
+            {
+                "id": c.get("id"),
+                "shortname": c.get("shortname"),
+                "fullname": c.get("fullname"),
+                "progress": c.get("progress"),
+                "lastaccess": _date(c.get("lastaccess")),
+                "url": f"{self.client.base_url}/course/view.php?id={c.get('id')}",
+            }
+            for c in courses
+        ]
+
+
+class CourseGradesTool(MoodleWSTool):
+    name: str = "moodle_grades"
+    description: str = (
+        "Get the user's grade items for one course via Moodle web services. "
+        "Preferred over opening the gradebook in the browser."
+    )
+    args_schema: Type[BaseModel] = CourseGradesInput
+
+    async def _query(self, course_id: int) -> Any:
+        report = await self.client.call(
+            "gradereport_user_get_grade_items", courseid=course_id, userid=await self.client.user_id()
+        )
+        result = []
+        for usergrade in report.get("usergrades", []):
+            for item in usergrade.get("gradeitems", []):
+                result.append(
+                    {
+                        "item": item.get("itemname") or item.get("itemtype"),
+                        "grade": item.get("gradeformatted"),
+                        "range": item.get("rangeformatted"),
+                        "percentage": item.get("percentageformatted"),
+                    }
+                )
+        return result
+
+
+class UpcomingEventsTool(MoodleWSTool):
+    name: str = "moodle_upcoming_events"
+    description: str = (
+        "List upcoming deadlines and calendar action events via Moodle web services. "
+        "Preferred over opening the Calendar in the browser."
+    )
+    args_schema: Type[BaseModel] = UpcomingEventsInput
+
+    async def _query(self, days: int = 14) -> Any:
+        now = int(time.time())
+        payload = await self.client.call(
+            "core_calendar_get_action_events_by_timesort",
+            timesortfrom=now,
+            timesortto=now + days * 86400,
+            limitnum=50,
+        )
+        return [
+            {
+                "name": e.get("name"),
+                "course": (e.get("course") or {}).get("fullname"),
+                "due": _date(e.get("timesort")),
+                "action": (e.get("action") or {}).get("name"),
+                "url": e.get("url"),
+            }
+            for e in payload.get("events", [])
+        ]
+
+
+class AssignmentsTool(MoodleWSTool):
+    name: str = "moodle_assignments"
+    description: str = (
+        "List assignments (with due dates and module ids) for the given or all enrolled courses via Moodle web services."
+    )
+    args_schema: Type[BaseModel] = AssignmentsInput
+
+    async def _query(self, course_ids: Optional[List[int]] = None) -> Any:
+        params = {"courseids": course_ids} if course_ids else {}
+        payload = await self.client.call("mod_assign_get_assignments", **params)
+        return [
+            {
+                "course_id": course.get("id"),
+                "course": course.get("fullname"),
+                "id": a.get("id"),
+                "cmid": a.get("cmid"),
+                "name": a.get("name"),
+                "due": _date(a.get("duedate")),
+                "url": f"{self.client.base_url}/mod/assign/view.php?id={a.get('cmid')}",
+            }
+            for course in payload.get("courses", [])
+            for a in course.get("assignments", [])
+        ]
+
+
+def build_moodle_tools(client: MoodleWSClient) -> List[BaseTool]:
+    return [
+        MyCoursesTool(client=client),
+        CourseGradesTool(client=client),
+        UpcomingEventsTool(client=client),
+        AssignmentsTool(client=client),
+    ]
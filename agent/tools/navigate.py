@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from langchain_core.tools import BaseTool
-from agent.runtime import require_page
+from agent.runtime import require_page, invalidate_observations
 
 
 class NavigateTool(BaseTool):
@@ -10,6 +10,7 @@ class NavigateTool(BaseTool):
 
     async def _arun(self, url: str) -> str:
         page = require_page()
+        invalidate_observations(url)
         await page.goto(url)
         return f"Navigated to {url}"
 
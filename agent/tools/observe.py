@@ -1,16 +1,35 @@
 from __future__ import annotations
 
 from langchain_core.tools import BaseTool
-from agent.runtime import require_page
+
+from agent.cache import ObserveCache, page_fingerprint
+from agent.compaction import DEFAULT_MAX_CHARS, compact_result
+from agent.runtime import current_runtime, require_page
 
 
 class ObserveTool(BaseTool):
     name: str = "observe"
     description: str = "Observe the current webpage and look for elements (Stagehand observe)."
+    max_chars: int = DEFAULT_MAX_CHARS
 
     async def _arun(self, goal: str) -> str:
         page = require_page()
-        return await page.observe(goal)
+        runtime = current_runtime()
+        return compact_result(await self._observe(page, runtime.observe_cache, goal), runtime.results, self.max_chars)
+
+    async def _observe(self, page, cache: ObserveCache, goal: str):
+        fingerprint = await page_fingerprint(page)
+        if not fingerprint:
+            return await page.observe(goal)
+
+        key = ObserveCache.make_key(page.url, fingerprint, goal)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = await page.observe(goal)
+        cache.put(key, result)
+        return result
 
     def _run(self, goal: str) -> str:
         raise NotImplementedError("This tool is async-only.")
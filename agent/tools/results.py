@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.compaction import DEFAULT_MAX_CHARS, read_stored
+from agent.runtime import current_runtime
+from agent.schemas.results import ReadResultInput
+
+
+class ReadResultTool(BaseTool):
+    name: str = "read_result"
+    description: str = (
+        "Page through a large extract/observe/extract_many result that was truncated. "
+        "Pass the result_id and next_offset shown in the truncated output."
+    )
+    args_schema: Type[BaseModel] = ReadResultInput
+    max_chars: int = DEFAULT_MAX_CHARS
+
+    async def _arun(self, result_id: str, offset: int = 0, limit: int = 50) -> str:
+        return read_stored(current_runtime().results, result_id, offset, limit, self.max_chars)
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, List, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from agent.runtime import current_runtime
+from agent.schemas.site_index import LookupURLInput
+from agent.site_index import ACTIVITY_PAGES, COURSE_PAGES, Course, SiteIndex, context_fetcher
+
+NOT_FOUND_HINT = "Open 'My courses' or the global Grades page in the browser instead."
+
+
+class LookupURLTool(BaseTool):
+    name: str = "lookup_url"
+    description: str = (
+        "Find the direct URL of a course page (course, grades, grader report, CSV import, ...) or of an "
+        "assignment/activity by fuzzy name, from the user's site index. Call this first and 'navigate' to the "
+        "returned URL instead of clicking through Dashboard, My courses and course tabs."
+    )
+    args_schema: Type[BaseModel] = LookupURLInput
+    index: Any
+    client: Optional[Any] = None
+
+    async def _arun(self, query: str, page: str = "course", course: Optional[str] = None) -> str:
+        index: SiteIndex = self.index
+        try:
+            fetch = context_fetcher(current_runtime().context)
+            await index.refresh(fetch, self.client)
+            if page in COURSE_PAGES:
+                return self._courses(index, await self._find_courses(index, query, fetch), page)
+            courses = [c for _, c in await self._find_courses(index, course, fetch)] if course else list(index.courses.values())
+            return await self._activities(index, query, courses, page, fetch)
+        except Exception as e:
+            return f"Site index lookup failed: {e}. {NOT_FOUND_HINT}"
+
+    async def _find_courses(self, index: SiteIndex, query: str, fetch: Any) -> List[Any]:
+        matches = index.find_courses(query)
+        if not matches:
+            #a course the user joined since the index was built
+            await index.refresh(fetch, self.client, force=True)
+            matches = index.find_courses(query)
+        return matches
+
+    def _courses(self, index: SiteIndex, matches: List[Any], page: str) -> str:
+        if not matches:
+            return f"No course matches. Known courses: {', '.join(c.name for c in index.courses.values())}."
+        return json.dumps(
+            [
+                {"course": c.name, "id": c.id, "score": score, "url": index.url(COURSE_PAGES[page].format(id=c.id))}
+                for score, c in matches
+            ],
+            ensure_ascii=False,
+        )
+
+    async def _activities(self, index: SiteIndex, query: str, courses: List[Course], page: str, fetch: Any) -> str:
+        if not courses:
+            return f"No course matches. {NOT_FOUND_HINT}"
+        module = "" if page == "activity" else "assign"
+        #fetching every course page is only worth it when the course is known or the list is short
+        scope = courses if len(courses) <= 12 else [c for c in courses if c.activities]
+        await asyncio.gather(*(index.refresh_course(c, fetch) for c in scope), return_exceptions=True)
+        matches = index.find_activities(query, scope, module)
+        if not matches:
+            for c in scope[:3]:
+                await index.refresh_course(c, fetch, force=True)
+            matches = index.find_activities(query, scope, module)
+        if not matches:
+            return f"No {'assignment' if module else 'activity'} matches '{query}'. {NOT_FOUND_HINT}"
+        return json.dumps(
+            [
+                {
+                    "activity": a.name,
+                    "module": a.module,
+                    "course": c.name,
+                    "id": a.id,
+                    "score": score,
+                    "url": index.url(ACTIVITY_PAGES[page].format(module=a.module, id=a.id)),
+                }
+                for score, a, c in matches
+            ],
+            ensure_ascii=False,
+        )
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional
+
+from langchain_core.tools import BaseTool
+
+from agent.config import Settings
+from agent.metrics import METRICS
+from agent.runtime import current_runtime, invalidate_observations, require_page
+from agent.site_index import site_index_for
+from agent.skills import SKILLS, Skill, SkillContext
+
+
+class SkillTool(BaseTool):
+    """One scripted Moodle flow from agent.skills, run as a single tool call."""
+
+    skill: Any
+    cfg: Any
+    index: Optional[Any] = None
+    client: Optional[Any] = None
+
+    async def _arun(self, **kwargs: Any) -> str:
+        skill: Skill = self.skill
+        page = require_page()
+        ctx = SkillContext(page=page, cfg=self.cfg, context=current_runtime().context, index=self.index, client=self.client)
+        try:
+            async with METRICS.span("skill", skill.name):
+                await skill.run(ctx, **kwargs)
+        except Exception as e:
+            return (
+                f"Skill failed at step '{ctx.step}': {e}. Current page: {getattr(page, 'url', '')}. "
+                f"Continue with observe/act instead: {skill.fallback}"
+            )
+        finally:
+            invalidate_observations(page.url)
+        return json.dumps({"ok": True, "url": page.url, **ctx.result}, ensure_ascii=False)
+
+    def _run(self, *args, **kwargs) -> str:
+        raise NotImplementedError("This tool is async-only.")
+
+
+def build_skill_tools(cfg: Settings, client: Optional[Any] = None) -> List[BaseTool]:
+    index = site_index_for(cfg) if cfg.site_index_enabled else None
+    return [
+        SkillTool(
+            name=s.name,
+            description=s.description,
+            args_schema=s.args_schema,
+            skill=s,
+            cfg=cfg,
+            index=index,
+            client=client,
+        )
+        for s in SKILLS.values()
+    ]
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
-from typing import Type
+import asyncio
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Type
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel
 
-from agent.runtime import require_page
+from agent.csv_import import ImportReport, chunk_dir, fetch_roster, prepare_import
+from agent.runtime import current_runtime, require_page, invalidate_observations
 from agent.schemas.upload import UploadFileInput, UploadCSVInput
 
+COURSE_ID = re.compile(r"/grade/import/.*[?&]id=(\d+)")
+
+
+@dataclass
+class _CSVImport:
+    report: ImportReport
+    uploaded: int = 0
+    #force=true was given once; later calls for the next chunks need not repeat it
+    forced: bool = False
+
+    @property
+    def done(self) -> bool:
+        return self.uploaded >= len(self.report.chunks)
+
 
 class UploadFileTool(BaseTool):
     name: str = "upload_file"
@@ -17,6 +37,7 @@ class UploadFileTool(BaseTool):
         page = require_page()
         try:
             await page.set_input_files(selector, file_path)
+            invalidate_observations(page.url)
             return f"Uploaded '{file_path}' to '{selector}'."
         except Exception as e:
             return f"Upload failed: {e}"
@@ -28,18 +49,79 @@ class UploadFileTool(BaseTool):
 class UploadCSVTool(BaseTool):
     name: str = "upload_csv"
     description: str = (
-        "Uploads a CSV file for grade import/bulk grading. "
+        "Uploads a CSV file for grade import/bulk grading. The file is checked first (encoding, delimiter, "
+        "student identifiers against the course roster, grade columns, number format) and a normalized UTF-8 "
+        "comma-separated copy is uploaded; large files are split into chunks, one chunk per call. "
         "Use observe() first to identify the correct <input type='file'> selector."
     )
     args_schema: Type[BaseModel] = UploadCSVInput
+    client: Optional[Any] = None
+    gradebook: Optional[Any] = None
+    work_dir: str = ".lms_state/csv_import"
+    chunk_rows: int = 1000
+    chunk_bytes: int = 2 * 1024 * 1024
 
-    async def _arun(self, file_path: str, selector: str) -> str:
+    async def _prepare(self, source: Path, page_url: str) -> ImportReport:
+        roster = None
+        note = ""
+        match = COURSE_ID.search(page_url or "")
+        if self.client is not None and match:
+            try:
+                roster = await fetch_roster(self.client, int(match.group(1)))
+            except Exception as e:
+                note = f"Course roster unavailable: {e}."
+        report = await asyncio.to_thread(
+            prepare_import, source, chunk_dir(Path(self.work_dir), source), roster, self.chunk_rows, self.chunk_bytes
+        )
+        if note:
+            report.notes.append(note)
+        return report
+
+    async def _arun(self, file_path: str, selector: str, force: bool = False, restart: bool = False) -> str:
         page = require_page()
+        imports = current_runtime().csv_imports
+        key = str(Path(file_path).resolve())
         try:
-            await page.set_input_files(selector, file_path)
-            return f"CSV '{file_path}' uploaded into '{selector}'."
+            job = imports.get(key)
+            if job is None or job.done or restart:
+                job = _CSVImport(await self._prepare(Path(file_path), page.url))
+                imports[key] = job
+            job.forced = job.forced or force
+            report = job.report
+            if report.errors and not (job.forced and report.chunks):
+                imports.pop(key, None)
+                return json.dumps(
+                    {"status": "rejected", "report": report.summary(), "hint": "Fix the file, or pass force=true to upload it anyway."},
+                    ensure_ascii=False,
+                )
+
+            chunk = report.chunks[job.uploaded]
+            await page.set_input_files(selector, chunk)
+            job.uploaded += 1
+            invalidate_observations(page.url)
+            if self.gradebook is not None:
+                match = COURSE_ID.search(page.url or "")
+                self.gradebook.invalidate(int(match.group(1)) if match else None)
         except Exception as e:
             return f"CSV upload failed: {e}"
 
+        result = {
+            "status": "uploaded",
+            "chunk": job.uploaded,
+            "chunks": len(report.chunks),
+            "file": chunk,
+            "import_form": "Encoding UTF-8, separator comma; map the user by " + report.identifier + ".",
+        }
+        if job.uploaded == 1:
+            result["report"] = report.summary()
+        if job.done:
+            result["next"] = "This is the last chunk."
+        else:
+            result["next"] = (
+                "Finish importing this chunk, open the CSV import page again and call upload_csv with the same "
+                f"file_path to upload chunk {job.uploaded + 1}."
+            )
+        return json.dumps(result, ensure_ascii=False)
+
     def _run(self, *args, **kwargs) -> str:
         raise NotImplementedError("This tool is async-only.")
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+from langchain_core.agents import AgentAction
+
+from agent.cache import normalize_url
+from agent.metrics import METRICS, tool_failed
+
+#tools that only read the current page; concurrent calls may get their own tab at the same URL
+PAGE_READERS = {"extract", "observe"}
+#page-changing tools that leave the page as a plain GET of its URL shows it
+PAGE_LOADERS = {"navigate"}
+#tools that never touch the session's page (web services, local data, their own tabs)
+PAGE_FREE = {
+    "read_result",
+    "lookup_url",
+    "query_grades",
+    "extract_many",
+    "moodle_courses",
+    "moodle_grades",
+    "moodle_upcoming_events",
+    "moodle_assignments",
+}
+
+#like page_fingerprint(), plus form field state so typing into a form counts as a change
+STATE_JS = """
+() => {
+    const body = document.body;
+    if (!body) return "";
+    const fields = Array.from(document.querySelectorAll("input,select,textarea"))
+        .map((e) => (e.type === "checkbox" || e.type === "radio" ? String(e.checked) : e.value))
+        .join("\\u0001");
+    const text = (body.innerText || "") + fields;
+    let hash = 0;
+    for (let i = 0; i < text.length; i += 1) {
+        hash = (hash * 31 + text.charCodeAt(i)) | 0;
+    }
+    return [document.title, body.getElementsByTagName("*").length, text.length, hash].join("|");
+}
+"""
+
+#same tool and arguments this many times in a row, or this many + 1 times within WINDOW steps
+REPEATS = 3
+WINDOW = 10
+#page-changing calls in a row that left the page exactly as it was
+STALLS = 3
+#A B A B A: two round trips between the same two pages
+OSCILLATION = 5
+PARTIAL_RESULTS = 3
+PARTIAL_CHARS = 400
+HINT_MARK = "\n\n[Watchdog] "
+
+HINTS = {
+    "repeat": "You have made the same call ({call}) {count} times with the same result. It will not "
+    "change; try a different element, page or tool, or answer with what you have.",
+    "stall": "The last {count} actions did not change the page. The element may be disabled, hidden "
+    "or already in the requested state; observe the page again, try another approach, or answer.",
+    "oscillation": "You are going back and forth between {pages} without progress. Decide what you "
+    "need from each page, or answer with what you have.",
+    "budget": "the time budget for this request ({budget:.0f}s) is used up",
+}
+
+
+def tool_access(name: str) -> str:
+    """'none', 'read' or 'write'; unknown tools are treated as mutating."""
+    if name in PAGE_FREE:
+        return "none"
+    if name in PAGE_READERS:
+        return "read"
+    return "write"
+
+
+def _output(observation: Any) -> str:
+    """Tool output without a hint the watchdog appended to it."""
+    return str(observation).split(HINT_MARK)[0]
+
+
+def _call_key(action: AgentAction) -> str:
+    return f"{action.tool}({json.dumps(action.tool_input, sort_keys=True, ensure_ascii=False, default=str)})"
+
+
+@dataclass
+class Verdict:
+    reason: str
+    message: str
+    stop: bool
+
+
+@dataclass
+class Watchdog:
+    """
+    Per-request guard over the agent's intermediate steps. It spots repeated identical calls,
+    actions that leave the page unchanged and back-and-forth navigation. The first time a pattern
+    shows up the model gets a corrective hint appended to the last tool result; if the same
+    pattern comes back, or the wall-clock budget is spent, the run stops with a partial answer.
+    """
+
+    budget: Optional[float] = None
+    started: float = field(default_factory=time.monotonic)
+    #(normalized url, page state) after every page-changing call
+    pages: List[Tuple[str, str]] = field(default_factory=list)
+    hinted: set = field(default_factory=set)
+    checked: int = 0
+    checked_pages: int = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.elapsed() >= self.budget
+
+    async def record_page(self, page: Any) -> None:
+        try:
+            state = str(await page.evaluate(STATE_JS))
+        except Exception:
+            state = ""
+        self.pages.append((normalize_url(getattr(page, "url", "")), state))
+
+    def _repeat(self, steps: Sequence[Tuple[AgentAction, str]]) -> Optional[str]:
+        action = steps[-1][0]
+        #repeated page-changing calls are judged by their effect on the page (see _stall), e.g. paging
+        if tool_access(action.tool) == "write":
+            return None
+        last = _call_key(action)
+        outputs = [_output(o) for a, o in steps[-WINDOW:] if _call_key(a) == last]
+        run = 0
+        for a, _ in reversed(steps):
+            if _call_key(a) != last:
+                break
+            run += 1
+        #a call whose result changes (e.g. an extract after paging) is not a loop
+        if len(set(outputs)) == 1 and (run >= REPEATS or len(outputs) > REPEATS):
+            return HINTS["repeat"].format(call=last[:120], count=len(outputs))
+        return None
+
+    def _stall(self) -> Optional[str]:
+        recent = self.pages[-(STALLS + 1) :]
+        if len(recent) == STALLS + 1 and recent[-1][1] and len(set(recent)) == 1:
+            return HINTS["stall"].format(count=STALLS)
+        return None
+
+    def _oscillation(self) -> Optional[str]:
+        urls: List[str] = []
+        for url, _ in self.pages:
+            if not urls or urls[-1] != url:
+                urls.append(url)
+        recent = urls[-OSCILLATION:]
+        if len(recent) == OSCILLATION and len(set(recent)) == 2:
+            return HINTS["oscillation"].format(pages=" and ".join(sorted(set(recent))))
+        return None
+
+    def check(self, steps: Sequence[Tuple[AgentAction, str]]) -> Optional[Verdict]:
+        """Verdict on the steps so far, or None; only steps added since the last check can trigger one."""
+        if self.over_budget():
+            return self._verdict("budget", HINTS["budget"].format(budget=self.budget), stop=True)
+        if not steps or len(steps) == self.checked:
+            return None
+        self.checked = len(steps)
+        #page patterns are judged once, when the page-changing call that completes them has run
+        moved = len(self.pages) > self.checked_pages
+        self.checked_pages = len(self.pages)
+        for reason, message in (
+            ("repeat", self._repeat(steps)),
+            ("stall", self._stall() if moved else None),
+            ("oscillation", self._oscillation() if moved else None),
+        ):
+            if message:
+                return self._verdict(reason, message, stop=reason in self.hinted)
+        return None
+
+    def _verdict(self, reason: str, message: str, stop: bool) -> Verdict:
+        self.hinted.add(reason)
+        METRICS.record("watchdog", reason, self.elapsed(), ok=False, stopped=stop)
+        return Verdict(reason, message, stop)
+
+    @staticmethod
+    def hint(message: str) -> str:
+        return f"{HINT_MARK}{message}"
+
+    @staticmethod
+    def partial_answer(verdict: Verdict, steps: Sequence[Tuple[AgentAction, str]]) -> str:
+        """Answer from what the run collected: the last few successful read results."""
+        reason = verdict.message if verdict.reason == "budget" else f"I was not making progress ({verdict.reason})"
+        #dict keeps the last occurrence order of each distinct result
+        found = list(
+            {
+                (a.tool, _output(o)): None
+                for a, o in steps
+                if tool_access(a.tool) != "write" and not tool_failed(o) and not str(o).startswith("Skipped")
+            }
+        )[-PARTIAL_RESULTS:]
+        if not found:
+            return f"I stopped before finishing: {reason}. No results were collected yet; please rephrase or narrow the request."
+        lines = [f"I stopped before finishing: {reason}. This is what I found so far:"]
+        for tool, output in found:
+            lines.append(f"- {tool}: {output[:PARTIAL_CHARS]}{'…' if len(output) > PARTIAL_CHARS else ''}")
+        return "\n".join(lines)
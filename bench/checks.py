@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import re
+import sys
+import tempfile
+from typing import Callable, Dict, List
+
+from agent.agent_factory import build_prompt_selector, build_tools
+from agent.config import Settings
+from agent.runtime import Runtime, use_runtime
+from agent.tools.fanout import FanOutExtractTool
+
+#a message that activates every intent section of the prompt
+ALL_INTENTS = "Upload the CSV to import grades, then grade all students and leave feedback for Ivan."
+FEATURE_FLAGS = ("site_index_enabled", "skills_enabled", "gradebook_enabled", "moodle_ws_enabled")
+
+
+def _settings(tmp: str, **flags: bool) -> Settings:
+    return Settings(
+        lms_base_url="https://lms.example",
+        lms_username="student",
+        lms_password="bench",
+        user_role="teacher",
+        storage_state_dir=tmp,
+        moodle_ws_url="https://lms.example/webservice/rest/server.php",
+        moodle_ws_token="",
+        **flags,
+    )
+
+
+def check_prompt_tools() -> None:
+    """The rendered prompt never names a tool the same settings do not register."""
+    with tempfile.TemporaryDirectory() as tmp:
+        every = {t.name for t in build_tools(_settings(tmp, **{f: True for f in FEATURE_FLAGS}))}
+        for values in itertools.product((False, True), repeat=len(FEATURE_FLAGS)):
+            cfg = _settings(tmp, **dict(zip(FEATURE_FLAGS, values)))
+            registered = {t.name for t in build_tools(cfg)}
+            prompt = build_prompt_selector(cfg).select(ALL_INTENTS)
+            stray = sorted(n for n in every - registered if re.search(rf"\b{re.escape(n)}\b", prompt))
+            assert not stray, f"prompt mentions unregistered tools {stray} with {dict(zip(FEATURE_FLAGS, values))}"
+
+
+class _TabCounter:
+    """Browser context stand-in that records how many tabs are open at once."""
+
+    def __init__(self) -> None:
+        self.open = 0
+        self.peak = 0
+
+    async def new_page(self) -> "_TabCounter._Tab":
+        self.open += 1
+        self.peak = max(self.peak, self.open)
+        return self._Tab(self)
+
+    class _Tab:
+        def __init__(self, counter: "_TabCounter") -> None:
+            self.counter = counter
+
+        async def goto(self, url: str) -> None:
+            await asyncio.sleep(0.01)
+
+        async def extract(self, instruction: str) -> dict:
+            await asyncio.sleep(0.01)
+            return {"grade": 90}
+
+        async def close(self) -> None:
+            self.counter.open -= 1
+
+
+def check_fanout_limit() -> None:
+    """extract_many never opens more tabs than FANOUT_CONCURRENCY, whatever concurrency the model asks for."""
+    tool = FanOutExtractTool(base_url="https://lms.example", default_concurrency=3)
+    for asked, expected in ((None, 3), (1, 1), (50, 3)):
+        context = _TabCounter()
+        with use_runtime(Runtime(context=context)):
+            asyncio.run(tool._arun([str(i) for i in range(12)], "grades", concurrency=asked))
+        assert context.peak == expected, f"concurrency={asked}: {context.peak} tabs open at once, expected {expected}"
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    "prompt_tools": check_prompt_tools,
+    "fanout_limit": check_fanout_limit,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline consistency checks of the agent's wiring.")
+    parser.add_argument("--check", action="append", choices=sorted(CHECKS), help="Check to run (repeatable); all by default")
+    args = parser.parse_args()
+
+    failed: List[str] = []
+    for name in args.check or list(CHECKS):
+        try:
+            CHECKS[name]()
+            print(f"{name:<20} ok")
+        except AssertionError as e:
+            failed.append(name)
+            print(f"{name:<20} FAIL  {e}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
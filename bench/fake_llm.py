@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agent.history import count_tokens
+
+RESULT_ID = re.compile(r'result_id"?[:=]\s*"?(\w+)')
+URL = re.compile(r'https?://[^\s"\']+')
+
+
+@dataclass
+class Step:
+    """
+    One model turn: either tool calls or the final answer. '{last}' in text is replaced by the last tool
+    output, '{result_id}' in tool arguments by the result_id a truncated tool output pointed to and '{url}'
+    by the first URL in the last tool output.
+    """
+
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    text: str = ""
+
+
+def call(name: str, **args: Any) -> Dict[str, Any]:
+    return {"name": name, "args": args}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic chat model that plays back a scenario script. The step is chosen from the number of
+    AI turns after the last human message, so the same script works for every run of a scenario.
+    Latency is modelled as a fixed cost plus a cost per 1k prompt tokens, so prompt size shows in wall time.
+    """
+
+    script: List[Step] = []
+    base_latency: float = 0.4
+    latency_per_1k: float = 0.05
+    tool_schema_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        schemas = [convert_to_openai_tool(t) for t in tools]
+        tokens = count_tokens([SystemMessage(json.dumps(schemas, ensure_ascii=False))])
+        return self.model_copy(update={"tool_schema_tokens": tokens})
+
+    def _next(self, messages: List[BaseMessage]) -> AIMessage:
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        turn = messages[last_human + 1 :]
+        index = sum(isinstance(m, AIMessage) for m in turn)
+        step = self.script[index] if index < len(self.script) else Step(text="Done.")
+
+        last = next((str(m.content) for m in reversed(turn) if isinstance(m, ToolMessage)), "")
+        pointer = RESULT_ID.search(last)
+        url = URL.search(last)
+        prompt_tokens = count_tokens(messages) + self.tool_schema_tokens
+        tool_calls = [
+            {
+                "name": c["name"],
+                "args": json.loads(
+                    json.dumps(c["args"])
+                    .replace("{result_id}", pointer.group(1) if pointer else "")
+                    .replace("{url}", url.group(0) if url else "")
+                ),
+                "id": f"call_{index}_{n}",
+                "type": "tool_call",
+            }
+            for n, c in enumerate(step.tool_calls)
+        ]
+        message = AIMessage(content=step.text.replace("{last}", last[:400]), tool_calls=tool_calls)
+        completion_tokens = count_tokens([message]) + sum(len(json.dumps(c["args"])) // 4 for c in tool_calls)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return message
+
+    def _delay(self, message: AIMessage) -> float:
+        return self.base_latency + self.latency_per_1k * message.usage_metadata["input_tokens"] / 1000
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._next(messages)
+        await asyncio.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
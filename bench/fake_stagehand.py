@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urljoin
+
+import httpx
+from stagehand import ActResult, ObserveResult
+
+INTERACTIVE = {"a", "button", "input", "textarea", "select", "li"}
+WORD = re.compile(r"[\w']+", re.U)
+STOPWORDS = {"the", "a", "an", "on", "in", "for", "to", "of", "and", "click", "press", "open", "find", "button", "link", "field", "page"}
+
+
+@dataclass
+class Element:
+    index: int
+    tag: str
+    attrs: Dict[str, str]
+    text: str = ""
+
+    @property
+    def selector(self) -> str:
+        return f"xpath=(//*[@data-bench])[{self.index}]"
+
+    @property
+    def label(self) -> str:
+        a = self.attrs
+        return " ".join(filter(None, [a.get("aria-label"), self.text, a.get("placeholder"), a.get("name"), a.get("type")]))
+
+    @property
+    def method(self) -> str:
+        if self.tag in ("input", "textarea") and self.attrs.get("type") not in ("file", "submit", "button"):
+            return "fill"
+        if self.tag == "select":
+            return "selectOptionFromDropdown"
+        return "click"
+
+
+class _PageParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.title = ""
+        self.elements: List[Element] = []
+        #every element in document order; only interactive ones get an index and text
+        self.all: List[Element] = []
+        self.tables: List[List[List[str]]] = []
+        self._open: List[Element] = []
+        self._in_title = False
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        values = {k: v or "" for k, v in attrs}
+        if tag == "title":
+            self._in_title = True
+        elif tag == "table":
+            self.tables.append([])
+        elif tag == "tr":
+            self._row = []
+        elif tag in ("td", "th"):
+            self._cell = []
+        if tag in INTERACTIVE:
+            element = Element(len(self.elements) + 1, tag, values)
+            self.elements.append(element)
+            if tag not in ("input",):
+                self._open.append(element)
+        else:
+            element = Element(0, tag, values)
+        self.all.append(element)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._in_title = False
+        elif tag in ("td", "th") and self._cell is not None and self._row is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None and self.tables:
+            self.tables[-1].append(self._row)
+            self._row = None
+        if self._open and self._open[-1].tag == tag:
+            self._open.pop()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        if self._cell is not None:
+            self._cell.append(data)
+        for element in self._open:
+            element.text = " ".join((element.text + " " + data).split())
+
+
+@dataclass
+class BenchStats:
+    """Counts of the calls that cost a model round trip in real Stagehand."""
+
+    calls: Counter = field(default_factory=Counter)
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+
+@dataclass
+class Latency:
+    navigate: float = 0.05
+    observe: float = 0.6
+    act: float = 0.8
+    extract: float = 1.2
+
+    def scaled(self, factor: float) -> "Latency":
+        return Latency(self.navigate * factor, self.observe * factor, self.act * factor, self.extract * factor)
+
+
+class FakeLocator:
+    def __init__(self, page: "FakePage", selector: str, has_text: Optional[Any] = None) -> None:
+        self.page = page
+        self.selector = selector
+        self.has_text = has_text
+
+    @property
+    def first(self) -> "FakeLocator":
+        return self
+
+    def filter(self, has_text: Any = None) -> "FakeLocator":
+        return FakeLocator(self.page, self.selector, has_text)
+
+    def _element(self) -> Element:
+        element = self.page.find(self.selector, self.has_text)
+        if element is None:
+            raise RuntimeError(f"No element matches {self.selector}")
+        return element
+
+    async def wait_for(self, state: str = "visible", timeout: float = 0) -> None:
+        #the mock DOM never changes without a navigation, so nothing ever becomes hidden
+        if state != "hidden":
+            self._element()
+
+    async def click(self, timeout: float = 0) -> None:
+        await self.page.click(self._element())
+
+    async def inner_text(self, timeout: float = 0) -> str:
+        return self._element().text
+
+    async def evaluate(self, script: str, arg: Any = None) -> Any:
+        if "click" in script:
+            await self.page.click(self._element())
+
+    async def fill(self, value: str, force: bool = False, timeout: float = 0) -> None:
+        self.page.values[self._element().index] = value
+
+    async def select_option(self, value: str, timeout: float = 0) -> None:
+        self.page.values[self._element().index] = value
+
+    async def set_input_files(self, files: Union[str, List[str]], timeout: float = 0) -> None:
+        await self.page.set_input_files(self.selector, files)
+
+
+class FakeKeyboard:
+    async def press(self, key: str) -> None:
+        pass
+
+
+class FakePage:
+    """
+    Stagehand page stand-in for benchmarks. Navigation is real HTTP against the mock site;
+    observe/act/extract are answered from the parsed HTML after a fixed delay that stands in for
+    Stagehand's model call, and every such call is counted in BenchStats.
+    """
+
+    def __init__(self, context: "FakeContext") -> None:
+        self.context = context
+        self.url = "about:blank"
+        self.keyboard = FakeKeyboard()
+        self.values: Dict[int, str] = {}
+        self.uploads: List[str] = []
+        #in-page clicks so far; on a real page they open dialogs, menus etc.
+        self.clicks = 0
+        self._parsed = _PageParser()
+        self._html = ""
+
+    @property
+    def stats(self) -> BenchStats:
+        return self.context.stats
+
+    @property
+    def latency(self) -> Latency:
+        return self.context.latency
+
+    async def goto(self, url: str, **kwargs: Any) -> None:
+        self.stats.calls["goto"] += 1
+        await asyncio.sleep(self.latency.navigate)
+        resp = await self.context.http.get(urljoin(self.context.base_url + "/", url))
+        self.url = str(resp.url)
+        self._html = resp.text
+        self._parsed = _PageParser()
+        self._parsed.feed(self._html)
+        self.values = {}
+        self.clicks = 0
+
+    async def wait_for_load_state(self, state: str = "load", timeout: float = 0) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def evaluate(self, script: str, arg: Any = None) -> Any:
+        #used by page_fingerprint() and the watchdog: a stable digest of the current DOM and its state
+        state = f"{self._html}|{self.clicks}|{sorted(self.values.items())}|{self.uploads}"
+        return hashlib.sha1(state.encode("utf-8")).hexdigest()
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self, selector)
+
+    def find(self, selector: str, has_text: Optional[Any] = None) -> Optional[Element]:
+        match = re.search(r"\[(\d+)\]$", selector)
+        if match:
+            index = int(match.group(1))
+            return next((e for e in self._parsed.elements if e.index == index), None)
+        name = re.search(r"name=['\"]?([^'\"\]]+)", selector)
+        if name:
+            return next((e for e in self._parsed.elements if e.attrs.get("name") == name.group(1)), None)
+        #bare tag or class selectors, as scripted flows use them
+        tag, _, css_class = selector.partition(".")
+        candidates = [
+            e
+            for e in self._parsed.all
+            if (not tag or e.tag == tag) and (not css_class or css_class in e.attrs.get("class", "").split())
+        ]
+        if has_text is not None:
+            candidates = [e for e in candidates if re.search(has_text, e.text)]
+        return candidates[0] if candidates else None
+
+    async def click(self, element: Element) -> None:
+        href = element.attrs.get("href", "")
+        if element.tag == "a" and href and not href.startswith("#"):
+            await self.goto(href)
+        else:
+            self.clicks += 1
+
+    async def set_input_files(self, selector: str, files: Union[str, List[str]], **kwargs: Any) -> None:
+        element = self.find(selector)
+        if element is None or element.attrs.get("type") != "file":
+            raise RuntimeError(f"{selector} is not an <input type='file'>")
+        for path in [files] if isinstance(files, str) else files:
+            if not Path(path).exists():
+                raise FileNotFoundError(path)
+            self.uploads.append(path)
+
+    def _rank(self, goal: str) -> List[Element]:
+        words = {w for w in WORD.findall(goal.lower()) if w not in STOPWORDS}
+        scored = []
+        for element in self._parsed.elements:
+            label = set(WORD.findall(element.label.lower()))
+            score = len(words & label)
+            if score:
+                scored.append((score, -element.index, element))
+        return [e for _, _, e in sorted(scored, key=lambda s: (s[0], s[1]), reverse=True)]
+
+    def _observe_result(self, element: Element, goal: str) -> ObserveResult:
+        quoted = re.findall(r"['\"]([^'\"]+)['\"]", goal)
+        arguments = [quoted[-1]] if element.method == "fill" and quoted else []
+        return ObserveResult(
+            selector=element.selector,
+            description=f"{element.tag} '{element.label}'",
+            method=element.method,
+            arguments=arguments,
+        )
+
+    async def observe(self, goal: str = "", **kwargs: Any) -> List[ObserveResult]:
+        self.stats.calls["observe"] += 1
+        await asyncio.sleep(self.latency.observe)
+        return [self._observe_result(e, goal) for e in self._rank(goal)[:5]]
+
+    async def act(self, action: Union[str, ObserveResult], **kwargs: Any) -> ActResult:
+        if isinstance(action, ObserveResult):
+            element = self.find(action.selector)
+        else:
+            self.stats.calls["act"] += 1
+            await asyncio.sleep(self.latency.act)
+            ranked = self._rank(action)
+            element = ranked[0] if ranked else None
+        if element is None:
+            return ActResult(success=False, message="No matching element", action=str(action))
+        if element.method == "click":
+            await self.click(element)
+        return ActResult(success=True, message=f"Performed {element.method} on {element.label}", action=element.label)
+
+    async def extract(self, instruction: str = "", **kwargs: Any) -> Dict[str, Any]:
+        self.stats.calls["extract"] += 1
+        await asyncio.sleep(self.latency.extract)
+        tables = []
+        for table in self._parsed.tables:
+            if len(table) > 1:
+                header, *rows = table
+                tables.append([dict(zip(header, row)) for row in rows])
+        data: Dict[str, Any] = {"title": " ".join(self._parsed.title.split())}
+        if tables:
+            data["tables"] = tables if len(tables) > 1 else tables[0]
+        else:
+            data["links"] = [e.text for e in self._parsed.elements if e.tag == "a" and e.text]
+        return {"extraction": data}
+
+
+class FakeResponse:
+    def __init__(self, resp: httpx.Response) -> None:
+        self._resp = resp
+        self.status = resp.status_code
+        self.ok = resp.is_success
+        self.url = str(resp.url)
+
+    async def text(self) -> str:
+        return self._resp.text
+
+
+class FakeRequest:
+    """Stand-in for BrowserContext.request: plain HTTP with the context's cookies, no page render."""
+
+    def __init__(self, context: "FakeContext") -> None:
+        self.context = context
+
+    async def get(self, url: str, **kwargs: Any) -> FakeResponse:
+        self.context.stats.calls["request"] += 1
+        return FakeResponse(await self.context.http.get(urljoin(self.context.base_url + "/", url)))
+
+
+class FakeContext:
+    """Browser context stand-in: shares one cookie jar and the counters between its pages."""
+
+    def __init__(self, base_url: str, latency: Optional[Latency] = None, stats: Optional[BenchStats] = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.latency = latency or Latency()
+        self.stats = stats or BenchStats()
+        self.http = httpx.AsyncClient(follow_redirects=True, timeout=10.0)
+        self.request = FakeRequest(self)
+
+    async def login(self, username: str, password: str) -> None:
+        await self.http.post(f"{self.base_url}/login/index.php", data={"username": username, "password": password})
+
+    async def new_page(self) -> FakePage:
+        return FakePage(self)
+
+    async def close(self) -> None:
+        await self.http.aclose()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+#entry points users wait on; budgets are seconds of wall time for a cold `import`, checked with --check
+MODULES: Dict[str, float] = {
+    "agent.config": 0.5,
+    "agent.llm": 1.5,
+    "agent.pool": 2.5,
+    "agent.chat": 2.5,
+    "ui.session": 2.5,
+}
+#must stay out of the entry points above; they are imported on first use
+LAZY = ("stagehand", "langchain_openai", "langchain_google_genai", "langchain.agents", "pandas")
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+@dataclass
+class ImportResult:
+    module: str
+    seconds: float
+    heaviest: List[Tuple[str, float]] = field(default_factory=list)
+    eager: List[str] = field(default_factory=list)
+
+
+def measure(module: str, runs: int = 3, top: int = 5) -> ImportResult:
+    """Median wall time of `import module` in fresh interpreters, plus the packages that cost the most."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-bench"}
+    times = []
+    stderr = ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        times.append(time.perf_counter() - started)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        stderr = proc.stderr
+
+    #self time summed per top-level package, so a heavy dependency shows up however it was pulled in
+    heaviest: Dict[str, float] = {}
+    loaded = set()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(3)
+        loaded.add(name)
+        package = name.split(".")[0]
+        heaviest[package] = heaviest.get(package, 0.0) + int(match.group(1)) / 1e6
+    return ImportResult(
+        module=module,
+        seconds=round(statistics.median(times), 3),
+        heaviest=sorted(heaviest.items(), key=lambda kv: kv[1], reverse=True)[:top],
+        eager=[m for m in LAZY if m in loaded],
+    )
+
+
+def format_report(results: List[ImportResult], baseline: Optional[List[Dict]] = None) -> str:
+    before = {b["module"]: b["seconds"] for b in baseline or []}
+    lines = [f"{'module':<18} {'wall s':>7} {'budget':>7} {'vs base':>8}  heaviest imports"]
+    lines.append("-" * 100)
+    for r in results:
+        was = before.get(r.module)
+        delta = f"{(r.seconds - was) / was * 100:+.0f}%" if was else ""
+        heavy = ", ".join(f"{name} {sec:.2f}" for name, sec in r.heaviest)
+        lines.append(f"{r.module:<18} {r.seconds:>7.2f} {MODULES.get(r.module, 0):>7.1f} {delta:>8}  {heavy}")
+        if r.eager:
+            lines.append(f"{'':<18} eagerly imports: {', '.join(r.eager)}")
+    return "\n".join(lines)
+
+
+def regressions(results: List[ImportResult]) -> List[str]:
+    found = []
+    for r in results:
+        budget = MODULES.get(r.module)
+        if budget and r.seconds > budget:
+            found.append(f"{r.module} took {r.seconds:.2f}s (budget {budget:.1f}s)")
+        if r.eager:
+            found.append(f"{r.module} imports {', '.join(r.eager)} at load time")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold import times of the agent's entry points.")
+    parser.add_argument("--module", action="append", help="Module to measure (repeatable); the entry points by default")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module; the median is reported")
+    parser.add_argument("--json", type=Path, help="Write raw results to this file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON from an earlier --json run")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a module is over budget or imports a lazy provider")
+    args = parser.parse_args()
+
+    results = [measure(m, runs=args.runs) for m in args.module or list(MODULES)]
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    print(format_report(results, baseline))
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], indent=2), encoding="utf-8")
+    if args.check:
+        problems = regressions(results)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
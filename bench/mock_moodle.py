@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import html
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE = "MoodleSession"
+USER_ID = 42
+TOKEN = "bench-token"
+
+COURSES: List[Dict[str, Any]] = [
+    {"id": 101, "fullname": "Calculus", "shortname": "CALC", "teacher": "Olena Petrenko", "progress": 72},
+    {"id": 102, "fullname": "Linear Algebra", "shortname": "LA", "teacher": "Andrii Koval", "progress": 55},
+    {"id": 103, "fullname": "Programming Basics", "shortname": "PB", "teacher": "Iryna Melnyk", "progress": 90},
+    {"id": 104, "fullname": "Discrete Mathematics", "shortname": "DM", "teacher": "Taras Bondar", "progress": 40},
+]
+
+GRADE_ITEMS: Dict[int, List[Tuple[str, str, str]]] = {
+    101: [("Homework 1", "9.00", "0–10"), ("Homework 2", "8.50", "0–10"), ("Midterm", "27.00", "0–40"), ("Course total", "44.50", "0–60")],
+    102: [("Quiz 1", "4.00", "0–5"), ("Lab 1", "18.00", "0–20"), ("Course total", "22.00", "0–25")],
+    103: [("Lab 1", "10.00", "0–10"), ("Lab 2", "9.00", "0–10"), ("Project", "38.00", "0–40"), ("Course total", "57.00", "0–60")],
+    104: [("Quiz 1", "3.00", "0–5"), ("Course total", "3.00", "0–5")],
+}
+
+#assignment course-module id -> (course id, name, due in days)
+ASSIGNMENTS: Dict[int, Tuple[int, str, int]] = {
+    5001: (101, "Homework 3", 3),
+    5002: (102, "Lab 2", 6),
+    5003: (103, "Final project", 12),
+}
+
+STUDENTS = [f"{surname} {name}" for surname, name in [
+    ("Ivanov", "Ivan"), ("Shevchenko", "Maria"), ("Kovalenko", "Petro"), ("Bondarenko", "Oksana"),
+    ("Tkachenko", "Dmytro"), ("Kravchenko", "Sofiia"), ("Oliinyk", "Yurii"), ("Lysenko", "Anna"),
+]]
+
+#teacher-side gradebook: one row per student and course, big enough to exercise result compaction
+GRADER_ROWS: Dict[int, List[Dict[str, str]]] = {
+    course["id"]: [
+        {
+            "student": f"{student} {n}" if n else student,
+            "email": f"{student.split()[0].lower()}{n}@ucu.edu.ua",
+            **{item: f"{(len(student) * 7 + i * 3 + n) % 10}.00" for i, (item, _, _) in enumerate(GRADE_ITEMS[course["id"]][:-1])},
+        }
+        for n in range(12)
+        for student in STUDENTS
+    ]
+    for course in COURSES
+}
+
+
+def _layout(title: str, body: str) -> str:
+    return f"""<!DOCTYPE html>
+<html><head><title>{html.escape(title)}</title></head>
+<body>
+<nav class="navbar">
+  <a href="/my/">Home</a> <a href="/my/">Dashboard</a> <a href="/my/courses.php">My courses</a>
+  <a href="/course/index.php?archive=1">Course archive</a> <a href="/help.php">Help</a>
+  <div class="usermenu">
+    <a href="/user/profile.php" aria-label="User menu">Profile</a>
+    <a href="/grade/report/overview/index.php">Grades</a>
+    <a href="/calendar/view.php">Calendar</a>
+  </div>
+</nav>
+<main><h1>{html.escape(title)}</h1>
+{body}
+</main></body></html>"""
+
+
+def _table(headers: List[str], rows: List[List[Any]], css: str = "generaltable") -> str:
+    head = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in row) + "</tr>" for row in rows)
+    return f'<table class="{css}"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def _course(course_id: int) -> Optional[Dict[str, Any]]:
+    return next((c for c in COURSES if c["id"] == course_id), None)
+
+
+def page_login(query: Dict[str, str]) -> str:
+    return _layout(
+        "Log in",
+        '<form method="post" action="/login/index.php">'
+        '<input type="text" name="username" placeholder="Username">'
+        '<input type="password" name="password" placeholder="Password">'
+        '<button type="submit" id="loginbtn">Log in</button></form>',
+    )
+
+
+def page_dashboard(query: Dict[str, str]) -> str:
+    cards = "".join(f'<div class="card"><a href="/course/view.php?id={c["id"]}">{html.escape(c["fullname"])}</a></div>' for c in COURSES)
+    return _layout("Dashboard", f"<section><h2>Recently accessed courses</h2>{cards}</section>")
+
+
+def page_my_courses(query: Dict[str, str]) -> str:
+    cards = "".join(
+        f'<div class="card course-card"><h3>{html.escape(c["fullname"])}</h3>'
+        f'<p>{html.escape(c["teacher"])}</p><p>{c["progress"]}% complete</p>'
+        f'<a href="/course/view.php?id={c["id"]}" aria-label="View course {html.escape(c["fullname"])}">View course</a></div>'
+        for c in COURSES
+    )
+    return _layout("My courses", cards)
+
+
+def page_course(query: Dict[str, str]) -> str:
+    course = _course(int(query.get("id", 0)))
+    if course is None:
+        return _layout("Error", "<p>Course not found</p>")
+    cid = course["id"]
+    assignments = "".join(
+        f'<li><a href="/mod/assign/view.php?id={cmid}">{html.escape(name)}</a></li>'
+        for cmid, (course_id, name, _) in ASSIGNMENTS.items()
+        if course_id == cid
+    )
+    tabs = (
+        f'<a href="/user/index.php?id={cid}">Participants</a> '
+        f'<a href="/grade/report/user/index.php?id={cid}" aria-label="Course grades">Grades</a> '
+        f'<a href="/report/view.php?id={cid}">Reports</a>'
+    )
+    return _layout(course["fullname"], f'<div class="secondary-navigation">{tabs}</div><ul>{assignments}</ul>')
+
+
+def page_user_grades(query: Dict[str, str]) -> str:
+    course = _course(int(query.get("id", 0)))
+    if course is None:
+        return _layout("Error", "<p>Course not found</p>")
+    rows = [[name, grade, rng] for name, grade, rng in GRADE_ITEMS[course["id"]]]
+    return _layout(f'{course["fullname"]}: User report', _table(["Grade item", "Grade", "Range"], rows, "user-grade"))
+
+
+def page_overview(query: Dict[str, str]) -> str:
+    rows = [[c["fullname"], GRADE_ITEMS[c["id"]][-1][1]] for c in COURSES]
+    return _layout("Grades overview", _table(["Course name", "Grade"], rows, "overview-grade"))
+
+
+def page_grader_report(query: Dict[str, str]) -> str:
+    course = _course(int(query.get("id", 0)))
+    if course is None:
+        return _layout("Error", "<p>Course not found</p>")
+    rows = GRADER_ROWS[course["id"]]
+    headers = list(rows[0])
+    body = _table(headers, [[r[h] for h in headers] for r in rows], "gradereport-grader-table")
+    links = f'<a href="/grade/import/csv/index.php?id={course["id"]}">Import</a> <a href="/grade/export/txt/index.php?id={course["id"]}">Export</a>'
+    return _layout(f'{course["fullname"]}: Grader report', links + body)
+
+
+def page_assignment(query: Dict[str, str]) -> str:
+    cmid = int(query.get("id", 0))
+    if cmid not in ASSIGNMENTS:
+        return _layout("Error", "<p>Assignment not found</p>")
+    _, name, _ = ASSIGNMENTS[cmid]
+    if query.get("action") == "grader":
+        options = "".join(f'<li role="option">{html.escape(s)}</li>' for s in STUDENTS)
+        return _layout(
+            f"{name}: Grading",
+            '<input type="text" role="combobox" placeholder="Change user" aria-label="Change user">'
+            f'<ul role="listbox">{options}</ul>'
+            '<div data-region="user-info"></div>'
+            '<input type="text" name="grade" aria-label="Grade out of 100">'
+            '<textarea name="assignfeedbackcomments_editor[text]" aria-label="Feedback comments"></textarea>'
+            '<button type="button" name="savechanges">Save changes</button>',
+        )
+    return _layout(
+        name,
+        f'<a href="/mod/assign/view.php?id={cmid}&action=grader" class="btn">Grade</a> '
+        f'<a href="/mod/assign/view.php?id={cmid}&action=editsubmission" class="btn">Add submission</a>',
+    )
+
+
+def page_csv_import(query: Dict[str, str]) -> str:
+    return _layout(
+        "Import grades: CSV file",
+        '<button type="button" class="fp-btn-choose">Choose a file...</button>'
+        '<div class="filepicker moodle-dialogue" aria-label="File picker">'
+        '<a href="#" class="fp-repo">Upload a file</a>'
+        '<input type="file" name="repo_upload_file" aria-label="Attachment">'
+        '<button type="button" class="fp-upload-btn">Upload this file</button></div>'
+        '<button type="submit" name="submitbutton">Upload grades</button>',
+    )
+
+
+PAGES: Dict[str, Callable[[Dict[str, str]], str]] = {
+    "/login/index.php": page_login,
+    "/": page_dashboard,
+    "/my/": page_dashboard,
+    "/my/courses.php": page_my_courses,
+    "/course/view.php": page_course,
+    "/grade/report/user/index.php": page_user_grades,
+    "/grade/report/overview/index.php": page_overview,
+    "/grade/report/grader/index.php": page_grader_report,
+    "/mod/assign/view.php": page_assignment,
+    "/grade/import/csv/index.php": page_csv_import,
+}
+
+
+def ws_call(function: str, params: Dict[str, str]) -> Any:
+    now = int(time.time())
+    if function == "core_webservice_get_site_info":
+        return {"userid": USER_ID, "username": "student", "fullname": "Bench Student", "sitename": "Mock Moodle"}
+    if function == "core_enrol_get_users_courses":
+        return [{**c, "lastaccess": now - 3600} for c in COURSES]
+    if function == "gradereport_user_get_grade_items" and params.get("userid") == "0":
+        #the whole class, as a teacher sees it
+        course_id = int(params.get("courseid", 0))
+        ranges = {n: r for n, _, r in GRADE_ITEMS.get(course_id, [])}
+        return {
+            "usergrades": [
+                {
+                    "userid": index + 1,
+                    "userfullname": row["student"],
+                    "gradeitems": [
+                        {"itemname": item, "itemtype": "mod", "graderaw": row[item], "grademax": ranges[item].split("–")[1]}
+                        for item in ranges
+                        if item in row
+                    ],
+                }
+                for index, row in enumerate(GRADER_ROWS.get(course_id, []))
+            ]
+        }
+    if function == "gradereport_user_get_grade_items":
+        items = GRADE_ITEMS.get(int(params.get("courseid", 0)), [])
+        return {
+            "usergrades": [
+                {"gradeitems": [{"itemname": n, "gradeformatted": g, "rangeformatted": r, "percentageformatted": ""} for n, g, r in items]}
+            ]
+        }
+    if function == "core_calendar_get_action_events_by_timesort":
+        return {
+            "events": [
+                {
+                    "name": f"{name} is due",
+                    "course": {"fullname": _course(course_id)["fullname"]},
+                    "timesort": now + days * 86400,
+                    "action": {"name": "Add submission"},
+                    "url": f"/mod/assign/view.php?id={cmid}",
+                }
+                for cmid, (course_id, name, days) in ASSIGNMENTS.items()
+            ]
+        }
+    if function == "mod_assign_get_assignments":
+        wanted = {int(v) for k, v in params.items() if k.startswith("courseids[")}
+        return {
+            "courses": [
+                {
+                    "id": c["id"],
+                    "fullname": c["fullname"],
+                    "assignments": [
+                        {"id": cmid - 5000, "cmid": cmid, "name": name, "duedate": now + days * 86400}
+                        for cmid, (course_id, name, days) in ASSIGNMENTS.items()
+                        if course_id == c["id"]
+                    ],
+                }
+                for c in COURSES
+                if not wanted or c["id"] in wanted
+            ]
+        }
+    return {"exception": "webservice_exception", "errorcode": "invalidrecord", "message": f"Unknown function {function}"}
+
+
+class MoodleHandler(BaseHTTPRequestHandler):
+    """Just enough of Moodle for the agent's tools: pages behind a session cookie plus the REST endpoints."""
+
+    server_version = "MockMoodle/1.0"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8", headers: Optional[Dict[str, str]] = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _form(self) -> Dict[str, str]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[-1] for k, v in parse_qs(raw).items()}
+
+    def _logged_in(self) -> bool:
+        return f"{SESSION_COOKIE}=" in (self.headers.get("Cookie") or "")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        handler = PAGES.get(url.path)
+        if handler is None:
+            self._send(404, _layout("Not found", "<p>This page does not exist.</p>"))
+            return
+        if url.path != "/login/index.php" and not self._logged_in():
+            self._send(303, "", headers={"Location": "/login/index.php"})
+            return
+        self._send(200, handler(query))
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        form = self._form()
+        if url.path == "/login/index.php":
+            if form.get("username") and form.get("password"):
+                self._send(303, "", headers={"Location": "/my/", "Set-Cookie": f"{SESSION_COOKIE}=bench; Path=/"})
+            else:
+                self._send(200, page_login({}))
+            return
+        if url.path == "/login/token.php":
+            ok = form.get("username") and form.get("password")
+            payload = {"token": TOKEN} if ok else {"error": "Invalid login", "errorcode": "invalidlogin"}
+            self._send(200, json.dumps(payload), "application/json")
+            return
+        if url.path == "/webservice/rest/server.php":
+            if form.get("wstoken") != TOKEN:
+                payload: Any = {"exception": "moodle_exception", "errorcode": "invalidtoken", "message": "Invalid token"}
+            else:
+                payload = ws_call(form.get("wsfunction", ""), form)
+            self._send(200, json.dumps(payload, ensure_ascii=False), "application/json")
+            return
+        self._send(404, "")
+
+
+class MockMoodle:
+    """Runs the mock site on a background thread; use as a context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.server = ThreadingHTTPServer((host, port), MoodleHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "MockMoodle":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    with MockMoodle(port=8765) as site:
+        print(f"Mock Moodle on {site.base_url} (Ctrl+C to stop)")
+        try:
+            site.thread.join()
+        except KeyboardInterrupt:
+            pass
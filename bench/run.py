@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from agent.agent_factory import build_agent
+from agent.config import Settings
+from agent.metrics import METRICS
+from agent.runtime import Runtime, use_runtime
+from bench.fake_llm import ScriptedChatModel
+from bench.fake_stagehand import FakeContext, Latency
+from bench.mock_moodle import MockMoodle
+from bench.scenarios import SCENARIOS
+
+MODEL_OPS = ("observe", "act", "extract")
+
+
+@dataclass
+class RunResult:
+    scenario: str
+    run: int
+    seconds: float
+    iterations: int
+    tool_calls: Dict[str, int]
+    stagehand_calls: Dict[str, int]
+    prompt_tokens: int
+    completion_tokens: int
+    completed: bool
+    answer: str = ""
+
+    @property
+    def model_ops(self) -> int:
+        return sum(self.stagehand_calls.get(op, 0) for op in MODEL_OPS)
+
+
+class BenchCallback(AsyncCallbackHandler):
+    def __init__(self) -> None:
+        self.tools: Counter = Counter()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        self.tools[(serialized or {}).get("name") or kwargs.get("name", "?")] += 1
+
+    async def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        message = getattr(response.generations[0][0], "message", None)
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.prompt_tokens += usage.get("input_tokens", 0)
+        self.completion_tokens += usage.get("output_tokens", 0)
+
+
+async def run_benchmark(
+    names: List[str],
+    repeat: int = 3,
+    latency: Optional[Latency] = None,
+    llm_latency: float = 0.4,
+    llm_latency_per_1k: float = 0.05,
+    traces: Optional[Path] = None,
+) -> List[RunResult]:
+    results: List[RunResult] = []
+    with MockMoodle() as site, tempfile.TemporaryDirectory() as tmp:
+        upload = Path(tmp) / "grades.csv"
+        upload.write_text("Email,Midterm\nivanov@ucu.edu.ua,30\n", encoding="utf-8")
+
+        context = FakeContext(site.base_url, latency or Latency())
+        await context.login("student", "bench")
+        page = await context.new_page()
+        await page.goto("/my/")
+        runtime = Runtime(page=page, context=context)
+
+        for name in names:
+            scenario = SCENARIOS[name]
+            cfg = Settings(
+                lms_base_url=site.base_url,
+                lms_username="student",
+                lms_password="bench",
+                user_role=scenario.role,
+                agent_mode=scenario.mode,
+                history_backend="memory",
+                storage_state_dir=tmp,
+                metrics_trace_path=str(traces or ""),
+                moodle_ws_url="",
+                moodle_ws_token="",
+            )
+            llm = ScriptedChatModel(
+                script=scenario.script(site.base_url, str(upload)),
+                base_latency=llm_latency,
+                latency_per_1k=llm_latency_per_1k,
+            )
+            agent = build_agent(cfg, llm=llm)
+
+            #every scenario starts cold; later runs show what the caches save
+            runtime.action_cache.clear()
+            runtime.observe_cache.clear()
+            for run in range(1, repeat + 1):
+                await page.goto("/my/")
+                context.stats.reset()
+                callback = BenchCallback()
+                started = time.perf_counter()
+                with use_runtime(runtime), METRICS.request(f"bench:{name}"), contextlib.redirect_stdout(io.StringIO()):
+                    res = await agent.ainvoke(
+                        {"input": scenario.prompt},
+                        config={"configurable": {"session_id": f"bench:{name}:{run}"}, "callbacks": [callback]},
+                    )
+                answer = str(res.get("output", "")) if isinstance(res, dict) else str(res)
+                results.append(
+                    RunResult(
+                        scenario=name,
+                        run=run,
+                        seconds=round(time.perf_counter() - started, 3),
+                        iterations=callback.llm_calls,
+                        tool_calls=dict(callback.tools),
+                        stagehand_calls=dict(context.stats.calls),
+                        prompt_tokens=callback.prompt_tokens,
+                        completion_tokens=callback.completion_tokens,
+                        completed=callback.llm_calls == (scenario.stops_after or len(llm.script)) and answer != "Done.",
+                        answer=answer[:200],
+                    )
+                )
+        await context.close()
+    return results
+
+
+def _means(results: List[RunResult]) -> Dict[str, Dict[str, float]]:
+    grouped: Dict[str, List[RunResult]] = {}
+    for r in results:
+        grouped.setdefault(r.scenario, []).append(r)
+    return {
+        name: {
+            "seconds": statistics.mean(r.seconds for r in runs),
+            "prompt_tokens": statistics.mean(r.prompt_tokens for r in runs),
+            "model_ops": statistics.mean(r.model_ops for r in runs),
+        }
+        for name, runs in grouped.items()
+    }
+
+
+def format_report(results: List[RunResult], baseline: Optional[List[Dict[str, Any]]] = None) -> str:
+    header = f"{'scenario':<20} {'run':>3} {'wall s':>7} {'iters':>5} {'tools':>5} {'sh ops':>6} {'prompt tok':>10} {'compl tok':>9}  ok"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.scenario:<20} {r.run:>3} {r.seconds:>7.2f} {r.iterations:>5} {sum(r.tool_calls.values()):>5} "
+            f"{r.model_ops:>6} {r.prompt_tokens:>10} {r.completion_tokens:>9}  {'yes' if r.completed else 'NO'}"
+        )
+
+    if baseline:
+        before = _means([RunResult(**b) for b in baseline])
+        after = _means(results)
+        lines += ["", f"{'vs baseline':<20} {'wall s':>16} {'prompt tok':>20} {'sh ops':>14}"]
+        for name, now in after.items():
+            if name not in before:
+                continue
+            was = before[name]
+            cells = []
+            for key in ("seconds", "prompt_tokens", "model_ops"):
+                delta = (now[key] - was[key]) / was[key] * 100 if was[key] else 0.0
+                cells.append(f"{now[key]:>8.1f} ({delta:+.0f}%)")
+            lines.append(f"{name:<20} {cells[0]:>16} {cells[1]:>20} {cells[2]:>14}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark against a mock Moodle with a scripted model.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable); all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; run 1 is cold, later runs hit the caches")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for simulated Stagehand latency (0 = none)")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Simulated seconds per agent LLM call")
+    parser.add_argument("--llm-latency-per-1k", type=float, default=0.05, help="Extra simulated seconds per 1k prompt tokens")
+    parser.add_argument("--json", type=Path, help="Write raw results to this file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON from an earlier --json run")
+    parser.add_argument("--traces", type=Path, help="Also write JSONL span traces (python -m agent.metrics FILE summarizes them)")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run_benchmark(
+            args.scenario or list(SCENARIOS),
+            repeat=args.repeat,
+            latency=Latency().scaled(args.latency_scale),
+            llm_latency=args.llm_latency,
+            llm_latency_per_1k=args.llm_latency_per_1k,
+            traces=args.traces,
+        )
+    )
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    print(format_report(results, baseline))
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from bench.fake_llm import Step, call
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    prompt: str
+    steps: List[Step]
+    role: str = "auto"
+    mode: str = "react"
+    #model calls after which the watchdog should stop the run; 0 = the script runs to the end
+    stops_after: int = 0
+
+    def script(self, base_url: str, upload_path: str = "") -> List[Step]:
+        """Steps with {base} and {upload} filled in."""
+
+        def fill(value: Any) -> Any:
+            if isinstance(value, str):
+                return value.replace("{base}", base_url).replace("{upload}", upload_path)
+            if isinstance(value, dict):
+                return {k: fill(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            return value
+
+        return [Step(tool_calls=fill(s.tool_calls), text=s.text) for s in self.steps]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario(
+            name="course_grade",
+            prompt="What's my grade in Calculus?",
+            role="student",
+            steps=[
+                Step([call("navigate", url="{base}/my/courses.php")]),
+                Step([call("act", instruction="click View course for Calculus")]),
+                Step([call("act", instruction="click the Course grades tab")]),
+                Step([call("extract", instruction="grade items with grade and range")]),
+                Step(text="Your Calculus grades: {last}"),
+            ],
+        ),
+        Scenario(
+            name="course_grade_plan",
+            prompt="What's my grade in Calculus?",
+            role="student",
+            mode="plan",
+            steps=[
+                Step(
+                    [
+                        call("navigate", url="{base}/my/courses.php"),
+                        call("act", instruction="click View course for Calculus"),
+                        call("act", instruction="click the Course grades tab"),
+                        call("extract", instruction="grade items with grade and range"),
+                    ]
+                ),
+                Step(text="Your Calculus grades: {last}"),
+            ],
+        ),
+        Scenario(
+            name="course_grade_lookup",
+            prompt="What's my grade in calculus?",
+            role="student",
+            steps=[
+                Step([call("lookup_url", query="calculus", page="grades")]),
+                Step([call("navigate", url="{url}")]),
+                Step([call("extract", instruction="grade items with grade and range")]),
+                Step(text="Your Calculus grades: {last}"),
+            ],
+        ),
+        Scenario(
+            name="all_courses_totals",
+            prompt="Show my course total in every course.",
+            role="student",
+            steps=[
+                Step([call("extract_many", targets=["101", "102", "103", "104"], instruction="course total grade", page="grades")]),
+                Step(text="Course totals: {last}"),
+            ],
+        ),
+        Scenario(
+            name="deadlines_ws",
+            prompt="What deadlines do I have in the next two weeks?",
+            role="student",
+            steps=[
+                Step([call("moodle_upcoming_events", days=14)]),
+                Step(text="Upcoming deadlines: {last}"),
+            ],
+        ),
+        Scenario(
+            name="grader_report",
+            prompt="Who has the lowest Midterm grade in Calculus? Check the grader report.",
+            role="teacher",
+            steps=[
+                Step([call("navigate", url="{base}/grade/report/grader/index.php?id=101")]),
+                Step([call("extract", instruction="all students with their grades")]),
+                Step([call("read_result", result_id="{result_id}", offset=0)]),
+                Step(text="Checked the grader report: {last}"),
+            ],
+        ),
+        Scenario(
+            name="grader_parallel_reads",
+            prompt="Show the Calculus grader report and tell me how to import grades there.",
+            role="teacher",
+            steps=[
+                Step([call("navigate", url="{base}/grade/report/grader/index.php?id=101")]),
+                Step(
+                    [
+                        call("extract", instruction="all students with their grades"),
+                        call("observe", goal="the Import link"),
+                        call("moodle_grades", course_id=101),
+                    ]
+                ),
+                Step(text="Grader report and import link: {last}"),
+            ],
+        ),
+        Scenario(
+            name="grader_stats",
+            prompt="Who has the lowest Midterm grade in Calculus?",
+            role="teacher",
+            steps=[
+                Step([call("query_grades", course_id=101, item="midterm", aggregate="min")]),
+                Step([call("query_grades", course_id=101, item="midterm", below=1, aggregate="list")]),
+                Step(text="Lowest Midterm grades: {last}"),
+            ],
+        ),
+        Scenario(
+            name="csv_import",
+            prompt="Import these grades into Calculus.",
+            role="teacher",
+            steps=[
+                Step([call("navigate", url="{base}/grade/import/csv/index.php?id=101")]),
+                Step([call("act", instruction="click 'Choose a file...'")]),
+                Step([call("act", instruction="click 'Upload a file' in the file picker")]),
+                Step([call("observe", goal="file attachment input in the file picker")]),
+                Step([call("upload_csv", file_path="{upload}", selector="input[name='repo_upload_file']")]),
+                Step([call("act", instruction="click 'Upload this file'")]),
+                Step([call("act", instruction="click 'Upload grades'")]),
+                Step(text="The CSV was uploaded and the import started."),
+            ],
+        ),
+        Scenario(
+            name="csv_import_skills",
+            prompt="Import these grades into Calculus.",
+            role="teacher",
+            steps=[
+                Step([call("open_course_gradebook", course="calculus", view="import")]),
+                Step([call("open_file_picker_upload")]),
+                Step([call("upload_csv", file_path="{upload}", selector="input[name='repo_upload_file']")]),
+                Step([call("act", instruction="click 'Upload this file'")]),
+                Step([call("act", instruction="click 'Upload grades'")]),
+                Step(text="The CSV was uploaded and the import started."),
+            ],
+        ),
+        Scenario(
+            name="runaway_loop",
+            prompt="Where do I import grades in Calculus?",
+            role="teacher",
+            stops_after=5,
+            steps=[
+                Step([call("navigate", url="{base}/grade/report/grader/index.php?id=101")]),
+                *[Step([call("observe", goal="the grade import button")]) for _ in range(10)],
+                Step(text="Never reached: {last}"),
+            ],
+        ),
+    ]
+}
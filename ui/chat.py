@@ -1,27 +1,57 @@
 import streamlit as st
 import uuid
-import os
-import atexit
-import shutil
 
 from state import init_state, settings_ready, get_settings
-from session import AgentSession, AsyncRunner
+from session import AgentSession, RunHandle, get_shared_runner, start_prewarm
 from settings_page import render_settings
-from pathlib import Path
-
-
-def cleanup_uploads():
-    """Clean up the ui_uploads folder on program exit."""
-    upload_dir = Path.cwd() / "ui_uploads"
-    if upload_dir.exists():
-        shutil.rmtree(upload_dir)
-
-
-atexit.register(cleanup_uploads)
+from debug_panel import render_debug_panel
+from uploads import SessionUploads, upload_store
 
 st.set_page_config(page_title="LMS AI Assistant", layout="wide")
 
 init_state()
+start_prewarm()
+
+
+def _step_line(step) -> str:
+    if step.kind == "tool_start":
+        return f"🔧 **{step.name}** `{step.detail}`"
+    if step.kind == "tool_end":
+        return f"↳ {step.detail}"
+    return f"💭 {step.detail}"
+
+
+def follow_run(handle: RunHandle) -> None:
+    """Render a streaming run until it finishes, then move its answer into the chat log."""
+    with st.chat_message("assistant"):
+        if not handle.finished:
+            st.button("Stop", key="stop_run", icon=":material/stop_circle:", on_click=handle.cancel)
+        status = st.status("Working...", expanded=True)
+        out = st.empty()
+
+        shown = 0
+        shown_label = None
+        while True:
+            handle.poll(timeout=0.1)
+            #the label follows the queue position until a worker picks the run up
+            label = f"Queued · {handle.position} request(s) ahead" if handle.status == "queued" else "Working..."
+            if label != shown_label:
+                status.update(label=label)
+                shown_label = label
+            for step in handle.steps[shown:]:
+                status.markdown(_step_line(step))
+            shown = len(handle.steps)
+            if handle.finished:
+                break
+            out.markdown(handle.text + "▌" if handle.text else "")
+
+        label = {"done": "Done", "cancelled": "Cancelled", "error": "Failed"}[handle.status]
+        status.update(label=f"{label} · {sum(s.kind == 'tool_start' for s in handle.steps)} tool call(s)",
+                      state="error" if handle.status == "error" else "complete", expanded=False)
+        out.markdown(handle.answer)
+
+    st.session_state["chat_messages"].append({"role": "assistant", "content": handle.answer})
+    st.session_state["active_run"] = None
 
 
 def render_chat():
@@ -30,11 +60,9 @@ def render_chat():
 
     # sidebar uploader only for Assistant page
     with st.sidebar:
-        st.markdown("### Upload files for agent")
+        st.toggle("Show debug metrics", key="show_debug")
 
-        # Check for duplicates in currently tracked files
-        previous_paths = st.session_state.get("uploaded_file_paths", []) or []
-        existing_names = {Path(p).name for p in previous_paths}
+        st.markdown("### Upload files for agent")
 
         uploaded_files = st.file_uploader(
             "Upload files",
@@ -62,40 +90,17 @@ def render_chat():
                 # Don't process anything if there are duplicates
                 uploaded_files = None
 
-        upload_dir = Path.cwd() / "ui_uploads"
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Get current uploaded file names
-        current_file_names = (
-            {f.name for f in uploaded_files} if uploaded_files else set()
-        )
-
-        # Get previously saved file paths
-        previous_paths = st.session_state.get("uploaded_file_paths", []) or []
-        previous_file_names = {Path(p).name for p in previous_paths}
+        # Only files not seen on an earlier rerun are written; removed ones are released
+        if st.session_state.get("uploads") is None:
+            st.session_state["uploads"] = SessionUploads(upload_store())
+        stored = st.session_state["uploads"].sync(uploaded_files or [])
 
-        # Find files that were removed (in previous but not in current)
-        removed_files = previous_file_names - current_file_names
+        if stored:
+            st.session_state["uploaded_file_paths"] = [u.path for u in stored]
 
-        # Delete removed files
-        for file_path in previous_paths:
-            if Path(file_path).name in removed_files and os.path.exists(file_path):
-                os.remove(file_path)
-
-        # Save new files and update session state
-        if uploaded_files:
-            saved_paths = []
-
-            for uploaded_file in uploaded_files:
-                saved_path = upload_dir / uploaded_file.name
-                saved_path.write_bytes(uploaded_file.getbuffer())
-                saved_paths.append(str(saved_path))
-
-            st.session_state["uploaded_file_paths"] = saved_paths
-
-            st.caption(f"Saved {len(saved_paths)} file(s):")
-            for path in saved_paths:
-                st.caption(f"`{Path(path).name}`")
+            st.caption(f"Saved {len(stored)} file(s):")
+            for upload in stored:
+                st.caption(f"`{upload.name}`")
         else:
             st.session_state["uploaded_file_paths"] = None
 
@@ -110,7 +115,7 @@ def render_chat():
         st.stop()
 
     if st.session_state.get("agent_session") is None:
-        st.session_state["agent_session"] = AgentSession(runner=AsyncRunner())
+        st.session_state["agent_session"] = AgentSession(runner=get_shared_runner())
 
     ui = get_settings()
 
@@ -120,7 +125,12 @@ def render_chat():
             st.session_state["pending_user_text"] = txt
             st.session_state["chat_input"] = ""
 
-    st.chat_input("Message the agent...", key="chat_input", on_submit=on_send)
+    st.chat_input(
+        "Message the agent...",
+        key="chat_input",
+        on_submit=on_send,
+        disabled=st.session_state.get("active_run") is not None,
+    )
     user_text = st.session_state.get("pending_user_text")
     if user_text:
         st.session_state["pending_user_text"] = None
@@ -139,29 +149,27 @@ def render_chat():
 
         sess: AgentSession = st.session_state["agent_session"]
 
-        with st.chat_message("assistant"):
-            out = st.empty()
+        with st.spinner("Starting session..."):
+            ok, err = sess.ensure_started(
+                ui_username=ui.lms_username,
+                ui_password=ui.lms_password,
+                show_realtime=ui.show_realtime,
+                user_role=ui.user_role,
+            )
+        if not ok:
+            answer = f"Login/session initialization failed: {err}"
+            with st.chat_message("assistant"):
+                st.write(answer)
+            st.session_state["chat_messages"].append({"role": "assistant", "content": answer})
+        else:
+            st.session_state["active_run"] = sess.ask_stream(user_text)
 
-            with st.spinner("Thinking..."):
-                ok, err = sess.ensure_started(
-                    ui_username=ui.lms_username,
-                    ui_password=ui.lms_password,
-                    show_realtime=ui.show_realtime,
-                )
-                if not ok:
-                    answer = f"Login/session initialization failed: {err}"
-                else:
-                    try:
-                        answer = sess.ask(user_text)
-                    except Exception as e:
-                        answer = f"Agent error: {e}"
-
-                out.write(answer)
-
-        st.session_state["chat_messages"].append(
-            {"role": "assistant", "content": answer}
-        )
+    #also resumes a run that is still going after a rerun (e.g. the Stop button was pressed)
+    if st.session_state.get("active_run") is not None:
+        follow_run(st.session_state["active_run"])
 
+    if st.session_state.get("show_debug"):
+        render_debug_panel(st.session_state["agent_session"])
 
 pages = [
     st.Page(render_chat, title="Assistant", icon=":material/smart_toy:", default=True),
@@ -0,0 +1,46 @@
+import streamlit as st
+
+from session import AgentSession, get_job_queue
+from agent.metrics import METRICS
+from agent.pool import POOL
+
+
+def render_debug_panel(sess: AgentSession) -> None:
+    """Latency breakdown of the last request in this session plus process-wide p50/p95 per call."""
+    with st.expander("Debug metrics", expanded=False):
+        traces = METRICS.recent(sess.session_id) if sess is not None and sess.session_id else []
+        if traces:
+            last = traces[-1]
+            cols = st.columns(4)
+            cols[0].metric("Wall time", f"{last.seconds:.1f} s")
+            cols[1].metric("Iterations", last.iterations)
+            cols[2].metric("Prompt tokens", last.prompt_tokens)
+            cols[3].metric("Completion tokens", last.completion_tokens)
+
+            totals = {}
+            for span in last.spans:
+                totals[span["kind"]] = totals.get(span["kind"], 0.0) + span["seconds"]
+            st.caption(" · ".join(f"{kind}: {seconds:.1f} s" for kind, seconds in sorted(totals.items())))
+            st.dataframe(last.spans, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No requests recorded in this session yet.")
+
+        #peek without touching the lease, so an open panel does not keep an idle session alive
+        runtime = POOL.get(sess.session_id, touch=False) if sess is not None and sess.session_id else None
+        if runtime is not None and runtime.network is not None:
+            report = runtime.network.report()
+            st.markdown("**Browser network**")
+            cols = st.columns(4)
+            cols[0].metric("Requests", report["requests"])
+            cols[1].metric("Blocked", sum(report["blocked"].values()))
+            cols[2].metric("Cache hits", report["cache_hits"])
+            cols[3].metric("Saved", f"{report['bytes_saved'] / 1e6:.1f} MB · {report['seconds_saved']:.1f} s")
+            st.caption(
+                f"blocked by type: {report['blocked'] or '-'} · shared asset cache: "
+                f"{report['cached_assets']} files, {report['cache_mb']} MB · unfiltered (safe mode): {report['safe_mode_requests']}"
+            )
+
+        st.markdown("**All sessions**")
+        jobs = get_job_queue().stats()
+        st.caption(f"agent runs: {jobs['running']} running · {jobs['queued']} queued from {jobs['owners']} user(s)")
+        st.dataframe(METRICS.summary(), use_container_width=True, hide_index=True)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
 import threading
+import time
 import uuid
-from dataclasses import dataclass
-from typing import Any, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
 import sys
 from pathlib import Path
 
@@ -14,9 +16,10 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from agent.config import Settings
-from agent.stagehand_client import init_stagehand, close_stagehand
-from agent.auth import login
+from agent.jobs import TERMINAL, JobQueue, QueueFull, RunEvent, agent_job
+from agent.pool import POOL, start_session
 from agent.agent_factory import build_agent
+from agent.prewarm import prewarm
 
 
 class AsyncRunner:
@@ -29,22 +32,151 @@ class AsyncRunner:
         asyncio.set_event_loop(self._loop)
         self._loop.run_forever()
 
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
     def run(self, coro):
         fut = asyncio.run_coroutine_threadsafe(coro, self._loop)
         return fut.result()
 
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
     def close(self) -> None:
         self._loop.call_soon_threadsafe(self._loop.stop)
 
 
+_SHARED_RUNNER: Optional[AsyncRunner] = None
+_SHARED_RUNNER_LOCK = threading.Lock()
+
+
+def get_shared_runner() -> AsyncRunner:
+    """
+    One event loop for every Streamlit session: the browser pool's Playwright objects
+    are bound to the loop that created them, so all sessions must run on it.
+    """
+    global _SHARED_RUNNER
+    with _SHARED_RUNNER_LOCK:
+        if _SHARED_RUNNER is None:
+            _SHARED_RUNNER = AsyncRunner()
+        return _SHARED_RUNNER
+
+
+_PREWARM_STARTED = False
+
+
+def start_prewarm() -> None:
+    """Once per server process: import the agent stack and boot a browser before anyone logs in."""
+    global _PREWARM_STARTED
+    with _SHARED_RUNNER_LOCK:
+        if _PREWARM_STARTED:
+            return
+        _PREWARM_STARTED = True
+    cfg = Settings()
+    if cfg.prewarm_enabled:
+        get_shared_runner().submit(prewarm(cfg))
+
+
+_JOBS: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """One queue per server process, on the shared loop, so limits and fairness span every session."""
+    global _JOBS
+    runner = get_shared_runner()
+    with _SHARED_RUNNER_LOCK:
+        if _JOBS is None:
+            _JOBS = JobQueue.from_settings(Settings(), runner.loop)
+        return _JOBS
+
+
+@dataclass
+class RunHandle:
+    """
+    The Streamlit side of a queued agent run. poll() reads the job's events by index and folds them
+    into steps/text, so a rerun (or a return from another page) redraws the run so far and carries on.
+    """
+
+    jobs: Optional[JobQueue] = None
+    job_id: str = ""
+    seen: int = 0
+    steps: List[RunEvent] = field(default_factory=list)
+    text: str = ""
+    answer: Optional[str] = None
+    status: str = "queued"
+    #pending jobs ahead of this one while it waits for a worker
+    position: int = 0
+
+    @classmethod
+    def failed(cls, message: str) -> "RunHandle":
+        return cls(answer=message, status="error")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL
+
+    def poll(self, timeout: float = 0.1) -> bool:
+        """Apply new events, waiting up to timeout for some; returns True if anything changed."""
+        if self.finished:
+            return False
+        events, job = self.jobs.poll(self.job_id, self.seen)
+        if job is None:
+            self._apply(RunEvent("error", detail="the run expired before its result was read"))
+            return True
+        if not events:
+            time.sleep(timeout)
+            events, job = self.jobs.poll(self.job_id, self.seen)
+        self.seen += len(events)
+        changed = bool(events)
+        if self.status == "queued":
+            position = self.jobs.position(self.job_id)
+            changed = changed or position != self.position
+            self.position = position
+            if job.status != "queued":
+                self.status = "running"
+                changed = True
+        for event in events:
+            self._apply(event)
+        return changed
+
+    def cancel(self) -> None:
+        if self.jobs is not None and not self.finished:
+            self.jobs.cancel(self.job_id)
+
+    def _apply(self, event: RunEvent) -> None:
+        if self.finished:
+            return
+        if event.kind == "token":
+            self.text += event.detail
+        elif event.kind in ("tool_start", "tool_end"):
+            if event.kind == "tool_start" and self.text.strip():
+                self.steps.append(RunEvent("note", detail=self.text.strip()))
+            if event.kind == "tool_start":
+                self.text = ""
+            self.steps.append(event)
+        else:
+            self.status = event.kind
+            if event.kind == "done":
+                self.answer = event.detail or self.text
+            elif event.kind == "error":
+                self.answer = f"Agent error: {event.detail}"
+            else:
+                self.answer = (self.text + "\n\n" if self.text else "") + "_Run cancelled._"
+
+
 @dataclass
 class AgentSession:
     runner: AsyncRunner
     agent: Optional[Any] = None
     started: bool = False
     session_id: str = ""
+    cfg: Optional[Settings] = None
+    active: Optional[RunHandle] = None
 
-    def ensure_started(self, ui_username: str, ui_password: str, show_realtime: bool) -> Tuple[bool, Optional[str]]:
+    def ensure_started(
+        self, ui_username: str, ui_password: str, show_realtime: bool, user_role: str = "auto"
+    ) -> Tuple[bool, Optional[str]]:
         if self.started and self.agent is not None:
             return True, None
 
@@ -52,15 +184,20 @@ class AgentSession:
             lms_username=ui_username,
             lms_password=ui_password,
             show_realtime=show_realtime,
+            user_role=user_role,
+            #MOODLE_WS_TOKEN belongs to one account; every UI user gets a token from their own login
+            moodle_ws_token="",
         )
 
+        session_id = f"ui:{uuid.uuid4()}"
+
         async def _start():
-            await init_stagehand(cfg)
-            ok, err = await login(cfg)
+            ok, err = await start_session(cfg, session_id)
             if not ok:
                 raise ValueError(err or "Login failed.")
-            self.agent = build_agent(cfg) 
-            self.session_id = f"ui:{uuid.uuid4()}"
+            self.agent = build_agent(cfg)
+            self.session_id = session_id
+            self.cfg = cfg
 
         try:
             self.runner.run(_start())
@@ -68,7 +205,7 @@ class AgentSession:
             return True, None
         except Exception as e:
             try:
-                self.runner.run(close_stagehand())
+                self.runner.run(POOL.release(session_id))
             except Exception:
                 pass
             self.started = False
@@ -76,21 +213,30 @@ class AgentSession:
             return False, str(e)
 
     def ask(self, text: str) -> str:
+        """Queue a run and block until it finishes; ask_stream() is the non-blocking variant."""
+        handle = self.ask_stream(text)
+        while not handle.finished:
+            handle.poll(timeout=0.1)
+        return handle.answer or ""
+
+    def ask_stream(self, text: str) -> RunHandle:
+        """Queue a run and return immediately; the handle polls its progress by job id."""
         if not self.started or self.agent is None:
-            return "Agent is not started."
-
-        async def _ask():
-            res = await self.agent.ainvoke(
-                {"input": text},
-                config={"configurable": {"session_id": self.session_id}},
-            )
-            return res["output"] if isinstance(res, dict) and "output" in res else str(res)
-
-        return self.runner.run(_ask())
+            return RunHandle.failed("Agent is not started.")
+        jobs = get_job_queue()
+        try:
+            job_id = jobs.submit(self.cfg.lms_username, self.session_id, agent_job(self.agent, self.cfg, self.session_id, text))
+        except QueueFull as e:
+            return RunHandle.failed(str(e))
+        self.active = RunHandle(jobs=jobs, job_id=job_id)
+        return self.active
 
     def stop(self) -> None:
+        if self.session_id:
+            get_job_queue().cancel_session(self.session_id)
+
         async def _stop():
-            await close_stagehand()
+            await POOL.release(self.session_id)
 
         try:
             self.runner.run(_stop())
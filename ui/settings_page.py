@@ -1,6 +1,6 @@
 import streamlit as st
 
-from state import init_state
+from state import ROLES, init_state
 
 
 def render_settings():
@@ -10,6 +10,12 @@ def render_settings():
 
     username = st.text_input("LMS username", value=st.session_state.get("lms_username", ""))
     password = st.text_input("LMS password", value=st.session_state.get("lms_password", ""), type="password")
+    user_role = st.selectbox(
+        "Your role in the LMS",
+        ROLES,
+        index=ROLES.index(st.session_state.get("user_role", "auto")),
+        format_func={"auto": "Detect from the request", "student": "Student", "teacher": "Teacher"}.get,
+    )
     show_realtime = st.checkbox("Show realtime agent actions", value=bool(st.session_state.get("show_realtime", False)))
 
     col1, col2 = st.columns([1, 1], gap="medium")
@@ -19,6 +25,7 @@ def render_settings():
             st.session_state["lms_username"] = username.strip()
             st.session_state["lms_password"] = password
             st.session_state["show_realtime"] = show_realtime
+            st.session_state["user_role"] = user_role
             st.session_state["settings_saved"] = bool(username.strip()) and bool(password)
 
             sess = st.session_state.get("agent_session")
@@ -3,12 +3,17 @@ from __future__ import annotations
 from dataclasses import dataclass
 import streamlit as st
 
+from agent.config import Settings
+
+ROLES = ("auto", "student", "teacher")
+
 
 @dataclass(frozen=True)
 class UISettings:
     lms_username: str
     lms_password: str
     show_realtime: bool
+    user_role: str
 
 
 def init_state() -> None:
@@ -16,11 +21,16 @@ def init_state() -> None:
     st.session_state.setdefault("lms_username", "")
     st.session_state.setdefault("lms_password", "")
     st.session_state.setdefault("show_realtime", False)
+    #USER_ROLE only sets the initial choice; each browser session picks its own role
+    role = Settings().user_role
+    st.session_state.setdefault("user_role", role if role in ROLES else "auto")
 
     st.session_state.setdefault("chat_messages", [])
     st.session_state.setdefault("agent_session", None)
     st.session_state.setdefault("pending_user_text", None)
+    st.session_state.setdefault("active_run", None)
     st.session_state.setdefault("uploaded_file_paths", None)
+    st.session_state.setdefault("uploads", None)
 
 
 def settings_ready() -> bool:
@@ -36,4 +46,5 @@ def get_settings() -> UISettings:
         lms_username=st.session_state.get("lms_username", "").strip(),
         lms_password=st.session_state.get("lms_password", ""),
         show_realtime=bool(st.session_state.get("show_realtime", False)),
+        user_role=st.session_state.get("user_role", "auto"),
     )
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+CHUNK_BYTES = 1024 * 1024
+SESSION_TTL = 24 * 3600.0
+SWEEP_INTERVAL = 3600.0
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    name: str
+    path: str
+    digest: str
+    size: int
+
+
+class UploadStore:
+    """
+    Content-addressed store for files uploaded in the chat sidebar.
+
+    Each distinct content is written once to blobs/<sha256> and hard-linked into
+    sessions/<namespace>/<file name>, so the agent gets a path with the original name and every
+    browser session only sees its own files. A blob's link count is its reference count: when the
+    last session link is removed the blob goes too. Session folders idle for longer than
+    SESSION_TTL are swept, since Streamlit does not report closed sessions.
+    """
+
+    def __init__(self, root: Path, session_ttl: float = SESSION_TTL) -> None:
+        self.root = root
+        self.blobs = root / "blobs"
+        self.sessions = root / "sessions"
+        self.session_ttl = session_ttl
+        self.last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> Path:
+        return self.sessions / namespace
+
+    def _write_part(self, data: BinaryIO) -> Tuple[str, Path, int]:
+        """Stream data to a temp file while hashing it; add() moves it into place under the lock."""
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        tmp = self.blobs / f".{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        data.seek(0)
+        with open(tmp, "wb") as out:
+            while True:
+                chunk = data.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), tmp, size
+
+    def add(self, namespace: str, name: str, data: BinaryIO) -> StoredUpload:
+        digest, tmp, size = self._write_part(data)
+        blob = self.blobs / digest
+        folder = self._namespace(namespace)
+        target = folder / Path(name).name
+        #placing and linking the blob is one step, so sweep() or remove() cannot drop it (or the folder) in between
+        with self._lock:
+            folder.mkdir(parents=True, exist_ok=True)
+            if blob.exists():
+                tmp.unlink()
+            else:
+                tmp.replace(blob)
+            target.unlink(missing_ok=True)
+            try:
+                os.link(blob, target)
+            except OSError:
+                #no hard links on this filesystem: the session gets its own copy and the blob is not kept
+                shutil.copyfile(blob, target)
+                self._drop_unreferenced(blob)
+        return StoredUpload(name=target.name, path=str(target), digest=digest, size=size)
+
+    def remove(self, upload: StoredUpload) -> None:
+        with self._lock:
+            Path(upload.path).unlink(missing_ok=True)
+            self._drop_unreferenced(self.blobs / upload.digest)
+
+    def _drop_unreferenced(self, blob: Path) -> None:
+        try:
+            if blob.stat().st_nlink <= 1:
+                blob.unlink()
+        except FileNotFoundError:
+            pass
+
+    def touch(self, namespace: str) -> None:
+        folder = self._namespace(namespace)
+        with self._lock:
+            if folder.exists():
+                os.utime(folder)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Delete session folders idle past session_ttl, then blobs no session links to. Returns folders removed."""
+        now = now or time.time()
+        removed = 0
+        with self._lock:
+            self.last_sweep = now
+            for folder in self.sessions.glob("*") if self.sessions.exists() else []:
+                if now - folder.stat().st_mtime > self.session_ttl:
+                    shutil.rmtree(folder, ignore_errors=True)
+                    removed += 1
+            for blob in self.blobs.glob("*") if self.blobs.exists() else []:
+                #leftover .part files are from interrupted writes
+                if blob.name.startswith(".") and now - blob.stat().st_mtime > 3600:
+                    blob.unlink(missing_ok=True)
+                elif not blob.name.startswith("."):
+                    self._drop_unreferenced(blob)
+        return removed
+
+
+class SessionUploads:
+    """
+    Sidebar uploads of one Streamlit session. Files are keyed by the uploader's file_id, so a rerun
+    with the same selection writes nothing; only new uploads are stored and removed ones released.
+    """
+
+    def __init__(self, store: UploadStore, namespace: Optional[str] = None) -> None:
+        self.store = store
+        self.namespace = namespace or uuid.uuid4().hex
+        self.files: Dict[str, StoredUpload] = {}
+
+    def sync(self, uploaded: List[Any]) -> List[StoredUpload]:
+        current = {getattr(f, "file_id", None) or f"{f.name}:{f.size}": f for f in uploaded}
+        for file_id in [k for k in self.files if k not in current]:
+            self.store.remove(self.files.pop(file_id))
+        for file_id, f in current.items():
+            #also rewrites a file whose session folder was swept while the tab sat idle
+            if file_id not in self.files or not Path(self.files[file_id].path).exists():
+                self.files[file_id] = self.store.add(self.namespace, f.name, f)
+        if self.files:
+            self.store.touch(self.namespace)
+        return list(self.files.values())
+
+    @property
+    def paths(self) -> List[str]:
+        return [u.path for u in self.files.values()]
+
+
+_STORE: Optional[UploadStore] = None
+
+
+def upload_store() -> UploadStore:
+    """Process-wide store under ./ui_uploads, swept of stale sessions at most every SWEEP_INTERVAL."""
+    global _STORE
+    if _STORE is None:
+        _STORE = UploadStore(Path.cwd() / "ui_uploads")
+    if time.time() - _STORE.last_sweep > SWEEP_INTERVAL:
+        _STORE.sweep()
+    return _STORE